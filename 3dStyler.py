@@ -1,8 +1,49 @@
 import tkinter as tk
-from tkinter import ttk
+from tkinter import filedialog, ttk
 import math
+import sys
 import numpy as np
 
+from vrrt.animation import orbit_positions
+from vrrt.cache import PathCache, ProgressivePaths
+from vrrt.energy import estimate_irradiance
+from vrrt.incremental import PathIndex, pick_mirror, prefer_incremental
+from vrrt.parallel import ParallelTracer
+from vrrt.pixeltrace import PixelTraceRenderer
+from vrrt.profiler import PROFILER
+from vrrt.projection import IPD
+from vrrt.raster import RasterRenderer
+from vrrt.render import VRRenderer
+from vrrt.sampling import SAMPLERS
+from vrrt.scene import Scene
+from vrrt.schema2d import SchemaRenderer
+from vrrt.store import SphereStore
+from vrrt.scheduler import FrameScheduler
+from vrrt.stereo import StereoRenderer
+from vrrt.tracer import RaySegments
+from vrrt.worker import JobFailed, TraceWorker
+
+# Период опроса результатов фоновой трассировки (мс)
+TRACE_POLL_MS = 20
+
+# Сколько ждать остановки потока трассировки при закрытии окна (с)
+TRACE_CLOSE_TIMEOUT = 2.0
+
+# Пакеты меньше этого трассируются в текущем процессе и при включенной
+# параллельной трассировке: запуск шардов в пуле стоит около 6 мс, а
+# 72 луча (предел ползунка) трассируются за доли миллисекунды. Поэтому
+# переключатель влияет только на порции прогрессивного накопления
+# от GUI_PARALLEL_RAYS лучей
+GUI_PARALLEL_RAYS = 256
+
+# Скорость вращения источника и приемника в анимации (градусов в секунду)
+ANIMATION_SPEED = 40
+
+def scene_property(name):
+    """Свойство-посредник к атрибуту модели сцены self.scene"""
+    return property(lambda self: getattr(self.scene, name),
+                    lambda self, value: setattr(self.scene, name, value))
+
 class VRRayTracing3D:
     def __init__(self, root):
         self.root = root
@@ -31,16 +72,30 @@ class VRRayTracing3D:
         self.params_frame = ttk.Frame(self.notebook, style='VR.TFrame')
         self.notebook.add(self.params_frame, text="⚙️ Параметры")
         
-        # Инициализация сцен
-        self.setup_vr_scene()
-        self.setup_schema_scene()
-        self.setup_params_scene()
-        
-        # Общие данные для сцен
+        # Общие данные для сцен (нужны до построения вкладок)
         self.init_shared_data()
         
+        # Содержимое вкладки строится при первом показе, рисуется только
+        # видимая сцена: вкладка -> (цель планировщика, построение)
+        self.tabs = {
+            str(self.vr_frame): ('vr', self.setup_vr_scene),
+            str(self.schema_frame): ('schema', self.setup_schema_scene),
+            str(self.params_frame): (None, self.setup_params_scene),
+        }
+        self.built_tabs = set()
+        
         # Привязка событий
         self.setup_bindings()
+        
+        # Перерисовка - через планировщик кадров (не чаще одного раза за кадр),
+        # трассировка - в фоновом потоке: интерфейс не ждет ее завершения
+        self.scheduler = FrameScheduler(self.root.after, self.render_frame,
+                                        quality_targets=('vr',))
+        self.start_trace_worker()
+        
+        # Первая вкладка: строится и рисуется сразу
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        self.on_tab_changed()
 
     def init_shared_data(self):
         """Общие данные для всех сцен"""
@@ -54,46 +109,92 @@ class VRRayTracing3D:
         self.camera_angle = 0
         self.camera_elevation = 30
         
-        # Объекты сцены (3D сферы)
-        self.mirrors_3d = [
-            {'pos': [-2, 0, 0], 'radius': 1.2, 'color': '#4169E1', 'reflectivity': 0.9},
-            {'pos': [2, 1, -1], 'radius': 1.0, 'color': '#32CD32', 'reflectivity': 0.8},
-            {'pos': [0, -1, 2], 'radius': 0.9, 'color': '#9370DB', 'reflectivity': 0.85},
-            {'pos': [-1, 1.5, -2], 'radius': 0.8, 'color': '#FF6346', 'reflectivity': 0.7},
-            {'pos': [1.5, -0.5, 1], 'radius': 0.7, 'color': '#FFD700', 'reflectivity': 0.95}
-        ]
+        # Стереопара: межзрачковое расстояние (единицы сцены)
+        self.stereo_enabled = False
+        self.ipd = IPD
+        
+        # 3D сцена: зеркала (сферы), источник, приемник и параметры лучей
+        self.scene = Scene()
+        
+        # Пути лучей не зависят от камеры - при ее движении только перепроецируем
+        self.path_cache = PathCache()
+        
+        # Последние показанные пути и ключ сцены, ожидающей трассировки
+        self.shown_segments = RaySegments.empty()
+        self.pending_trace_key = None
         
-        # Источник и приемник в 3D
-        self.source_3d = [-3, 1, 2]
-        self.target_3d = [3, -1, -2]
+        # Прогрессивное накопление лучей на кадрах простоя
+        self.progressive = ProgressivePaths()
+        self.progressive_enabled = False
+        
+        # Оценка освещенности приемника (на кадрах простоя, после накопления)
+        self.energy_enabled = True
+        
+        # Ошибка последнего задания фоновой трассировки (JobFailed)
+        self.trace_error = None
+        self.irradiance = None
+        self.irradiance_key = None
+        
+        # Перетаскивание зеркал в 3D: индекс путей для частичной перетрассировки
+        # (строится и обновляется только в потоке трассировки)
+        self.path_index = None
+        self.drag_mirror_3d = None
         
         # 2D данные (для схемы)
-        self.mirrors_2d = [
+        self.mirrors_2d = SphereStore.from_dicts([
             {'center': (300, 300), 'radius': 80, 'color': 'blue'},
             {'center': (600, 400), 'radius': 60, 'color': 'green'},
             {'center': (450, 200), 'radius': 50, 'color': 'purple'},
             {'center': (750, 500), 'radius': 70, 'color': 'orange'}
-        ]
+        ], key='center')
         self.source_2d = (100, 600)
         self.target_2d = (900, 100)
         
-        # Параметры лучей
-        self.num_rays = 36
+        # Параметры отображения лучей
         self.show_normals = True
         self.show_grid = True
-        self.ray_intensity = 0.8
-        self.reflection_depth = 3
         
         # Анимация
         self.animation_running = False
         self.animation_angle = 0
 
+    # Данные 3D сцены хранятся в self.scene (vrrt.scene.Scene)
+    mirrors_3d = scene_property('mirrors')
+    source_3d = scene_property('source')
+    target_3d = scene_property('target')
+    num_rays = scene_property('num_rays')
+    reflection_depth = scene_property('reflection_depth')
+    ray_intensity = scene_property('ray_intensity')
+
     def setup_vr_scene(self):
         """Настройка 3D VR сцены"""
         # Основной холст для 3D
         self.vr_canvas = tk.Canvas(self.vr_frame, width=self.width, height=self.height, 
                                    bg='#0a0a1a', highlightthickness=0)
         self.vr_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.vr_renderers = {
+            'canvas': VRRenderer(self.vr_canvas, self),
+            'raster': RasterRenderer(self.vr_canvas, self, make_image=self.make_frame_image),
+            'raytrace': PixelTraceRenderer(self.vr_canvas, self, make_image=self.make_frame_image),
+        }
+        # Стереопара для холста и растра: пути трассируются один раз на оба глаза
+        self.stereo_renderers = {
+            'canvas': StereoRenderer(self, lambda view, prefix, origin:
+                                     VRRenderer(self.vr_canvas, view, prefix, origin)),
+            'raster': StereoRenderer(self, lambda view, prefix, origin:
+                                     RasterRenderer(self.vr_canvas, view, self.make_frame_image,
+                                                    prefix, origin)),
+        }
+        self.render_backend = 'canvas'
+        self.vr_renderer = self.vr_renderers['canvas']
+        
+        # 3D: перетаскивание зеркал мышью, колесо - радиус зеркала под курсором
+        self.vr_canvas.bind("<Button-1>", self.on_click_3d)
+        self.vr_canvas.bind("<B1-Motion>", self.on_drag_3d)
+        self.vr_canvas.bind("<ButtonRelease-1>", self.on_release_3d)
+        self.vr_canvas.bind("<MouseWheel>", lambda e: self.on_wheel_3d(e, e.delta > 0))
+        self.vr_canvas.bind("<Button-4>", lambda e: self.on_wheel_3d(e, True))
+        self.vr_canvas.bind("<Button-5>", lambda e: self.on_wheel_3d(e, False))
         
         # Панель управления VR
         vr_control = tk.Frame(self.vr_frame, bg='#16213e', width=200)
@@ -141,6 +242,18 @@ class VRRayTracing3D:
         tk.Button(anim_frame, text="⏸️ Стоп", command=self.stop_animation,
                  bg='#dc3545', fg='white').pack(side=tk.LEFT, expand=True, padx=2)
         
+        # Профилирование кадра
+        prof_frame = tk.LabelFrame(vr_control, text="Профиль", fg='white', bg='#16213e',
+                                   font=('Arial', 10, 'bold'))
+        prof_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        self.profile_var = tk.BooleanVar(value=PROFILER.enabled)
+        tk.Checkbutton(prof_frame, text="Замер этапов", variable=self.profile_var,
+                       fg='white', bg='#16213e', selectcolor='#16213e',
+                       command=self.toggle_profiler).pack(anchor=tk.W)
+        tk.Button(prof_frame, text="💾 Сохранить (Chrome Trace)", command=self.save_profile,
+                 bg='#0f3460', fg='white').pack(fill=tk.X, pady=2)
+        
         # Информация
         self.info_label = tk.Label(vr_control, text="", fg='#00ff00', bg='#16213e',
                                    font=('Courier', 8), justify=tk.LEFT)
@@ -152,6 +265,12 @@ class VRRayTracing3D:
         self.schema_canvas = tk.Canvas(self.schema_frame, width=self.width, height=self.height,
                                        bg='black', highlightthickness=0)
         self.schema_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.schema_renderer = SchemaRenderer(self.schema_canvas, self)
+        
+        # 2D события мыши
+        self.schema_canvas.bind("<Button-1>", self.on_click_2d)
+        self.schema_canvas.bind("<B1-Motion>", self.on_drag_2d)
+        self.schema_canvas.bind("<ButtonRelease-1>", self.on_release_2d)
         
         # Панель управления 2D
         schema_control = tk.Frame(self.schema_frame, bg='#16213e', width=200)
@@ -190,6 +309,13 @@ class VRRayTracing3D:
             ("Глубина отражений", 1, 5, self.reflection_depth, "depth"),
             ("Показать нормали", None, None, self.show_normals, "normals"),
             ("Показать сетку", None, None, self.show_grid, "grid"),
+            ("Параллельная трассировка", None, None, False, "parallel"),
+            ("Выборка лучей", SAMPLERS, None, self.scene.sampler, "sampler"),
+            ("Прогрессивное накопление", None, None, False, "progressive"),
+            ("Оценка освещенности приемника", None, None, self.energy_enabled, "energy"),
+            ("Отрисовка", tuple(self.vr_renderers), None, 'canvas', "backend"),
+            ("Стерео (side-by-side)", None, None, self.stereo_enabled, "stereo"),
+            ("Межзрачковое расстояние, мм", 0, 300, self.ipd * 1000, "ipd"),
             ("", None, None, None, "separator"),
             ("🎨 ЦВЕТА ОБЪЕКТОВ", "title"),
             ("Источник", "red"),
@@ -209,13 +335,22 @@ class VRRayTracing3D:
                         font=('Arial', 12, 'bold')).pack(anchor=tk.W, padx=10, pady=(10,5))
             elif param[0] == "":
                 tk.Frame(scrollable_frame, height=2, bg='#444').pack(fill=tk.X, padx=10, pady=10)
-            elif len(param) == 4:  # Чекбокс
+            elif len(param) == 5 and param[1] is None:  # Чекбокс
                 var = tk.BooleanVar(value=param[3])
                 self.param_vars[param[0]] = var
                 cb = tk.Checkbutton(scrollable_frame, text=param[0], variable=var,
                                    fg='white', bg='#16213e', selectcolor='#16213e',
                                    command=lambda p=param[0]: self.update_param(p))
                 cb.pack(anchor=tk.W, padx=20, pady=2)
+            elif len(param) == 5 and isinstance(param[1], tuple):  # Выбор из списка
+                frame = tk.Frame(scrollable_frame, bg='#16213e')
+                frame.pack(fill=tk.X, padx=10, pady=5)
+                tk.Label(frame, text=param[0], fg='white', bg='#16213e').pack(anchor=tk.W)
+                var = tk.StringVar(value=param[3])
+                self.param_vars[param[0]] = var
+                combo = ttk.Combobox(frame, textvariable=var, values=param[1], state='readonly')
+                combo.bind('<<ComboboxSelected>>', lambda e, p=param[0]: self.update_param(p))
+                combo.pack(fill=tk.X)
             elif len(param) == 5:  # Слайдер
                 frame = tk.Frame(scrollable_frame, bg='#16213e')
                 frame.pack(fill=tk.X, padx=10, pady=5)
@@ -239,23 +374,218 @@ class VRRayTracing3D:
         self.root.bind('<KeyPress-Down>', lambda e: self.move_camera(0, -0.5, 0))
         self.root.bind('<KeyPress-plus>', lambda e: self.move_camera(0, 0, -0.5))
         self.root.bind('<KeyPress-minus>', lambda e: self.move_camera(0, 0, 0.5))
+
+    def on_tab_changed(self, event=None):
+        """Показ вкладки: построение при первом показе и перерисовка ее сцены"""
+        tab = self.notebook.select()
+        target, build = self.tabs[tab]
+        if tab not in self.built_tabs:
+            self.built_tabs.add(tab)
+            build()
+            if target is not None:
+                self.scheduler.invalidate(target)
+        # Скрытые сцены копят запросы и перерисуются при показе
+        self.scheduler.set_visible(*([target] if target is not None else []))
+
+    def start_trace_worker(self):
+        """Запуск фонового потока трассировки и опроса его результатов"""
+        self.trace_worker = TraceWorker(self.trace_job)
+        self.trace_accel = None     # BVH рабочего потока, переходит от копии к копии сцены
+        self.root.after(TRACE_POLL_MS, self.poll_trace_results)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def trace_job(self, job, cancel):
+        """Задание фонового потока: job = (вид, сцена, номер первого луча)"""
+        kind, scene, start = job
+        self.trace_accel = scene.attach_accelerator(self.trace_accel)
+        if kind == 'energy':
+            return estimate_irradiance(scene, seed=self.path_cache.seed, cancel=cancel)
+        if kind == 'edit':
+            return self.retrace_edited(scene, cancel)
+        return self.path_cache.trace(scene, cancel, start)
+
+    def retrace_edited(self, scene, cancel):
+        """
+        Пути сцены после правки зеркал (в потоке трассировки).
         
-        # 2D события мыши
-        self.schema_canvas.bind("<Button-1>", self.on_click_2d)
-        self.schema_canvas.bind("<B1-Motion>", self.on_drag_2d)
-        self.schema_canvas.bind("<ButtonRelease-1>", self.on_release_2d)
+        Индекс путей переиспользуется, пока меняются только зеркала;
+        в маленьких сценах (prefer_incremental) сцена трассируется заново.
+        """
+        seed = self.path_cache.seed
+        if not prefer_incremental(len(scene.mirrors), scene.num_rays):
+            self.path_index = None
+            return self.path_cache.trace(scene, cancel)
+        index = self.path_index
+        if index is not None and index.matches(scene, seed):
+            return index.update_scene(scene)
+        segments = self.path_cache.trace(scene, cancel)
+        self.path_index = PathIndex.from_scene(scene, segments, seed)
+        return segments
+
+    def ray_segments(self):
+        """
+        Пути лучей для кадра без блокировки интерфейса.
+        
+        Если пути текущей сцены есть в кэше, они возвращаются сразу
+        (движение камеры только перепроецирует их). Иначе сцена
+        отправляется на трассировку, отменяя устаревшее задание,
+        а до ее завершения показывается последний готовый результат.
+        """
+        # Перетрассировку после правки зеркал кадры не отменяют
+        if self.edit_pending():
+            return self.shown_segments
+        # Во время взаимодействия трассируется упрощенная сцена
+        num_rays, depth = self.scheduler.effective(self.num_rays, self.reflection_depth)
+        key = self.path_cache.scene_key(self.scene, num_rays, depth)
+        if self.progressive_enabled and key == self.progressive.key:
+            self.shown_segments = self.progressive.segments
+            return self.shown_segments
+        
+        segments = self.path_cache.peek(key)
+        if segments is not None:
+            if self.pending_trace_key is not None:
+                self.trace_worker.cancel()
+                self.pending_trace_key = None
+            self.shown_segments = segments
+            # Накопление начинается только с кадра полного качества
+            if (num_rays, depth) == (self.num_rays, self.reflection_depth):
+                self.progressive.reset(key, segments, num_rays)
+        elif key != self.pending_trace_key:
+            self.pending_trace_key = key
+            scene = self.scene.copy()
+            scene.num_rays, scene.reflection_depth = num_rays, depth
+            self.trace_worker.submit(('frame', key, 0, num_rays), ('trace', scene, 0))
+        return self.shown_segments
+
+    def refine_paths(self):
+        """Кадр простоя: трассировка следующей порции лучей для накопления"""
+        if (not self.progressive_enabled or self.pending_trace_key is not None
+                or self.scheduler.interacting() or not self.scheduler.is_visible('vr')):
+            return
+        batch = self.progressive.next_batch()
+        if batch is None:
+            return
+        start, count = batch
+        self.pending_trace_key = self.progressive.key
+        scene = self.scene.copy()
+        scene.num_rays = count
+        self.trace_worker.submit(('refine', self.progressive.key, start, count),
+                                 ('trace', scene, start))
+
+    def energy_key(self):
+        """
+        Ключ оценки освещенности: только то, от чего она зависит.
+
+        Число лучей и глубина ползунков в ключ не входят - у оценки свои
+        пределы (energy.MAX_RAYS, MAX_DEPTH).
+        """
+        scene = self.scene
+        centers, radii = scene.mirror_arrays()
+        return ('energy', centers.tobytes(), radii.tobytes(),
+                scene.mirrors.reflectivity.tobytes(), tuple(float(c) for c in scene.source),
+                tuple(float(c) for c in scene.target), scene.sampler, scene.dtype.str,
+                self.path_cache.seed)
+
+    def estimate_energy(self):
+        """Кадр простоя: оценка освещенности приемника в фоновом потоке"""
+        if (not self.energy_enabled or self.pending_trace_key is not None
+                or self.scheduler.interacting() or not self.scheduler.is_visible('vr')):
+            return
+        key = self.energy_key()
+        if key == self.irradiance_key:
+            return
+        # Ключ задания отличается от ключей путей: кадр из кэша его отменит,
+        # и оценка начнется заново на следующем простое
+        self.pending_trace_key = key
+        self.trace_worker.submit(('energy', key, 0, 0), ('energy', self.scene.copy(), 0))
+
+    def poll_trace_results(self):
+        """Прием готовых результатов трассировки (по таймеру Tk)"""
+        results = self.trace_worker.poll()
+        traced = False
+        for job, segments in results:
+            # job - ключ задания; None - ошибка вызова TraceWorker.call
+            if job is not None and job[1] == self.pending_trace_key:
+                self.pending_trace_key = None
+            if isinstance(segments, JobFailed):
+                self.report_trace_error(segments)
+                continue
+            self.trace_error = None
+            kind, key, start, count = job
+            # Оценка освещенности идет на простое и в бюджет кадра не входит
+            traced = traced or kind != 'energy'
+            if kind == 'frame':
+                self.path_cache.store(key, segments)
+            elif kind == 'edit':
+                self.path_cache.store(key[1], segments)
+            elif kind == 'energy':
+                self.irradiance, self.irradiance_key = segments, key
+            else:
+                self.progressive.add(key, start, count, segments)
+        if results:
+            if traced:
+                self.scheduler.report_work(self.trace_worker.last_duration * 1000)
+            self.scheduler.invalidate('vr')
+        else:
+            self.refine_paths()
+            self.estimate_energy()
+        # Попиксельная трассировка уточняет изображение в своем потоке
+        if isinstance(self.vr_renderer, PixelTraceRenderer):
+            if self.vr_renderer.poll():
+                self.scheduler.invalidate('vr')
+            error = self.vr_renderer.error
+            if error is not None and error is not self.trace_error:
+                self.report_trace_error(error)
+                self.scheduler.invalidate('vr')
+        self.root.after(TRACE_POLL_MS, self.poll_trace_results)
+
+    def report_trace_error(self, failure):
+        """Ошибка фонового задания: текст - в stderr, кратко - на панель"""
+        print(failure.traceback, file=sys.stderr, end='')
+        self.trace_error = failure
+
+    def render_frame(self, targets):
+        """Отрисовка кадра планировщиком: targets - устаревшие сцены"""
+        with PROFILER.frame():
+            if 'vr' in targets:
+                self.draw_vr_scene()
+            if 'schema' in targets:
+                self.draw_schema_scene()
+
+    def toggle_profiler(self):
+        """Включение замеров этапов кадра"""
+        PROFILER.enabled = self.profile_var.get()
+        if PROFILER.enabled:
+            PROFILER.reset()
+        self.scheduler.invalidate('vr')
+
+    def save_profile(self):
+        """Сохранение ленты замеров для chrome://tracing или Perfetto"""
+        path = filedialog.asksaveasfilename(title="Сохранить профиль", defaultextension=".json",
+                                            initialfile="profile.json",
+                                            filetypes=[("Chrome Trace", "*.json")])
+        if path:
+            PROFILER.dump(path)
+
+    def on_close(self):
+        """Закрытие окна: остановка фоновой трассировки"""
+        # Пул процессов закрывается в потоке трассировки, после текущего задания
+        self.set_parallel(False)
+        self.trace_worker.close(timeout=TRACE_CLOSE_TIMEOUT)
+        self.vr_renderers['raytrace'].close()
+        self.root.destroy()
 
     def move_camera(self, dx, dy, dz):
         """Перемещение камеры в 3D"""
         self.camera_pos[0] += dx
         self.camera_pos[1] += dy
         self.camera_pos[2] += dz
-        self.draw_vr_scene()
+        self.scheduler.invalidate('vr', interactive=True)
 
     def update_ray_count(self, value):
         """Обновление количества лучей"""
         self.num_rays = int(float(value))
-        self.draw_vr_scene()
+        self.scheduler.invalidate('vr', interactive=True)
 
     def update_param(self, param):
         """Обновление параметра"""
@@ -263,295 +593,134 @@ class VRRayTracing3D:
             self.ray_intensity = self.param_vars[param].get()
         elif param == "Глубина отражений":
             self.reflection_depth = int(self.param_vars[param].get())
+            # Глубина общая для 3D сцены и 2D схемы
+            self.scheduler.invalidate('schema')
         elif param == "Показать нормали":
             self.show_normals = self.param_vars[param].get()
         elif param == "Показать сетку":
             self.show_grid = self.param_vars[param].get()
+        elif param == "Выборка лучей":
+            self.scene.sampler = self.param_vars[param].get()
+        elif param == "Прогрессивное накопление":
+            self.progressive_enabled = self.param_vars[param].get()
+            if not self.progressive_enabled:
+                self.progressive.clear()
+        elif param == "Оценка освещенности приемника":
+            self.energy_enabled = self.param_vars[param].get()
+        elif param == "Отрисовка":
+            self.set_render_backend(self.param_vars[param].get())
+        elif param == "Стерео (side-by-side)":
+            self.stereo_enabled = self.param_vars[param].get()
+            self.set_render_backend(self.render_backend)
+        elif param == "Межзрачковое расстояние, мм":
+            # Единица сцены - метр, шаг слайдера - 1 мм
+            self.ipd = self.param_vars[param].get() / 1000
+        elif param == "Параллельная трассировка":
+            self.set_parallel(self.param_vars[param].get())
+        
+        self.scheduler.invalidate('vr', interactive=True)
+
+    def set_parallel(self, enabled):
+        """
+        Включение трассировки в пуле процессов.
         
-        self.draw_vr_scene()
+        Результат не зависит от числа процессов. Трассировщик меняется
+        в потоке трассировки между заданиями (TraceWorker.call), поэтому
+        старый пул не закрывается под выполняющимся заданием.
+        """
+        tracer = ParallelTracer(min_parallel_rays=GUI_PARALLEL_RAYS) if enabled else None
+        
+        def swap():
+            old, self.path_cache.tracer = self.path_cache.tracer, tracer
+            if old is not None:
+                old.close()
+        
+        self.trace_worker.cancel()
+        self.pending_trace_key = None
+        self.trace_worker.call(swap)
+
+    def make_frame_image(self, width, height):
+        """Изображение для кадра растрового рендерера"""
+        return tk.PhotoImage(master=self.root, width=width, height=height)
+
+    def set_render_backend(self, name):
+        """Смена способа отрисовки VR сцены: элементы холста или растр, моно или стерео"""
+        self.render_backend = name
+        renderer = self.vr_renderers[name]
+        # Попиксельная трассировка - только моно
+        if self.stereo_enabled and name in self.stereo_renderers:
+            renderer = self.stereo_renderers[name]
+        if renderer is self.vr_renderer:
+            return
+        self.vr_renderer.clear()
+        self.vr_renderer = renderer
+        renderer.invalidate()
 
     def start_animation(self):
         """Запуск анимации"""
-        self.animation_running = True
-        self.animate()
+        if not self.animation_running:
+            self.animation_running = True
+            self.scheduler.add_animation(self.animate, 'vr')
 
     def stop_animation(self):
         """Остановка анимации"""
         self.animation_running = False
+        self.scheduler.remove_animation(self.animate)
 
-    def animate(self):
-        """Анимация вращения"""
+    def animate(self, dt):
+        """Анимация вращения (шаг кадра, dt - секунды с прошлого кадра)"""
         if self.animation_running:
-            self.animation_angle += 2
+            self.animation_angle += ANIMATION_SPEED * dt
             # Вращаем источник и приемник
-            self.source_3d = [
-                3 * math.cos(math.radians(self.animation_angle)),
-                1,
-                3 * math.sin(math.radians(self.animation_angle))
-            ]
-            self.target_3d = [
-                3 * math.cos(math.radians(self.animation_angle + 180)),
-                -1,
-                3 * math.sin(math.radians(self.animation_angle + 180))
-            ]
-            self.draw_vr_scene()
-            self.root.after(50, self.animate)
+            self.source_3d, self.target_3d = orbit_positions(self.animation_angle)
 
     def project_3d_to_2d(self, point):
         """
         Проекция 3D точки на 2D экран с эффектом VR
         """
-        # Перенос точки в систему координат камеры
-        dx = point[0] - self.camera_pos[0]
-        dy = point[1] - self.camera_pos[1]
-        dz = point[2] - self.camera_pos[2]
-        
-        # Вращение камеры
-        angle_rad = math.radians(self.camera_angle)
-        cos_a = math.cos(angle_rad)
-        sin_a = math.sin(angle_rad)
-        
-        x_rot = dx * cos_a - dz * sin_a
-        z_rot = dx * sin_a + dz * cos_a
-        y_rot = dy
-        
-        # Перспективная проекция
-        if z_rot > 0.1:  # Избегаем деления на ноль
-            fov = 500
-            scale = fov / z_rot
-            x_proj = self.width//2 + x_rot * scale
-            y_proj = self.height//2 - y_rot * scale
-            
-            # Добавляем эффект VR искажения
-            dist_factor = 1 + (z_rot / 10)
-            return (x_proj, y_proj, dist_factor)
-        
-        return None
+        return self.vr_renderer.projection().project_point(point)
 
     def draw_vr_scene(self):
         """Отрисовка 3D VR сцены"""
-        self.vr_canvas.delete("all")
-        
-        # Рисуем звездное небо (эффект VR)
-        self.draw_starry_sky()
-        
-        # Рисуем сетку пола
-        if self.show_grid:
-            self.draw_vr_grid()
-        
-        # Рисуем зеркала (сферы)
-        for mirror in self.mirrors_3d:
-            self.draw_sphere(mirror['pos'], mirror['radius'], mirror['color'], 
-                           mirror['reflectivity'])
-        
-        # Рисуем источник (светящаяся сфера)
-        self.draw_sphere(self.source_3d, 0.3, '#ff4444', 1.0, emissive=True)
-        
-        # Рисуем приемник
-        self.draw_sphere(self.target_3d, 0.3, '#ffff44', 1.0, emissive=True)
-        
-        # Рисуем лучи
-        self.draw_3d_rays()
+        # Слои (небо, сетка, сферы, лучи) перестраиваются только
+        # если изменилось то, от чего они зависят
+        self.vr_renderer.render()
         
         # Обновляем информацию
         self.update_vr_info()
 
-    def draw_starry_sky(self):
-        """Рисуем звездное небо для VR эффекта"""
-        import random
-        random.seed(42)  # Для постоянства звезд
-        
-        for _ in range(100):
-            x = random.randint(0, self.width)
-            y = random.randint(0, self.height)
-            brightness = random.randint(100, 255)
-            size = random.randint(1, 2)
-            color = f'#{brightness:02x}{brightness:02x}{brightness:02x}'
-            self.vr_canvas.create_oval(x-size, y-size, x+size, y+size, fill=color, outline='')
-
-    def draw_vr_grid(self):
-        """Рисуем 3D сетку пола"""
-        grid_size = 10
-        grid_spacing = 1.0
-        
-        for i in range(-grid_size, grid_size + 1):
-            for j in range(-grid_size, grid_size + 1):
-                # Линии вдоль X
-                p1 = self.project_3d_to_2d([i * grid_spacing, -1, j * grid_spacing])
-                p2 = self.project_3d_to_2d([i * grid_spacing, -1, (j + 1) * grid_spacing])
-                
-                if p1 and p2:
-                    alpha = max(0, min(255, int(100 * p1[2])))
-                    color = f'#00{alpha:02x}00'
-                    self.vr_canvas.create_line(p1[0], p1[1], p2[0], p2[1], 
-                                              fill=color, width=1)
-                
-                # Линии вдоль Z
-                p1 = self.project_3d_to_2d([i * grid_spacing, -1, j * grid_spacing])
-                p2 = self.project_3d_to_2d([(i + 1) * grid_spacing, -1, j * grid_spacing])
-                
-                if p1 and p2:
-                    alpha = max(0, min(255, int(100 * p1[2])))
-                    color = f'#00{alpha:02x}00'
-                    self.vr_canvas.create_line(p1[0], p1[1], p2[0], p2[1], 
-                                              fill=color, width=1)
-
-    def draw_sphere(self, pos, radius, color, reflectivity, emissive=False):
-        """Рисуем 3D сферу с эффектом освещения"""
-        proj = self.project_3d_to_2d(pos)
-        if not proj:
-            return
-        
-        x, y, dist = proj
-        
-        # Размер сферы зависит от расстояния
-        screen_radius = radius * 200 / dist
-        
-        # Рисуем окружность
-        if emissive:
-            # Светящийся объект (источник/приемник)
-            for i in range(3, 0, -1):
-                alpha = int(100 / i)
-                self.vr_canvas.create_oval(x - screen_radius*i, y - screen_radius*i,
-                                         x + screen_radius*i, y + screen_radius*i,
-                                         outline='', fill=color, width=0,
-                                         stipple='gray50' if i > 1 else '')
-        else:
-            # Зеркало с градиентом
-            self.vr_canvas.create_oval(x - screen_radius, y - screen_radius,
-                                     x + screen_radius, y + screen_radius,
-                                     outline='white', fill=color, width=2)
-            
-            # Блик
-            highlight_x = x - screen_radius * 0.3
-            highlight_y = y - screen_radius * 0.3
-            highlight_r = screen_radius * 0.2
-            self.vr_canvas.create_oval(highlight_x - highlight_r, highlight_y - highlight_r,
-                                     highlight_x + highlight_r, highlight_y + highlight_r,
-                                     fill='white', outline='', stipple='gray50')
-            
-            # Отражение (эффект зеркала)
-            if reflectivity > 0.7:
-                self.vr_canvas.create_oval(x - screen_radius*0.8, y - screen_radius*0.8,
-                                         x + screen_radius*0.8, y + screen_radius*0.8,
-                                         outline='cyan', width=1, dash=(2, 2))
-
-    def draw_3d_rays(self):
-        """Рисуем лучи в 3D пространстве"""
-        # Используем метод Монте-Карло для распределения лучей
-        for i in range(self.num_rays):
-            # Случайное направление в конусе
-            theta = random.uniform(0, 2 * math.pi)
-            phi = random.uniform(-math.pi/4, math.pi/4)  # Конус 90 градусов
-            
-            dx = math.cos(phi) * math.cos(theta)
-            dy = math.sin(phi)
-            dz = math.cos(phi) * math.sin(theta)
-            
-            # Нормализуем
-            length = math.sqrt(dx*dx + dy*dy + dz*dz)
-            direction = (dx/length, dy/length, dz/length)
-            
-            # Трассируем луч
-            self.trace_ray_3d(self.source_3d, direction, 0)
-
-    def trace_ray_3d(self, start, direction, depth):
-        """Рекурсивная трассировка луча в 3D"""
-        if depth > self.reflection_depth:
-            return
-        
-        # Поиск ближайшего пересечения
-        closest_hit = None
-        closest_dist = float('inf')
-        hit_mirror = None
-        
-        for mirror in self.mirrors_3d:
-            hit = self.ray_sphere_intersection(start, direction, 
-                                               mirror['pos'], mirror['radius'])
-            if hit and hit[0] > 0.01 and hit[0] < closest_dist:
-                closest_dist = hit[0]
-                closest_hit = hit[1]
-                hit_mirror = mirror
-        
-        if closest_hit:
-            # Рисуем луч до точки пересечения
-            end_proj = self.project_3d_to_2d(closest_hit)
-            start_proj = self.project_3d_to_2d(start)
-            
-            if start_proj and end_proj:
-                # Цвет зависит от глубины
-                intensity = self.ray_intensity * (1 - depth * 0.3)
-                color_val = int(255 * intensity)
-                colors = [(255, color_val, 0), (0, 255, color_val), 
-                         (color_val, 0, 255), (255, 0, color_val)]
-                color = f'#{colors[depth % 4][0]:02x}{colors[depth % 4][1]:02x}{colors[depth % 4][2]:02x}'
-                
-                self.vr_canvas.create_line(start_proj[0], start_proj[1],
-                                         end_proj[0], end_proj[1],
-                                         fill=color, width=3-depth, dash=(5, 3) if depth > 0 else ())
-            
-            # Нормаль в точке пересечения
-            if self.show_normals:
-                normal = (closest_hit[0] - hit_mirror['pos'][0],
-                         closest_hit[1] - hit_mirror['pos'][1],
-                         closest_hit[2] - hit_mirror['pos'][2])
-                normal_len = math.sqrt(normal[0]**2 + normal[1]**2 + normal[2]**2)
-                if normal_len > 0:
-                    normal_end = (closest_hit[0] + normal[0]/normal_len,
-                                 closest_hit[1] + normal[1]/normal_len,
-                                 closest_hit[2] + normal[2]/normal_len)
-                    
-                    norm_proj1 = self.project_3d_to_2d(closest_hit)
-                    norm_proj2 = self.project_3d_to_2d(normal_end)
-                    
-                    if norm_proj1 and norm_proj2:
-                        self.vr_canvas.create_line(norm_proj1[0], norm_proj1[1],
-                                                 norm_proj2[0], norm_proj2[1],
-                                                 fill='white', width=1, dash=(2, 2))
-            
-            # Вычисляем отраженный луч
-            normal = (closest_hit[0] - hit_mirror['pos'][0],
-                     closest_hit[1] - hit_mirror['pos'][1],
-                     closest_hit[2] - hit_mirror['pos'][2])
-            normal_len = math.sqrt(normal[0]**2 + normal[1]**2 + normal[2]**2)
-            if normal_len > 0:
-                normal = (normal[0]/normal_len, normal[1]/normal_len, normal[2]/normal_len)
-                
-                # R = V - 2(V·N)N
-                dot = direction[0]*normal[0] + direction[1]*normal[1] + direction[2]*normal[2]
-                reflected = (direction[0] - 2*dot*normal[0],
-                           direction[1] - 2*dot*normal[1],
-                           direction[2] - 2*dot*normal[2])
-                
-                # Продолжаем трассировку
-                self.trace_ray_3d(closest_hit, reflected, depth + 1)
-
-    def ray_sphere_intersection(self, start, direction, sphere_pos, sphere_radius):
-        """Проверка пересечения луча со сферой"""
-        oc = (start[0] - sphere_pos[0], start[1] - sphere_pos[1], start[2] - sphere_pos[2])
-        
-        a = direction[0]**2 + direction[1]**2 + direction[2]**2
-        b = 2*(oc[0]*direction[0] + oc[1]*direction[1] + oc[2]*direction[2])
-        c = oc[0]**2 + oc[1]**2 + oc[2]**2 - sphere_radius**2
-        
-        discriminant = b*b - 4*a*c
-        
-        if discriminant < 0:
-            return None
-        
-        t1 = (-b - math.sqrt(discriminant)) / (2*a)
-        t2 = (-b + math.sqrt(discriminant)) / (2*a)
-        
-        if t1 > 0:
-            return (t1, (start[0] + t1*direction[0],
-                        start[1] + t1*direction[1],
-                        start[2] + t1*direction[2]))
-        elif t2 > 0:
-            return (t2, (start[0] + t2*direction[0],
-                        start[1] + t2*direction[1],
-                        start[2] + t2*direction[2]))
-        
-        return None
+    def trace_status(self):
+        """Состояние трассировки для информационной панели"""
+        if self.trace_error is not None:
+            return f'ошибка ({self.trace_error})'
+        if isinstance(self.vr_renderer, PixelTraceRenderer):
+            block = self.vr_renderer.block()
+            if block is None:
+                return 'выполняется'
+            return f'пиксели, блок {block}x{block}'
+        tracing = self.pending_trace_key is not None and self.pending_trace_key[0] != 'energy'
+        return 'выполняется' if tracing else 'готово'
+
+    def retrace_status(self):
+        """Итог последней частичной перетрассировки (строка панели)"""
+        index = self.path_index
+        if index is None:
+            return ''
+        return (f'\n        Перетрассировано: {index.last_affected} '
+                f'из {index.num_rays} лучей')
+
+    def energy_status(self):
+        """Освещенность приемника (строки панели)"""
+        if not self.energy_enabled:
+            return ''
+        estimate = self.irradiance
+        if estimate is None or self.irradiance_key != self.energy_key():
+            return '\n        Приемник: оценка...'
+        error = f'±{estimate.rel_error:.1%}' if estimate.flux > 0 else 'нет попаданий'
+        return (f'\n        Приемник: E {estimate.irradiance:.4g} ({error})'
+                f'\n        Поток: {estimate.flux:.3%}, лучей {estimate.rays}'
+                f'{"" if estimate.converged else " (предел)"}'
+                f'\n        Отражений на луч: {estimate.mean_bounces:.2f}, рулетка {estimate.killed}')
 
     def update_vr_info(self):
         """Обновление информационной панели"""
@@ -559,130 +728,75 @@ class VRRayTracing3D:
         Камера: ({self.camera_pos[0]:.1f}, {self.camera_pos[1]:.1f}, {self.camera_pos[2]:.1f})
         Источник: ({self.source_3d[0]:.1f}, {self.source_3d[1]:.1f}, {self.source_3d[2]:.1f})
         Приемник: ({self.target_3d[0]:.1f}, {self.target_3d[1]:.1f}, {self.target_3d[2]:.1f})
-        Лучей: {self.num_rays}
+        Лучей: {self.num_rays}{f' (накоплено {self.progressive.rays})' if self.progressive_enabled else ''}
         Отражений: {self.reflection_depth}
+        Вид: {f'стерео (IPD {self.ipd:.3f})' if isinstance(self.vr_renderer, StereoRenderer) else 'моно'}
+        Трассировка: {self.trace_status()}{self.retrace_status()}{self.energy_status()}
+        Качество: {self.scheduler.quality:.0%} (кадр {self.scheduler.frame_ms:.1f} мс)
         """
+        if PROFILER.enabled:
+            # Итоги предыдущего кадра: текущий еще не завершен
+            info = info.rstrip(' ') + ''.join(f'        {line}\n' for line in PROFILER.summary(width=18))
         self.info_label.config(text=info)
 
+    def pick_projection(self, x):
+        """Проекция вида под курсором (в стерео - глаза, в чьей половине x)"""
+        if isinstance(self.vr_renderer, StereoRenderer):
+            return self.vr_renderer.projection_at(x)
+        return self.vr_renderer.projection()
+
+    def edit_pending(self):
+        """Ждет ли результата перетрассировка после правки зеркал"""
+        return self.pending_trace_key is not None and self.pending_trace_key[0] == 'edit'
+
+    def retrace_mirrors(self):
+        """Перетрассировка после изменения зеркал в потоке трассировки (retrace_edited)"""
+        key = ('edit', self.path_cache.scene_key(self.scene))
+        self.pending_trace_key = key
+        self.trace_worker.submit(('edit', key, 0, self.num_rays), ('edit', self.scene.copy(), 0))
+        # Пути полного качества: кадр без упрощения
+        self.scheduler.invalidate('vr')
+
+    def on_click_3d(self, event):
+        """Выбор зеркала в 3D для перетаскивания"""
+        projection = self.pick_projection(event.x)
+        centers, radii = self.scene.mirror_arrays()
+        picked = pick_mirror(projection, event.x, event.y, centers, radii)
+        if picked is None:
+            return
+        index, z = picked
+        grab = projection.unproject(event.x, event.y, z)
+        self.drag_mirror_3d = (index, z, centers[index] - grab)
+
+    def on_drag_3d(self, event):
+        """Перемещение зеркала в плоскости, параллельной экрану"""
+        if self.drag_mirror_3d is None:
+            return
+        index, z, offset = self.drag_mirror_3d
+        point = self.pick_projection(event.x).unproject(event.x, event.y, z)
+        self.mirrors_3d[index]['pos'] = tuple((point + offset).tolist())
+        self.retrace_mirrors()
+
+    def on_release_3d(self, event):
+        """Отпускание мыши в 3D"""
+        self.drag_mirror_3d = None
+
+    def on_wheel_3d(self, event, grow):
+        """Изменение радиуса зеркала под курсором колесом мыши"""
+        centers, radii = self.scene.mirror_arrays()
+        picked = pick_mirror(self.pick_projection(event.x), event.x, event.y, centers, radii)
+        if picked is None:
+            return
+        mirror = self.mirrors_3d[picked[0]]
+        mirror['radius'] = max(0.1, mirror['radius'] * (1.1 if grow else 1 / 1.1))
+        self.retrace_mirrors()
+
     def draw_schema_scene(self):
         """Отрисовка 2D схемы"""
-        self.schema_canvas.delete("all")
-        
-        # Рисуем сетку
-        for i in range(0, self.width, 50):
-            self.schema_canvas.create_line(i, 0, i, self.height, fill='#333')
-        for i in range(0, self.height, 50):
-            self.schema_canvas.create_line(0, i, self.width, i, fill='#333')
-        
-        # Рисуем зеркала
-        for mirror in self.mirrors_2d:
-            x, y = mirror['center']
-            r = mirror['radius']
-            color = mirror['color']
-            self.schema_canvas.create_oval(x-r, y-r, x+r, y+r,
-                                         outline=color, width=2, fill='')
-            self.schema_canvas.create_oval(x-3, y-3, x+3, y+3, fill=color)
-        
-        # Рисуем источник и приемник
-        self.schema_canvas.create_oval(self.source_2d[0]-8, self.source_2d[1]-8,
-                                     self.source_2d[0]+8, self.source_2d[1]+8,
-                                     fill='red', outline='white', width=2)
-        self.schema_canvas.create_text(self.source_2d[0], self.source_2d[1]-15,
-                                     text="ИСТОЧНИК", fill='white')
-        
-        self.schema_canvas.create_oval(self.target_2d[0]-8, self.target_2d[1]-8,
-                                     self.target_2d[0]+8, self.target_2d[1]+8,
-                                     fill='yellow', outline='white', width=2)
-        self.schema_canvas.create_text(self.target_2d[0], self.target_2d[1]-15,
-                                     text="ПРИЕМНИК", fill='white')
-        
-        # Рисуем лучи в 2D
-        self.draw_2d_rays()
-
-    def draw_2d_rays(self):
-        """Отрисовка лучей в 2D"""
-        # Прямой луч
-        direct_blocked = False
-        for mirror in self.mirrors_2d:
-            if self.check_line_circle_intersection(
-                self.source_2d, self.target_2d, mirror['center'], mirror['radius']):
-                direct_blocked = True
-                break
-        
-        if not direct_blocked:
-            self.schema_canvas.create_line(self.source_2d[0], self.source_2d[1],
-                                         self.target_2d[0], self.target_2d[1],
-                                         fill='green', width=2, dash=(5, 3))
-        
-        # Отраженные лучи
-        for mirror in self.mirrors_2d:
-            self.find_reflection_path_2d(mirror)
-
-    def check_line_circle_intersection(self, p1, p2, center, radius):
-        """Проверка пересечения линии с кругом в 2D"""
-        # Вектор направления
-        dx = p2[0] - p1[0]
-        dy = p2[1] - p1[1]
-        
-        # Вектор от начальной точки до центра
-        fx = p1[0] - center[0]
-        fy = p1[1] - center[1]
-        
-        a = dx*dx + dy*dy
-        b = 2*(fx*dx + fy*dy)
-        c = fx*fx + fy*fy - radius*radius
-        
-        discriminant = b*b - 4*a*c
-        
-        if discriminant > 0:
-            discriminant = math.sqrt(discriminant)
-            t1 = (-b - discriminant) / (2*a)
-            t2 = (-b + discriminant) / (2*a)
-            
-            if (0 <= t1 <= 1) or (0 <= t2 <= 1):
-                return True
-        
-        return False
-
-    def find_reflection_path_2d(self, mirror):
-        """Поиск пути с отражением в 2D"""
-        cx, cy = mirror['center']
-        r = mirror['radius']
-        
-        # Перебор углов для поиска точки отражения
-        for angle in range(0, 360, 10):
-            rad = math.radians(angle)
-            px = cx + r * math.cos(rad)
-            py = cy + r * math.sin(rad)
-            
-            # Проверяем, видна ли точка из источника
-            visible_from_source = True
-            for other in self.mirrors_2d:
-                if other != mirror and self.check_line_circle_intersection(
-                    self.source_2d, (px, py), other['center'], other['radius']):
-                    visible_from_source = False
-                    break
-            
-            if not visible_from_source:
-                continue
-            
-            # Проверяем, видна ли цель из точки
-            visible_to_target = True
-            for other in self.mirrors_2d:
-                if other != mirror and self.check_line_circle_intersection(
-                    (px, py), self.target_2d, other['center'], other['radius']):
-                    visible_to_target = False
-                    break
-            
-            if visible_to_target:
-                # Рисуем путь
-                self.schema_canvas.create_line(self.source_2d[0], self.source_2d[1],
-                                             px, py, fill='cyan', width=2)
-                self.schema_canvas.create_line(px, py, self.target_2d[0], self.target_2d[1],
-                                             fill='cyan', width=2)
-                self.schema_canvas.create_oval(px-4, py-4, px+4, py+4,
-                                             fill='white', outline='cyan')
-                break
+        # Сетка, зеркала, метки и пути перерисовываются только при изменении;
+        # при перетаскивании пересчитываются лишь проверки с участием
+        # сдвинутого объекта (vrrt.schema2d.SchemaSolver)
+        self.schema_renderer.render()
 
     def on_click_2d(self, event):
         """Обработка нажатия в 2D"""
@@ -726,7 +840,7 @@ class VRRayTracing3D:
             idx = int(self.drag_object_2d.split('_')[1])
             self.mirrors_2d[idx]['center'] = (new_x, new_y)
         
-        self.draw_schema_scene()
+        self.scheduler.invalidate('schema', interactive=True)
 
     def on_release_2d(self, event):
         """Отпускание мыши в 2D"""
@@ -738,24 +852,20 @@ class VRRayTracing3D:
 
     def reset_2d_scene(self):
         """Сброс 2D сцены"""
-        self.mirrors_2d = [
+        self.mirrors_2d = SphereStore.from_dicts([
             {'center': (300, 300), 'radius': 80, 'color': 'blue'},
             {'center': (600, 400), 'radius': 60, 'color': 'green'},
             {'center': (450, 200), 'radius': 50, 'color': 'purple'},
             {'center': (750, 500), 'radius': 70, 'color': 'orange'}
-        ]
+        ], key='center')
         self.source_2d = (100, 600)
         self.target_2d = (900, 100)
-        self.draw_schema_scene()
+        self.scheduler.invalidate('schema')
 
 def main():
     root = tk.Tk()
-    app = VRRayTracing3D(root)
-    
-    # Начальная отрисовка
-    app.draw_vr_scene()
-    app.draw_schema_scene()
-    
+    # Первый кадр видимой вкладки рисует планировщик, остальные - при показе
+    VRRayTracing3D(root)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+"""
+Бенчмарк ускоряющей структуры: время трассировки в зависимости от числа сфер.
+
+Сцены генерируются с постоянной долей занятого объема, поэтому число
+попаданий на луч примерно одинаково, и рост времени отражает только
+стоимость поиска пересечений. Для BVH наклон log(время)/log(сфер)
+должен быть заметно меньше 1 (сублинейный рост), для полного перебора - около 1.
+
+Запуск:
+    python benchmarks/bench_accel.py --rays 20000 --depth 3
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vrrt.accel import SphereBVH  # noqa: E402
+from vrrt.scene import Scene  # noqa: E402
+from vrrt.tracer import sample_cone_directions, trace_wavefront  # noqa: E402
+
+
+def best_time(func, repeat):
+    """Лучшее время из repeat запусков"""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--spheres', type=int, nargs='+',
+                        default=[100, 1000, 10000, 100000])
+    parser.add_argument('--rays', type=int, default=20000)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-brute', type=int, default=10000,
+                        help='полный перебор только до этого числа сфер')
+    args = parser.parse_args(argv)
+
+    directions = sample_cone_directions(args.rays, np.random.default_rng(0))
+    rows = []
+    print(f"{'сфер':>8} {'построение, мс':>15} {'BVH, мс':>10} {'перебор, мс':>12} {'отрезков':>9}")
+    for count in args.spheres:
+        scene = Scene.random(count, seed=count)
+        centers, radii = scene.mirror_arrays()
+
+        t0 = time.perf_counter()
+        bvh = SphereBVH(centers, radii)
+        build = time.perf_counter() - t0
+
+        segments = trace_wavefront(scene.source, directions, centers, radii,
+                                   args.depth, accel=bvh)
+        t_bvh = best_time(lambda: trace_wavefront(scene.source, directions, centers,
+                                                  radii, args.depth, accel=bvh),
+                          args.repeat)
+        t_brute = None
+        if count <= args.max_brute:
+            t_brute = best_time(lambda: trace_wavefront(scene.source, directions,
+                                                        centers, radii, args.depth),
+                                1)
+        rows.append((len(centers), t_bvh, t_brute))
+        brute_text = f'{t_brute * 1000:12.1f}' if t_brute is not None else f"{'-':>12}"
+        print(f'{len(centers):8d} {build * 1000:15.1f} {t_bvh * 1000:10.1f} '
+              f'{brute_text} {len(segments):9d}')
+
+    if len(rows) > 1:
+        m = np.log([row[0] for row in rows])
+        slope = np.polyfit(m, np.log([row[1] for row in rows]), 1)[0]
+        print(f'Наклон log(время BVH) / log(сфер): {slope:.2f}')
+        brute = [(row[0], row[2]) for row in rows if row[2] is not None]
+        if len(brute) > 1:
+            slope = np.polyfit(np.log([b[0] for b in brute]),
+                               np.log([b[1] for b in brute]), 1)[0]
+            print(f'Наклон log(время перебора) / log(сфер): {slope:.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Бенчмарк запуска интерфейса: время до первого кадра и фоновая нагрузка.
+
+Сравниваются два дерева исходников:
+    baseline - коммит до ленивых вкладок (--baseline, обязательный):
+               все вкладки строятся сразу, обе сцены рисуются
+               независимо от видимой вкладки
+    current  - рабочее дерево: строится и рисуется только видимая вкладка
+
+Хэш коммита меняется при rebase и слиянии, поэтому он не зашит в
+скрипт, а задается git выражением, например родителем коммита с
+ленивыми вкладками (см. README).
+
+Дерево baseline извлекается из git (git archive) во временную папку.
+Каждое дерево замеряется в отдельном процессе, чтобы его пакет vrrt
+не смешивался с пакетом другого дерева.
+
+Время до первого кадра - от создания окна до первого кадра
+планировщика. Фоновая нагрузка - процессорное время за --idle секунд
+на вкладке параметров при запущенной анимации VR сцены.
+
+Нужны git и дисплей (на сервере - например, xvfb-run):
+    python benchmarks/bench_startup.py --baseline <коммит> --repeat 5 --idle 3
+"""
+import argparse
+import importlib.util
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import tkinter as tk
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app_class(root):
+    """Класс приложения из 3dStyler.py дерева root (имя файла не импортируется напрямую)"""
+    sys.path.insert(0, root)
+    spec = importlib.util.spec_from_file_location('styler', os.path.join(root, '3dStyler.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.VRRayTracing3D
+
+
+def pump(root, until, timeout=10.0):
+    """Обработка событий Tk, пока until() не вернет True"""
+    deadline = time.perf_counter() + timeout
+    while not until() and time.perf_counter() < deadline:
+        root.update()
+
+
+def cold_start(app_class):
+    """Время (мс) от создания окна до первого кадра"""
+    t0 = time.perf_counter()
+    root = tk.Tk()
+    app = app_class(root)
+    pump(root, lambda: app.scheduler.frames > 0)
+    elapsed = (time.perf_counter() - t0) * 1000
+    app.on_close()
+    return elapsed
+
+
+def idle_cpu(app_class, seconds):
+    """Процессорное время (мс на секунду) на вкладке параметров с анимацией"""
+    root = tk.Tk()
+    app = app_class(root)
+    pump(root, lambda: app.scheduler.frames > 0)
+    app.start_animation()
+    app.notebook.select(app.params_frame)
+    frames = app.scheduler.frames
+    cpu = time.process_time()
+    end = time.perf_counter() + seconds
+    pump(root, lambda: time.perf_counter() >= end, timeout=seconds + 1)
+    used = (time.process_time() - cpu) * 1000 / seconds
+    frames = app.scheduler.frames - frames
+    app.on_close()
+    return used, frames
+
+
+def measure(root, repeat, seconds):
+    """Замеры дерева root в текущем процессе"""
+    app_class = load_app_class(root)
+    starts = [cold_start(app_class) for _ in range(repeat)]
+    cpu, frames = idle_cpu(app_class, seconds)
+    return {'start': statistics.median(starts), 'min': min(starts), 'cpu': cpu, 'frames': frames}
+
+
+def extract(rev, dest):
+    """Дерево исходников коммита rev в папку dest"""
+    data = subprocess.run(['git', '-C', ROOT, 'archive', '--format=tar', rev],
+                          capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        tar.extractall(dest)
+
+
+def run_tree(root, args):
+    """Замеры дерева root в отдельном процессе"""
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', root,
+                             '--repeat', str(args.repeat), '--idle', str(args.idle)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='запусков для времени старта')
+    parser.add_argument('--idle', type=float, default=3.0,
+                        help='секунд замера фоновой нагрузки')
+    parser.add_argument('--baseline', metavar='REV',
+                        help='коммит до ленивых вкладок (любое выражение git)')
+    parser.add_argument('--measure', metavar='ROOT', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if not args.measure and not args.baseline:
+        parser.error('нужен --baseline: коммит до ленивых вкладок')
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.repeat, args.idle)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as baseline_root:
+        extract(args.baseline, baseline_root)
+        results = {'baseline': run_tree(baseline_root, args), 'current': run_tree(ROOT, args)}
+
+    print(f"{'дерево':<9} {'старт, мс':>10} {'мин, мс':>9} {'CPU фон, мс/с':>14} {'кадров':>7}")
+    for name, row in results.items():
+        print(f"{name:<9} {row['start']:>10.1f} {row['min']:>9.1f} "
+              f"{row['cpu']:>14.1f} {row['frames']:>7}")
+    baseline, current = results['baseline'], results['current']
+    print(f"baseline - {args.baseline}. Старт: в {baseline['start'] / current['start']:.2f} раза "
+          f"быстрее, фоновая нагрузка: {current['cpu'] / baseline['cpu']:.0%} от прежней")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,452 @@
+"""
+Набор бенчмарков: трассировка, проекция, 2D схема, правка зеркала и
+отрисовка кадра.
+
+Запускается без окна: вместо tk.Canvas используется заглушка, которая
+только считает элементы и обращения. Перебираются число лучей, глубина
+отражений и число зеркал; для каждого случая сохраняются пропускная
+способность (лучей/с, отрезков/с), перцентили задержки и пиковая
+память (tracemalloc, отдельным прогоном, чтобы не искажать время).
+
+Результаты пишутся в JSON (с хэшем коммита и версиями) и CSV, чтобы
+сравнивать прогоны между коммитами:
+
+    python benchmarks/suite.py --quick
+    python benchmarks/suite.py --compare benchmarks/results/suite-<коммит>.json
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from vrrt.incremental import PathIndex  # noqa: E402
+from vrrt.pixeltrace import PixelTraceRenderer, SphereSet, render_pixels  # noqa: E402
+from vrrt.projection import Projection  # noqa: E402
+from vrrt.raster import RasterRenderer  # noqa: E402
+from vrrt.render import VRRenderer, VRView  # noqa: E402
+from vrrt.stereo import StereoRenderer  # noqa: E402
+from vrrt.scene import Scene  # noqa: E402
+from vrrt.schema2d import SchemaSolver  # noqa: E402
+from vrrt.tracer import trace_scene  # noqa: E402
+
+# Камера, смотрящая на центр случайной сцены
+CAMERA_POS = [5, 3, 10]
+CAMERA_ANGLE = 200
+
+# Параметры перебора: полный и быстрый (--quick) наборы
+SWEEPS = {
+    'full': {'rays': [100, 1000, 10000, 100000], 'depth': [1, 3, 5],
+             'mirrors': [5, 50, 500], 'points': [10000, 100000, 1000000],
+             'mirrors_2d': [5, 12, 30], 'depth_2d': [1, 2, 3], 'frames': 30},
+    'quick': {'rays': [100, 2000], 'depth': [1, 3], 'mirrors': [5, 50],
+              'points': [10000, 100000], 'mirrors_2d': [5, 12], 'depth_2d': [1, 2],
+              'frames': 10},
+}
+
+PERCENTILES = (50, 90, 99)
+
+
+class StubCanvas:
+    """Заглушка холста: считает элементы и обращения"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.items = set()
+        self._next = 1
+
+    def _create(self, kind, *args, **options):
+        self.calls['create'] += 1
+        item = self._next
+        self._next += 1
+        self.items.add(item)
+        return item
+
+    def create_line(self, *args, **options):
+        return self._create('line', *args, **options)
+
+    def create_oval(self, *args, **options):
+        return self._create('oval', *args, **options)
+
+    def create_image(self, *args, **options):
+        return self._create('image', *args, **options)
+
+    def delete(self, *items):
+        self.calls['delete'] += 1
+        self.items.difference_update(items)
+
+    def coords(self, item, *coords):
+        self.calls['coords'] += 1
+
+    def itemconfig(self, item, **options):
+        self.calls['itemconfig'] += 1
+
+    def tag_raise(self, *args):
+        self.calls['tag_raise'] += 1
+
+
+class StubImage:
+    """Заглушка PhotoImage для растровых рендереров"""
+
+    def __init__(self, width, height):
+        self.size = (width, height)
+
+    def configure(self, **options):
+        pass
+
+
+def commit_hash():
+    """Хэш текущего коммита (с пометкой о незафиксированных изменениях)"""
+    try:
+        head = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return head + ('-dirty' if dirty else '')
+
+
+def measure(func, repeat):
+    """Время каждого из repeat запусков (мс) и последний результат"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - t0) * 1000)
+    return times, result
+
+
+def peak_memory(func):
+    """Пиковый объем памяти Python (КБ) за один запуск func"""
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def summarize(times):
+    """Лучшее время и перцентили задержки (мс)"""
+    row = {'best_ms': min(times)}
+    for p in PERCENTILES:
+        row[f'p{p}_ms'] = float(np.percentile(times, p))
+    return row
+
+
+# --- Случаи ---
+
+def bench_trace(sweep, repeat):
+    """Трассировка: лучей/с и отрезков/с по числу лучей, глубине и зеркалам"""
+    rows = []
+    for mirrors in sweep['mirrors']:
+        scene = Scene.random(mirrors, seed=mirrors)
+        for depth in sweep['depth']:
+            for rays in sweep['rays']:
+                def run():
+                    return trace_scene(scene, rays, depth, np.random.default_rng(0))
+                times, segments = measure(run, repeat)
+                row = {'case': 'trace', 'rays': rays, 'depth': depth,
+                       'mirrors': len(scene.mirrors), **summarize(times)}
+                best = row['best_ms'] / 1000
+                row['rays_per_s'] = rays / best
+                row['segments_per_s'] = len(segments) / best
+                row['peak_kb'] = peak_memory(run)
+                rows.append(row)
+    return rows
+
+
+def bench_projection(sweep, repeat):
+    """Проекция массива точек: точек/с"""
+    rows = []
+    projection = Projection(CAMERA_POS, CAMERA_ANGLE, 1000, 700)
+    rng = np.random.default_rng(0)
+    for count in sweep['points']:
+        points = rng.uniform(-5, 5, (count, 3))
+        times, _ = measure(lambda: projection.project(points), repeat)
+        row = {'case': 'project', 'points': count, **summarize(times)}
+        row['points_per_s'] = count / (row['best_ms'] / 1000)
+        row['peak_kb'] = peak_memory(lambda: projection.project(points))
+        rows.append(row)
+    return rows
+
+
+def random_mirrors_2d(count, rng):
+    """Зеркала 2D схемы без пересечений с источником и приемником"""
+    mirrors = []
+    while len(mirrors) < count:
+        center = rng.uniform((150, 80), (750, 620))
+        radius = float(rng.uniform(15, 40))
+        if min(np.hypot(*(center - (100, 600))), np.hypot(*(center - (700, 100)))) > radius + 20:
+            mirrors.append({'center': center.tolist(), 'radius': radius})
+    return mirrors
+
+
+def bench_schema(sweep, repeat):
+    """2D схема: полный поиск путей и перерасчет при перетаскивании зеркала"""
+    rows = []
+    frames = sweep['frames']
+    for count in sweep['mirrors_2d']:
+        mirrors = random_mirrors_2d(count, np.random.default_rng(count))
+        for depth in sweep['depth_2d']:
+            def cold():
+                solver = SchemaSolver()
+                solver.update(mirrors, (100, 600), (700, 100), depth)
+                return solver
+            times, solver = measure(cold, repeat)
+            rows.append({'case': 'schema_full', 'mirrors': count, 'depth': depth,
+                         'paths': len(solver.paths), 'depth_reached': solver.depth_reached,
+                         **summarize(times), 'peak_kb': peak_memory(cold)})
+
+            # Перетаскивание: первое зеркало сдвигается на 2 пикселя за событие
+            dragged = [dict(m) for m in mirrors]
+
+            def drag():
+                x, y = dragged[0]['center']
+                dragged[0] = dict(dragged[0], center=[x + 2, y])
+                solver.update(dragged, (100, 600), (700, 100), depth)
+            times, _ = measure(drag, frames)
+            rows.append({'case': 'schema_drag', 'mirrors': count, 'depth': depth,
+                         'paths': len(solver.paths), 'depth_reached': solver.depth_reached,
+                         **summarize(times), 'peak_kb': peak_memory(drag)})
+    return rows
+
+
+def bench_edit(sweep, repeat):
+    """
+    Правка одного 3D зеркала: полная перетрассировка против частичной
+    (vrrt.incremental.PathIndex). Зеркало сдвигается на 0.05 за событие.
+    """
+    rows = []
+    frames = sweep['frames']
+    for mirrors in sweep['mirrors']:
+        for rays in sweep['rays']:
+            scene = Scene.random(mirrors, seed=mirrors)
+            scene.num_rays, scene.reflection_depth = rays, 3
+            moved = scene.mirrors[0]
+            shift = [0.05]
+            base = {'mirrors': len(scene.mirrors), 'rays': rays, 'depth': 3}
+
+            def nudge():
+                # Туда и обратно: сцена не уходит от исходной
+                shift[0] = -shift[0]
+                x, y, z = moved['pos']
+                moved['pos'] = (x + shift[0], y, z)
+
+            def full():
+                nudge()
+                return trace_scene(scene, rng=np.random.default_rng(0))
+            times, _ = measure(full, frames)
+            rows.append({'case': 'edit_full', **base, **summarize(times)})
+
+            index = PathIndex.from_scene(scene, trace_scene(scene, rng=np.random.default_rng(0)))
+            affected = []
+
+            def incremental():
+                nudge()
+                segments = index.update_scene(scene)
+                affected.append(index.last_affected)
+                return segments
+            times, _ = measure(incremental, frames)
+            rows.append({'case': 'edit_incremental', **base, **summarize(times),
+                         'affected_rays': float(np.mean(affected)),
+                         'peak_kb': peak_memory(incremental)})
+    return rows
+
+
+def make_renderer(backend, canvas, view, prefix='vr', origin=(0, 0)):
+    if backend == 'canvas':
+        return VRRenderer(canvas, view, prefix, origin)
+    if backend == 'raster':
+        return RasterRenderer(canvas, view, StubImage, prefix, origin)
+    if backend.endswith('_stereo'):
+        mono = backend[:-len('_stereo')]
+        return StereoRenderer(view, lambda eye, prefix, origin:
+                              make_renderer(mono, canvas, eye, prefix, origin))
+    raise ValueError(backend)
+
+
+def bench_frames(sweep, repeat):
+    """
+    Полный кадр VR (трассировка через кэш + отрисовка) на заглушке холста.
+
+    cold  - новый рендерер и пустой кэш путей (все слои и трассировка)
+    orbit - поворот камеры: пути из кэша, все слои перестраиваются
+    rays  - смена интенсивности: перестраивается только слой лучей
+
+    Варианты *_stereo - стереопара из двух глаз с общими путями лучей.
+    """
+    rows = []
+    frames = sweep['frames']
+    for backend in ('canvas', 'raster', 'canvas_stereo', 'raster_stereo'):
+        for mirrors in sweep['mirrors']:
+            for rays in sweep['rays']:
+                if rays > 10000:
+                    continue
+                scene = Scene.random(mirrors, seed=mirrors, extent=5.0)
+                scene.num_rays = rays
+                scene.reflection_depth = 3
+
+                def new_view():
+                    view = VRView(scene)
+                    view.camera_pos = list(CAMERA_POS)
+                    view.camera_angle = CAMERA_ANGLE
+                    return view
+
+                def cold():
+                    canvas = StubCanvas()
+                    make_renderer(backend, canvas, new_view()).render()
+                    return canvas
+                times, canvas = measure(cold, repeat)
+                base = {'backend': backend, 'mirrors': len(scene.mirrors), 'rays': rays,
+                        'depth': scene.reflection_depth}
+                rows.append({'case': 'frame_cold', **base, **summarize(times),
+                             'items': len(canvas.items), 'peak_kb': peak_memory(cold)})
+
+                canvas = StubCanvas()
+                view = new_view()
+                renderer = make_renderer(backend, canvas, view)
+                renderer.render()
+
+                def orbit():
+                    view.camera_angle += 1
+                    renderer.render()
+
+                def intensity():
+                    scene.ray_intensity = 0.5 if scene.ray_intensity != 0.5 else 0.8
+                    renderer.render()
+
+                for name, step in (('frame_orbit', orbit), ('frame_rays', intensity)):
+                    canvas.calls.clear()
+                    times, _ = measure(step, frames)
+                    calls = sum(canvas.calls.values()) / frames
+                    rows.append({'case': name, **base, **summarize(times),
+                                 'fps': 1000 / float(np.percentile(times, 50)),
+                                 'canvas_calls': calls, 'items': len(canvas.items),
+                                 'peak_kb': peak_memory(step)})
+    return rows
+
+
+def bench_pixels(sweep, repeat):
+    """Попиксельная трассировка одного уровня (блок 4x4 и полный кадр)"""
+    rows = []
+    projection = Projection(CAMERA_POS, CAMERA_ANGLE, 1000, 700)
+    view = VRView()
+    objects = PixelTraceRenderer(StubCanvas(), view).sphere_objects()
+    spheres = SphereSet(objects, view.scene.source)
+    for block in (4, 1):
+        def run():
+            return render_pixels(spheres, projection, view.scene.reflection_depth, block)
+        times, image = measure(run, 1 if block == 1 else repeat)
+        row = {'case': 'pixels', 'block': block, 'depth': view.scene.reflection_depth,
+               **summarize(times)}
+        row['rays_per_s'] = image.shape[0] * image.shape[1] / (row['best_ms'] / 1000)
+        rows.append(row)
+    return rows
+
+
+BENCHMARKS = {
+    'trace': bench_trace,
+    'project': bench_projection,
+    'schema': bench_schema,
+    'edit': bench_edit,
+    'frame': bench_frames,
+    'pixels': bench_pixels,
+}
+
+
+# --- Результаты ---
+
+def case_id(row):
+    """Идентификатор случая для сравнения прогонов"""
+    params = ('backend', 'mirrors', 'rays', 'depth', 'points', 'block')
+    return row['case'] + ''.join(f' {p}={row[p]}' for p in params if p in row)
+
+
+def write_results(rows, meta, output):
+    """Запись JSON и CSV; возвращает путь к JSON"""
+    os.makedirs(output, exist_ok=True)
+    stem = os.path.join(output, f"suite-{meta['commit']}-{meta['timestamp']}")
+    with open(stem + '.json', 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'results': rows}, f, ensure_ascii=False, indent=1)
+
+    columns = ['commit', 'case']
+    for row in rows:
+        columns += [key for key in row if key not in columns]
+    with open(stem + '.csv', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({'commit': meta['commit'], **row})
+    return stem + '.json'
+
+
+def compare(rows, path):
+    """Сравнение медианной задержки с сохраненным прогоном"""
+    with open(path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    old = {case_id(row): row for row in baseline['results']}
+    print(f"\nСравнение с {baseline['meta']['commit']} (p50, мс):")
+    for row in rows:
+        before = old.get(case_id(row))
+        if before is None:
+            continue
+        ratio = row['p50_ms'] / before['p50_ms'] if before['p50_ms'] > 0 else float('nan')
+        print(f"  {case_id(row):55} {before['p50_ms']:9.2f} -> {row['p50_ms']:9.2f}  "
+              f"x{ratio:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='сокращенный перебор')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS),
+                        help='запустить только указанные группы')
+    parser.add_argument('--repeat', type=int, default=5, help='повторов на случай')
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results'),
+                        help='каталог для JSON и CSV')
+    parser.add_argument('--compare', help='JSON прошлого прогона для сравнения')
+    args = parser.parse_args(argv)
+
+    sweep = SWEEPS['quick' if args.quick else 'full']
+    meta = {
+        'commit': commit_hash(),
+        'timestamp': time.strftime('%Y%m%d-%H%M%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'sweep': 'quick' if args.quick else 'full',
+        'repeat': args.repeat,
+    }
+
+    rows = []
+    for name in args.only or BENCHMARKS:
+        t0 = time.perf_counter()
+        group = BENCHMARKS[name](sweep, args.repeat)
+        rows += group
+        print(f'{name}: {len(group)} случаев за {time.perf_counter() - t0:.1f} с')
+        for row in group:
+            print(f"  {case_id(row):55} p50 {row['p50_ms']:9.2f} мс  p99 {row['p99_ms']:9.2f} мс")
+
+    path = write_results(rows, meta, args.output)
+    print(f'Результаты: {path} (и .csv)')
+    if args.compare:
+        compare(rows, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""Общие помощники тестов: корень репозитория в sys.path и сравнение путей"""
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def sorted_segments(segments):
+    """Поля отрезков в порядке (луч, отражение) - для сравнения независимо от порядка"""
+    order = np.lexsort((segments.depth, segments.ray))
+    return {name: getattr(segments, name)[order] for name in segments.__slots__}
+
+
+def assert_same_paths(actual, expected, atol=1e-9):
+    """Одинаковые наборы отрезков (номера точно, координаты с допуском)"""
+    a, b = sorted_segments(actual), sorted_segments(expected)
+    for name in ('ray', 'depth', 'mirror'):
+        np.testing.assert_array_equal(a[name], b[name], err_msg=name)
+    for name in ('starts', 'ends', 'normals'):
+        np.testing.assert_allclose(a[name], b[name], atol=atol, err_msg=name)
@@ -0,0 +1,75 @@
+"""BVH над сферами против полного перебора"""
+import numpy as np
+
+from conftest import assert_same_paths
+from vrrt.accel import SphereBVH
+from vrrt.scene import Scene
+from vrrt.tracer import nearest_sphere_hits, sample_cone_directions, trace_wavefront
+
+
+def random_rays(rng, n, extent):
+    origins = rng.uniform(-extent, extent, (n, 3))
+    directions = rng.normal(size=(n, 3))
+    return origins, directions / np.linalg.norm(directions, axis=1)[:, None]
+
+
+def assert_same_hits(bvh, origins, directions, centers, radii):
+    t, idx = bvh.nearest_hit(origins, directions)
+    t_ref, idx_ref = nearest_sphere_hits(origins, directions, centers, radii)
+    np.testing.assert_array_equal(idx, idx_ref)
+    hit = idx_ref >= 0
+    np.testing.assert_allclose(t[hit], t_ref[hit], rtol=1e-12)
+    assert hit.any() and not hit.all()
+
+
+def test_nearest_hit_matches_brute_force():
+    rng = np.random.default_rng(0)
+    scene = Scene.random(300, seed=1, extent=4.0)
+    centers, radii = scene.mirror_arrays()
+    origins, directions = random_rays(rng, 3000, 4.0)
+    assert_same_hits(SphereBVH(centers, radii), origins, directions, centers, radii)
+
+
+def test_update_matches_rebuild():
+    rng = np.random.default_rng(2)
+    scene = Scene.random(200, seed=3, extent=4.0)
+    centers, radii = (a.copy() for a in scene.mirror_arrays())
+    bvh = SphereBVH(centers, radii)
+    for _ in range(20):
+        i = int(rng.integers(len(radii)))
+        centers[i] += rng.normal(0, 0.5, 3)
+        radii[i] *= rng.uniform(0.5, 2.0)
+        bvh.update(i, centers[i], radii[i])
+    origins, directions = random_rays(rng, 2000, 4.0)
+    assert_same_hits(bvh, origins, directions, centers, radii)
+
+    # Сдвиг многих сфер сразу (sync делает refit)
+    centers += rng.normal(0, 0.3, centers.shape)
+    bvh.sync(centers, radii)
+    assert_same_hits(bvh, origins, directions, centers, radii)
+
+
+def test_trace_with_bvh_matches_brute_force():
+    scene = Scene.random(150, seed=5, extent=3.0)
+    centers, radii = scene.mirror_arrays()
+    directions = sample_cone_directions(1000, np.random.default_rng(4))
+    plain = trace_wavefront(scene.source, directions, centers, radii, 6)
+    fast = trace_wavefront(scene.source, directions, centers, radii, 6,
+                           accel=SphereBVH(centers, radii))
+    assert_same_paths(fast, plain, atol=1e-12)
+
+
+def test_copies_reuse_worker_bvh():
+    rng = np.random.default_rng(6)
+    scene = Scene.random(100, seed=7, extent=4.0)
+    bvh = scene.copy().attach_accelerator(None)
+    for _ in range(5):
+        mirror = scene.mirrors[int(rng.integers(len(scene.mirrors)))]
+        mirror['pos'] = np.array(mirror['pos']) + rng.normal(0, 0.5, 3)
+        copy = scene.copy()
+        assert copy.attach_accelerator(bvh) is bvh
+        centers, radii = copy.mirror_arrays()
+        origins, directions = random_rays(rng, 1000, 4.0)
+        assert_same_hits(bvh, origins, directions, centers, radii)
+    # Зеркал стало меньше порога - дерево не нужно
+    assert Scene().attach_accelerator(bvh) is None
@@ -0,0 +1,37 @@
+"""Энергия лучей: рулетка как в основном трассировщике и несмещенность оценки"""
+import numpy as np
+
+from vrrt.energy import estimate_irradiance, trace_energy
+from vrrt.sampling import sample_directions
+from vrrt.scene import Scene
+from vrrt.tracer import Roulette, trace_scene
+
+
+def test_roulette_matches_main_tracer():
+    # Приемник вне пучка: энергия никуда не доставляется, лучи гаснут как в trace_scene
+    scene = Scene.random(80, seed=1, extent=3.0)
+    scene.sampler = 'sobol'
+    scene.mirrors.reflectivity[:] = np.linspace(0.2, 0.9, len(scene.mirrors))
+    centers, radii = scene.mirror_arrays()
+    directions = sample_directions('sobol', 2000, 500)
+    roulette = Roulette(scene.mirrors.reflectivity, 0.3, seed=4, first_ray=500)
+    received, bounces, killed = trace_energy(scene.source, directions, centers, radii,
+                                             roulette, receiver=(100, 100, 100),
+                                             max_depth=10)
+    segments = trace_scene(scene, 2000, 10, start=500, roulette=0.3, seed=4)
+
+    assert not received.any()
+    assert killed > 0
+    np.testing.assert_array_equal(bounces, np.bincount(segments.ray - 500, minlength=2000))
+
+
+def test_roulette_keeps_estimate_unbiased():
+    scene = Scene()
+    scene.mirrors.reflectivity[:] = 0.5
+    plain = estimate_irradiance(scene, rel_error=0, max_rays=40000, threshold=0.0, seed=1)
+    cut = estimate_irradiance(scene, rel_error=0, max_rays=40000, threshold=0.4, seed=1)
+    assert plain.flux > 0
+    assert plain.killed == 0 and cut.killed > 0
+    assert cut.mean_bounces < plain.mean_bounces
+    error = np.hypot(plain.std_error, cut.std_error)
+    assert abs(cut.flux - plain.flux) < 4 * error
@@ -0,0 +1,101 @@
+"""Потоковая выгрузка путей: содержимое файлов и дописывание"""
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from vrrt.export import CSV_COLUMNS, RECORD_DTYPE, NPYWriter, export_paths, iter_segments
+from vrrt.scene import Scene
+from vrrt.tracer import RaySegments, trace_scene
+
+
+@pytest.fixture
+def scene():
+    scene = Scene.random(40, seed=2, extent=3.0)
+    scene.sampler = 'halton'
+    return scene
+
+
+def read_ndjson(path):
+    with open(path, encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f]
+    return {'ray': [r['ray'] for r in rows], 'depth': [r['depth'] for r in rows],
+            'mirror': [r['mirror'] for r in rows], 'origin': [r['origin'] for r in rows],
+            'hit': [r['hit'] for r in rows], 'normal': [r['normal'] for r in rows]}
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        assert tuple(next(reader)) == CSV_COLUMNS
+        table = np.array([[float(v) for v in row] for row in reader])
+    return {'ray': table[:, 0], 'depth': table[:, 1], 'mirror': table[:, 2],
+            'origin': table[:, 3:6], 'hit': table[:, 6:9], 'normal': table[:, 9:12]}
+
+
+def assert_records(records, segments, atol):
+    np.testing.assert_array_equal(records['ray'], segments.ray)
+    np.testing.assert_array_equal(records['depth'], segments.depth)
+    np.testing.assert_array_equal(records['mirror'], segments.mirror)
+    np.testing.assert_allclose(records['origin'], segments.starts, atol=atol)
+    np.testing.assert_allclose(records['hit'], segments.ends, atol=atol)
+    np.testing.assert_allclose(records['normal'], segments.normals, atol=atol)
+
+
+@pytest.mark.parametrize('fmt, read, atol', [('ndjson', read_ndjson, 1e-7),
+                                             ('csv', read_csv, 1e-7),
+                                             ('npy', np.load, 0)])
+def test_export_matches_chunked_trace(tmp_path, scene, fmt, read, atol):
+    path = tmp_path / f'paths.{fmt}'
+    progress = []
+    written = export_paths(scene, str(path), num_rays=1000, depth=5, chunk_rays=300,
+                           progress=lambda rays, count: progress.append(rays))
+    expected = RaySegments.concatenate(list(iter_segments(scene, 1000, 5, 300)))
+    assert written == len(expected) > 0
+    assert progress == [300, 600, 900, 1000]
+    assert_records(read(str(path)), expected, atol)
+
+
+def test_chunks_do_not_change_halton_paths(tmp_path, scene):
+    export_paths(scene, str(tmp_path / 'a.npy'), num_rays=1000, depth=5, chunk_rays=300)
+    whole = trace_scene(scene, 1000, 5)
+    records = np.load(str(tmp_path / 'a.npy'))
+    order = np.lexsort((records['depth'], records['ray']))
+    whole_order = np.lexsort((whole.depth, whole.ray))
+    np.testing.assert_array_equal(records['ray'][order], whole.ray[whole_order])
+    np.testing.assert_array_equal(records['hit'][order], whole.ends[whole_order])
+
+
+@pytest.mark.parametrize('fmt, read', [('npy', np.load), ('csv', read_csv),
+                                       ('ndjson', read_ndjson)])
+def test_append_continues_rays(tmp_path, scene, fmt, read):
+    path = str(tmp_path / f'paths.{fmt}')
+    first = export_paths(scene, path, num_rays=200, depth=4, chunk_rays=70)
+    last = int(np.max(read(path)['ray']))
+    second = export_paths(scene, path, num_rays=200, depth=4, chunk_rays=70, append=True)
+    records = read(path)
+    if fmt == 'npy':
+        assert np.load(path, mmap_mode='r').dtype == RECORD_DTYPE
+    assert len(records['ray']) == first + second
+
+    # Дописанные лучи - продолжение выборки с номера last + 1, без повторов
+    expected = RaySegments.concatenate(list(iter_segments(scene, 200, 4, 70, start=last + 1)))
+    assert second == len(expected) > 0
+    appended = {name: np.asarray(records[name])[first:] for name in RECORD_DTYPE.names}
+    assert_records(appended, expected, 1e-7)
+    keys = list(zip(records['ray'], records['depth']))
+    assert len(set(keys)) == len(keys)
+
+
+def test_append_to_missing_file_starts_at_zero(tmp_path, scene):
+    path = str(tmp_path / 'new.npy')
+    export_paths(scene, path, num_rays=100, depth=3, append=True)
+    assert np.load(path)['ray'].min() == 0
+
+
+def test_npy_append_rejects_foreign_file(tmp_path):
+    path = str(tmp_path / 'other.npy')
+    np.save(path, np.zeros(3))
+    with pytest.raises(ValueError):
+        NPYWriter(path, append=True)
@@ -0,0 +1,58 @@
+"""Инкрементальная перетрассировка против полной после правки зеркал"""
+import numpy as np
+import pytest
+
+from conftest import assert_same_paths
+from vrrt.incremental import (INCREMENTAL_MIN_MIRRORS, INCREMENTAL_MIRRORS, PathIndex,
+                              prefer_incremental)
+from vrrt.scene import Scene
+from vrrt.tracer import trace_scene
+
+
+def full_trace(scene, seed=0):
+    """Полная трассировка кадра - как PathCache.trace с зерном seed"""
+    return trace_scene(scene, rng=np.random.default_rng(seed))
+
+
+@pytest.mark.parametrize('num_mirrors, sampler', [(5, 'random'), (60, 'random'),
+                                                  (60, 'halton')])
+def test_edits_match_full_trace(num_mirrors, sampler):
+    rng = np.random.default_rng(num_mirrors)
+    scene = Scene.random(num_mirrors, seed=3, extent=3.0)
+    scene.num_rays = 400
+    scene.reflection_depth = 5
+    scene.sampler = sampler
+    index = PathIndex.from_scene(scene, full_trace(scene))
+    assert index.matches(scene)
+
+    for _ in range(25):
+        mirror = scene.mirrors[int(rng.integers(num_mirrors))]
+        if rng.random() < 0.7:
+            mirror['pos'] = np.array(mirror['pos']) + rng.normal(0, 0.4, 3)
+        else:
+            mirror['radius'] = mirror['radius'] * rng.uniform(0.6, 1.6)
+        assert_same_paths(index.update_scene(scene), full_trace(scene))
+
+
+def test_unchanged_scene_keeps_paths():
+    scene = Scene.random(40, seed=1, extent=3.0)
+    scene.num_rays = 300
+    segments = full_trace(scene, seed=5)
+    index = PathIndex.from_scene(scene, segments, seed=5)
+    assert_same_paths(index.update_scene(scene), segments)
+    assert index.last_affected == 0
+
+
+def test_index_invalidated_by_scene_parameters():
+    scene = Scene()
+    index = PathIndex.from_scene(scene, full_trace(scene))
+    scene.source = [0, 0, 0]
+    assert not index.matches(scene)
+    assert not index.matches(Scene(), seed=1)
+
+
+def test_prefer_incremental():
+    assert prefer_incremental(INCREMENTAL_MIRRORS, 1)
+    assert not prefer_incremental(INCREMENTAL_MIN_MIRRORS - 1, 10 ** 6)
+    assert not prefer_incremental(INCREMENTAL_MIN_MIRRORS, 1)
+    assert prefer_incremental(INCREMENTAL_MIN_MIRRORS, 10 ** 6)
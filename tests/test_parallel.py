@@ -0,0 +1,47 @@
+"""Параллельная трассировка дает те же пути, что и последовательная"""
+import numpy as np
+import pytest
+
+from conftest import assert_same_paths
+from vrrt.parallel import ParallelTracer
+from vrrt.scene import Scene
+from vrrt.tracer import RaySegments, trace_scene
+
+
+@pytest.fixture(scope='module')
+def tracer():
+    with ParallelTracer(workers=2, min_parallel_rays=1) as tracer:
+        yield tracer
+
+
+def assert_identical(actual, expected):
+    for name in RaySegments.__slots__:
+        np.testing.assert_array_equal(getattr(actual, name), getattr(expected, name),
+                                      err_msg=name)
+
+
+@pytest.mark.parametrize('num_mirrors', [5, 80])
+def test_parallel_matches_serial(tracer, num_mirrors):
+    scene = Scene.random(num_mirrors, seed=1, extent=3.0)
+    scene.sampler = 'sobol'
+    serial = trace_scene(scene, 3000, 6, start=500)
+    parallel = tracer.trace_scene(scene, 3000, 6, start=500)
+    assert len(serial) > 0
+    assert_identical(parallel, serial)
+
+
+def test_parallel_roulette_matches_serial(tracer):
+    scene = Scene.random(120, seed=2, extent=3.0)
+    scene.sampler = 'sobol'
+    scene.mirrors.reflectivity[:] = 0.4
+    serial = trace_scene(scene, 3000, 10, roulette=0.3, seed=7)
+    parallel = tracer.trace_scene(scene, 3000, 10, roulette=0.3, seed=7)
+    assert_same_paths(parallel, serial, atol=0)
+
+
+def test_small_batch_stays_in_process():
+    scene = Scene()
+    with ParallelTracer(workers=2) as tracer:
+        segments = tracer.trace_scene(scene, 36, 3, np.random.default_rng(0))
+        assert tracer._pool is None
+    assert_identical(segments, trace_scene(scene, 36, 3, np.random.default_rng(0)))
@@ -0,0 +1,28 @@
+"""Детерминированные выборки: продолжение совпадает с полной последовательностью"""
+import numpy as np
+import pytest
+
+from vrrt.sampling import halton_points, sample_directions, sobol_points
+
+
+@pytest.mark.parametrize('points', [halton_points, sobol_points])
+def test_any_split_matches_full_sequence(points):
+    full = points(0, 64)
+    for start in range(64):
+        for count in range(1, 65 - start):
+            np.testing.assert_array_equal(points(start, count), full[start:start + count],
+                                          err_msg=f'{start}, {count}')
+
+
+def test_sobol_points_are_distinct_and_in_square():
+    points = sobol_points(0, 1024)
+    assert ((points >= 0) & (points < 1)).all()
+    assert len(np.unique(points, axis=0)) == len(points)
+
+
+@pytest.mark.parametrize('method', ['halton', 'sobol'])
+def test_directions_continue_across_batches(method):
+    whole = sample_directions(method, 1000)
+    parts = [sample_directions(method, 300, start) for start in (0, 300, 600)]
+    parts.append(sample_directions(method, 100, 900))
+    np.testing.assert_array_equal(np.concatenate(parts), whole)
@@ -0,0 +1,81 @@
+"""Планировщик кадров: объединение запросов, скрытые цели и качество"""
+from vrrt.scheduler import FrameScheduler
+
+
+class FakeLoop:
+    """Отложенные вызовы и часы без Tk: время идет только в run()"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.calls = []
+
+    def after(self, ms, callback):
+        self.calls.append((self.now + ms / 1000, callback))
+
+    def clock(self):
+        return self.now
+
+    def run(self, seconds):
+        end = self.now + seconds
+        while True:
+            due = [c for c in self.calls if c[0] <= end]
+            if not due:
+                break
+            call = min(due, key=lambda c: c[0])
+            self.calls.remove(call)
+            self.now = max(self.now, call[0])
+            call[1]()
+        self.now = end
+
+
+def make_scheduler(loop, frames):
+    return FrameScheduler(loop.after, lambda targets: frames.append(set(targets)),
+                          quality_targets=('vr',), clock=loop.clock)
+
+
+def test_requests_coalesce_into_one_frame():
+    loop, frames = FakeLoop(), []
+    scheduler = make_scheduler(loop, frames)
+    for _ in range(5):
+        scheduler.invalidate('vr')
+    scheduler.invalidate('schema')
+    loop.run(0.1)
+    assert frames == [{'vr', 'schema'}]
+
+
+def test_hidden_targets_wait_until_shown():
+    loop, frames = FakeLoop(), []
+    scheduler = make_scheduler(loop, frames)
+    scheduler.set_visible('schema')
+    scheduler.invalidate('vr')
+    loop.run(0.1)
+    assert frames == []
+    scheduler.set_visible('vr')
+    loop.run(0.1)
+    assert frames == [{'vr'}]
+
+
+def test_hidden_animation_does_not_hold_reduced_quality():
+    loop, frames = FakeLoop(), []
+    scheduler = make_scheduler(loop, frames)
+    scheduler.set_visible('vr')
+    scheduler.add_animation(lambda dt: None, 'vr')
+    loop.run(1.0)
+    assert scheduler.interacting()
+    scheduler.quality = 0.3
+
+    # Анимация VR сцены продолжает числиться, но ее вкладка скрыта
+    scheduler.set_visible('schema')
+    assert not scheduler.interacting()
+    loop.run(1.0)
+    assert scheduler.quality == 1.0
+
+    # При показе анимация снова считается взаимодействием, а после ее
+    # остановки качество восстанавливается
+    scheduler.set_visible('vr')
+    assert scheduler.interacting()
+    scheduler.quality = 0.3
+    scheduler.remove_animation(scheduler._animations[0][0])
+    loop.run(1.0)
+    assert not scheduler.interacting()
+    assert scheduler.quality == 1.0
@@ -0,0 +1,135 @@
+"""Точки отражения 2D схемы: задача Альхазена, метод Ньютона, инкрементальный решатель"""
+import numpy as np
+import pytest
+
+from vrrt.schema2d import (SchemaSolver, _initial_angles, _polar, mirror_sequences,
+                           reflection_law, single_reflections, solve_sequences)
+
+SOURCE = np.array([100.0, 600.0])
+TARGET = np.array([700.0, 100.0])
+
+
+def random_mirrors(rng, n):
+    return rng.uniform(150, 650, (n, 2)), rng.uniform(15, 40, n)
+
+
+def test_single_reflections_satisfy_reflection_law():
+    centers, radii = random_mirrors(np.random.default_rng(0), 30)
+    mirror, theta = single_reflections(SOURCE, TARGET, centers, radii)
+    f, valid = reflection_law(theta, centers[mirror], radii[mirror], SOURCE, TARGET)
+    assert valid.all()
+    np.testing.assert_allclose(f, 0, atol=1e-9)
+
+    # Плотная сетка углов не находит корней, которых нет в ответе
+    dense = np.linspace(0, 2 * np.pi, 20001)
+    f, valid = reflection_law(dense[None, :], centers[:, None, :], radii[:, None],
+                              SOURCE, TARGET)
+    bracket = ((f[:, :-1] < 0) != (f[:, 1:] < 0)) & (valid[:, :-1] | valid[:, 1:])
+    m, k = np.nonzero(bracket)
+    assert len(m) == len(mirror)
+    for i, t in zip(m, dense[k]):
+        gap = np.angle(np.exp(1j * (theta[mirror == i] - t)))
+        assert np.abs(gap).min() < 1e-3
+
+
+@pytest.mark.parametrize('bounces', [2, 3])
+def test_newton_paths_obey_reflection_law(bounces):
+    centers, radii = random_mirrors(np.random.default_rng(bounces), 6)
+    seqs = mirror_sequences(len(radii), bounces)
+    theta = _initial_angles(seqs, centers, SOURCE, TARGET)
+    theta, ok = solve_sequences(seqs, theta, centers, radii, SOURCE, TARGET)
+    assert ok.any()
+
+    seqs, theta = seqs[ok], theta[ok]
+    points = centers[seqs] + radii[seqs][..., None] * _polar(theta)
+    shape = points[:, :1].shape
+    chain = np.concatenate([np.broadcast_to(SOURCE, shape), points,
+                            np.broadcast_to(TARGET, shape)], axis=1)
+    for j in range(bounces):
+        f, valid = reflection_law(theta[:, j], centers[seqs[:, j]], radii[seqs[:, j]],
+                                  chain[:, j], chain[:, j + 2])
+        assert valid.all()
+        np.testing.assert_allclose(f, 0, atol=1e-6)
+
+
+def test_mirror_sequences():
+    seqs = mirror_sequences(4, 3)
+    assert len(seqs) == 4 * 3 * 3
+    assert (seqs[:, 1:] != seqs[:, :-1]).all()
+    assert len(np.unique(seqs, axis=0)) == len(seqs)
+
+
+def drags(depth, steps=30):
+    """Перетаскивание случайных зеркал, в конце - и источника: (зеркала, источник) по шагам"""
+    rng = np.random.default_rng(depth)
+    mirrors = [{'center': tuple(rng.uniform(100, 700, 2)), 'radius': float(rng.uniform(15, 40))}
+               for _ in range(12)]
+    source = tuple(SOURCE)
+    yield mirrors, source
+    for step in range(steps):
+        i = int(rng.integers(len(mirrors)))
+        mirrors[i] = dict(mirrors[i], center=tuple(np.array(mirrors[i]['center'])
+                                                   + rng.normal(0, 15, 2)))
+        if step >= steps * 2 // 3:
+            source = (110.0 + step, 600.0)
+        yield mirrors, source
+
+
+def assert_same_schema_paths(actual, expected):
+    actual, expected = sorted(actual), sorted(expected)
+    assert [p[0] for p in actual] == [p[0] for p in expected]
+    for (_, a), (_, b) in zip(actual, expected):
+        np.testing.assert_allclose(a, b, atol=1e-6)
+
+
+def fully_tested_paths(solver):
+    """Найденные решателем решения, проверенные на перекрытия со всеми зеркалами заново"""
+    paths = []
+    for k, level in solver._levels.items():
+        if k == 1:
+            seqs, theta = level['mirror'][:, None], level['theta'][:, None]
+        else:
+            seqs, theta = level['seqs'][level['ok']], level['theta'][level['ok']]
+        points = solver.centers[seqs] + solver.radii[seqs][..., None] * _polar(theta)
+        shape = points[:, :1].shape
+        chain = np.concatenate([np.broadcast_to(solver.source, shape), points,
+                                np.broadcast_to(solver.target, shape)], axis=1)
+        clear = ~solver._occluders(chain, seqs, np.arange(len(solver.radii))).any(axis=1)
+        paths += [(tuple(seq), pts.tolist()) for seq, pts in zip(seqs[clear], points[clear])]
+    return paths
+
+
+@pytest.mark.parametrize('depth', [1, 2])
+def test_incremental_solver_matches_fresh(depth):
+    solver = SchemaSolver()
+    for mirrors, source in drags(depth):
+        solver.update(mirrors, source, tuple(TARGET), depth)
+        fresh = SchemaSolver()
+        fresh.update(mirrors, source, tuple(TARGET), depth)
+        assert_same_schema_paths(solver.paths, fresh.paths)
+
+
+@pytest.mark.parametrize('depth', [1, 2, 3])
+def test_occlusion_cache_matches_full_check(depth):
+    # Со старыми углами как начальным приближением Ньютон может сойтись к
+    # другому пути, чем с нуля, поэтому сравниваются только перекрытия
+    solver = SchemaSolver()
+    for mirrors, source in drags(depth):
+        solver.update(mirrors, source, tuple(TARGET), depth)
+        tests = solver.occlusion_tests
+        assert_same_schema_paths(solver.paths, fully_tested_paths(solver))
+        solver.occlusion_tests = tests
+    fresh = SchemaSolver()
+    fresh.update(mirrors, source, tuple(TARGET), depth)
+    # 31 обновление схемы: без кэша каждое стоило бы как fresh
+    assert solver.occlusion_tests < fresh.occlusion_tests * 20
+
+
+def test_unchanged_update_is_noop():
+    centers, radii = random_mirrors(np.random.default_rng(9), 8)
+    mirrors = [{'center': tuple(c), 'radius': r} for c, r in zip(centers, radii)]
+    solver = SchemaSolver()
+    assert solver.update(mirrors, tuple(SOURCE), tuple(TARGET), 2)
+    solved = solver.solved
+    assert not solver.update(mirrors, tuple(SOURCE), tuple(TARGET), 2)
+    assert solver.solved == solved
@@ -0,0 +1,122 @@
+"""Волновая трассировка против скалярной (исходной рекурсивной) версии"""
+import math
+
+import numpy as np
+import pytest
+
+from conftest import assert_same_paths
+from vrrt.scene import Scene
+from vrrt.tracer import (HIT_EPSILON, RaySegments, Roulette, sample_cone_directions,
+                         trace_scene, trace_wavefront)
+
+
+def ray_sphere_intersection(start, direction, center, radius):
+    """Пересечение луча со сферой - как в исходном 3dStyler.py"""
+    oc = [start[i] - center[i] for i in range(3)]
+    a = sum(d * d for d in direction)
+    b = 2 * sum(oc[i] * direction[i] for i in range(3))
+    c = sum(v * v for v in oc) - radius ** 2
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        return None
+    t1 = (-b - math.sqrt(discriminant)) / (2 * a)
+    t2 = (-b + math.sqrt(discriminant)) / (2 * a)
+    for t in (t1, t2):
+        if t > 0:
+            return t, tuple(start[i] + t * direction[i] for i in range(3))
+    return None
+
+
+def trace_scalar(source, directions, centers, radii, max_depth):
+    """Исходная рекурсивная трассировка по одному лучу: [(луч, отражение, зеркало, точка)]"""
+    result = []
+
+    def trace_ray(ray, start, direction, depth):
+        if depth > max_depth:
+            return
+        closest = None
+        for k, (center, radius) in enumerate(zip(centers, radii)):
+            hit = ray_sphere_intersection(start, direction, center, radius)
+            if hit and hit[0] > HIT_EPSILON and (closest is None or hit[0] < closest[0]):
+                closest = (hit[0], hit[1], k)
+        if closest is None:
+            return
+        _, point, k = closest
+        result.append((ray, depth, k, point))
+        normal = [point[i] - centers[k][i] for i in range(3)]
+        length = math.sqrt(sum(v * v for v in normal))
+        if length > 0:
+            normal = [v / length for v in normal]
+            dot = sum(direction[i] * normal[i] for i in range(3))
+            reflected = tuple(direction[i] - 2 * dot * normal[i] for i in range(3))
+            trace_ray(ray, point, reflected, depth + 1)
+
+    for ray, direction in enumerate(directions):
+        trace_ray(ray, tuple(source), tuple(direction), 0)
+    return result
+
+
+@pytest.mark.parametrize('scene, depth', [(Scene(), 3), (Scene.random(30, seed=4, extent=3.0), 6)])
+def test_wavefront_matches_scalar(scene, depth):
+    directions = sample_cone_directions(300, np.random.default_rng(1))
+    centers, radii = scene.mirror_arrays()
+    segments = trace_wavefront(scene.source, directions, centers, radii, depth)
+    expected = trace_scalar(scene.source, directions.tolist(), centers.tolist(),
+                            radii.tolist(), depth)
+
+    assert len(segments) == len(expected) > 0
+    expected.sort(key=lambda s: (s[1], s[0]))
+    np.testing.assert_array_equal(segments.ray, [s[0] for s in expected])
+    np.testing.assert_array_equal(segments.depth, [s[1] for s in expected])
+    np.testing.assert_array_equal(segments.mirror, [s[2] for s in expected])
+    np.testing.assert_allclose(segments.ends, [s[3] for s in expected], atol=1e-9)
+    # Отрезок начинается там, где закончился предыдущий отрезок луча
+    np.testing.assert_allclose(np.linalg.norm(segments.normals, axis=1), 1)
+
+
+def test_segments_ordered_by_depth_then_ray():
+    scene = Scene.random(40, seed=2, extent=3.0)
+    segments = trace_scene(scene, 500, 5, np.random.default_rng(0))
+    key = segments.depth.astype(np.int64) * 10 ** 6 + segments.ray
+    assert (np.diff(key) > 0).all()
+
+
+def test_empty_batch():
+    segments = trace_wavefront((0, 0, 0), np.empty((0, 3)), np.empty((0, 3)), np.empty(0), 3)
+    assert len(segments) == 0
+    assert len(RaySegments.concatenate([segments, segments])) == 0
+
+
+def test_roulette_off_by_default():
+    scene = Scene.random(30, seed=3, extent=3.0)
+    plain = trace_scene(scene, 400, 8, np.random.default_rng(0))
+    same = trace_scene(scene, 400, 8, np.random.default_rng(0), roulette=None)
+    for name in RaySegments.__slots__:
+        np.testing.assert_array_equal(getattr(plain, name), getattr(same, name))
+
+
+def test_roulette_cuts_dim_paths_independently_of_batches():
+    scene = Scene.random(200, seed=3, extent=3.0)
+    scene.sampler = 'sobol'
+    scene.mirrors.reflectivity[:] = 0.3
+    plain = trace_scene(scene, 4000, 12)
+    whole = trace_scene(scene, 4000, 12, roulette=0.5, seed=1)
+    assert len(whole) < len(plain)
+    assert whole.depth.max() < plain.depth.max()
+
+    halves = RaySegments.concatenate([trace_scene(scene, 2000, 12, roulette=0.5, seed=1),
+                                      trace_scene(scene, 2000, 12, roulette=0.5, seed=1,
+                                                  start=2000)])
+    assert_same_paths(halves, whole)
+
+
+def test_roulette_keeps_bright_rays():
+    scene = Scene.random(60, seed=5, extent=3.0)
+    centers, radii = scene.mirror_arrays()
+    directions = sample_cone_directions(500, np.random.default_rng(2))
+    roulette = Roulette(np.ones(len(radii)), threshold=0.1)
+    plain = trace_wavefront(scene.source, directions, centers, radii, 6)
+    kept = trace_wavefront(scene.source, directions, centers, radii, 6, roulette=roulette)
+    # Без потерь энергии рулетка никого не обрывает
+    assert roulette.killed == 0
+    np.testing.assert_array_equal(plain.ray, kept.ray)
@@ -0,0 +1,46 @@
+"""Рабочий поток трассировки: ошибки заданий не останавливают поток"""
+import time
+
+from vrrt.worker import JobFailed, TraceWorker
+
+
+def wait_results(worker, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        results = worker.poll()
+        if results:
+            return results
+        time.sleep(0.01)
+    raise AssertionError('нет результата')
+
+
+def job(payload, cancel):
+    if payload == 'fail':
+        raise ValueError('плохая сцена')
+    return payload * 2
+
+
+def test_failed_job_reports_error_and_worker_continues():
+    worker = TraceWorker(job)
+    try:
+        worker.submit('a', 'fail')
+        [(key, result)] = wait_results(worker)
+        assert key == 'a' and isinstance(result, JobFailed)
+        assert str(result) == 'ValueError: плохая сцена'
+        assert 'in job' in result.traceback
+        assert worker.failed == 1
+
+        worker.submit('b', 21)
+        assert wait_results(worker) == [('b', 42)]
+    finally:
+        worker.close(timeout=2.0)
+
+
+def test_failed_call_is_reported():
+    worker = TraceWorker(job)
+    try:
+        worker.call(lambda: 1 / 0)
+        [(key, result)] = wait_results(worker)
+        assert key is None and isinstance(result.error, ZeroDivisionError)
+    finally:
+        worker.close(timeout=2.0)
@@ -0,0 +1,22 @@
+"""
+VRRT - вычислительное ядро VR Ray Tracing Studio (без зависимости от Tkinter)
+"""
+from .accel import SphereBVH
+from .energy import estimate_irradiance
+from .incremental import PathIndex
+from .parallel import ParallelTracer
+from .pixeltrace import PixelTraceRenderer, render_pixels
+from .projection import Projection
+from .raster import RasterRenderer
+from .render import VRRenderer, VRView
+from .sampling import SAMPLERS, sample_directions
+from .scene import Scene
+from .stereo import StereoRenderer
+from .store import SphereStore
+from .tracer import RaySegments, Roulette, sample_cone_directions, trace_scene, trace_wavefront
+
+__all__ = ['ParallelTracer', 'PathIndex', 'PixelTraceRenderer', 'Projection', 'RasterRenderer',
+           'RaySegments', 'Roulette', 'SAMPLERS', 'Scene', 'SphereBVH', 'SphereStore', 'StereoRenderer',
+           'estimate_irradiance', 'sample_cone_directions', 'sample_directions',
+           'render_pixels', 'trace_scene',
+           'trace_wavefront', 'VRRenderer', 'VRView']
@@ -0,0 +1,256 @@
+"""
+Ускоряющая структура для больших сцен: BVH над сферами-зеркалами.
+
+Дерево строится снизу вверх по кодам Мортона (LBVH): сферы сортируются
+вдоль Z-кривой, последовательные группы по LEAF_SIZE образуют листья,
+а соседние узлы попарно объединяются уровень за уровнем. Все шаги
+построения векторизованы.
+
+Обход выполняется для всего пакета лучей сразу: поддерживается фронт
+пар (луч, узел), на каждой итерации пары проходят тест луча с AABB,
+листья раскрываются в проверки луч-сфера, внутренние узлы - в пары
+с дочерними узлами. Пары, чей AABB дальше найденного попадания,
+отбрасываются.
+
+При перемещении или изменении радиуса одной сферы границы обновляются
+от листа к корню (refit) без перестроения дерева.
+"""
+import numpy as np
+
+from .profiler import PROFILER
+from .tracer import HIT_EPSILON
+
+# Количество сфер в листе
+LEAF_SIZE = 4
+
+# Начиная с этого числа сфер BVH выгоднее полного перебора
+ACCEL_MIN_SPHERES = 32
+
+
+def _morton_codes(points):
+    """30-битные коды Мортона для точек (N, 3)"""
+    lo = points.min(axis=0)
+    span = np.maximum(points.max(axis=0) - lo, 1e-12)
+    q = np.clip(((points - lo) / span * 1023).astype(np.int64), 0, 1023)
+
+    def spread(v):
+        v = (v | (v << 16)) & 0x030000FF
+        v = (v | (v << 8)) & 0x0300F00F
+        v = (v | (v << 4)) & 0x030C30C3
+        v = (v | (v << 2)) & 0x09249249
+        return v
+
+    return (spread(q[:, 0]) << 2) | (spread(q[:, 1]) << 1) | spread(q[:, 2])
+
+
+class SphereBVH:
+    """BVH над набором сфер с пакетным поиском ближайшего попадания"""
+
+    def __init__(self, centers, radii, leaf_size=LEAF_SIZE):
+        self.leaf_size = leaf_size
+        self.build(centers, radii)
+
+    def build(self, centers, radii):
+        """Полное построение дерева"""
+        self.centers = np.array(centers, dtype=float).reshape(-1, 3)
+        self.radii = np.array(radii, dtype=float).reshape(-1)
+        m = len(self.centers)
+
+        # Порядок сфер вдоль Z-кривой
+        if m:
+            self.order = np.argsort(_morton_codes(self.centers), kind='stable')
+        else:
+            self.order = np.empty(0, dtype=np.int64)
+
+        # Листья: последовательные группы сфер
+        starts = np.arange(0, m, self.leaf_size)
+        counts = np.minimum(self.leaf_size, m - starts)
+        num_leaves = len(starts)
+
+        lefts, rights = [np.full(num_leaves, -1)], [np.full(num_leaves, -1)]
+        level = np.arange(num_leaves)
+        total = num_leaves
+        self.level_ranges = []
+
+        # Внутренние узлы: попарное объединение соседей уровень за уровнем
+        while len(level) > 1:
+            pairs = len(level) // 2
+            new = np.arange(total, total + pairs)
+            lefts.append(level[0:2 * pairs:2])
+            rights.append(level[1:2 * pairs:2])
+            self.level_ranges.append((total, total + pairs))
+            total += pairs
+            if len(level) % 2:
+                new = np.append(new, level[-1])
+            level = new
+
+        self.left = np.concatenate(lefts)
+        self.right = np.concatenate(rights)
+        self.start = np.concatenate([starts, np.zeros(total - num_leaves, dtype=np.int64)])
+        self.count = np.concatenate([counts, np.zeros(total - num_leaves, dtype=np.int64)])
+        self.root = int(level[0]) if total else -1
+        self.num_leaves = num_leaves
+
+        self.parent = np.full(total, -1)
+        internal = np.arange(num_leaves, total)
+        self.parent[self.left[internal]] = internal
+        self.parent[self.right[internal]] = internal
+
+        # Лист, содержащий каждую сферу (для инкрементального refit)
+        self.leaf_of = np.empty(m, dtype=np.int64)
+        self.leaf_of[self.order] = np.repeat(np.arange(num_leaves), counts)
+
+        self.box_min = np.empty((total, 3))
+        self.box_max = np.empty((total, 3))
+        self.refit()
+
+    def refit(self):
+        """Пересчет всех AABB снизу вверх (после массового изменения сфер)"""
+        if self.root < 0:
+            return
+        lo = self.centers[self.order] - self.radii[self.order, None]
+        hi = self.centers[self.order] + self.radii[self.order, None]
+        seg = self.start[:self.num_leaves]
+        self.box_min[:self.num_leaves] = np.minimum.reduceat(lo, seg, axis=0)
+        self.box_max[:self.num_leaves] = np.maximum.reduceat(hi, seg, axis=0)
+
+        # Внутренние узлы - уровень за уровнем: дети уже посчитаны
+        for lo_node, hi_node in self.level_ranges:
+            l = self.left[lo_node:hi_node]
+            r = self.right[lo_node:hi_node]
+            self.box_min[lo_node:hi_node] = np.minimum(self.box_min[l], self.box_min[r])
+            self.box_max[lo_node:hi_node] = np.maximum(self.box_max[l], self.box_max[r])
+
+    def update(self, index, center=None, radius=None):
+        """Перемещение/изменение радиуса одной сферы с refit до корня"""
+        if center is not None:
+            self.centers[index] = center
+        if radius is not None:
+            self.radii[index] = radius
+
+        node = int(self.leaf_of[index])
+        s, c = self.start[node], self.count[node]
+        prims = self.order[s:s + c]
+        self.box_min[node] = (self.centers[prims] - self.radii[prims, None]).min(axis=0)
+        self.box_max[node] = (self.centers[prims] + self.radii[prims, None]).max(axis=0)
+
+        node = self.parent[node]
+        while node >= 0:
+            l, r = self.left[node], self.right[node]
+            new_min = np.minimum(self.box_min[l], self.box_min[r])
+            new_max = np.maximum(self.box_max[l], self.box_max[r])
+            if (new_min == self.box_min[node]).all() and (new_max == self.box_max[node]).all():
+                break
+            self.box_min[node] = new_min
+            self.box_max[node] = new_max
+            node = self.parent[node]
+
+    def sync(self, centers, radii):
+        """
+        Синхронизация с текущими массивами сцены.
+
+        Изменившиеся сферы обновляются инкрементально, при изменении
+        количества сфер дерево перестраивается.
+        """
+        centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        radii = np.asarray(radii, dtype=float).reshape(-1)
+        if len(centers) != len(self.centers):
+            self.build(centers, radii)
+            return
+        changed = np.flatnonzero((centers != self.centers).any(axis=1)
+                                 | (radii != self.radii))
+        if len(changed) > self.num_leaves // 4:
+            self.centers[:] = centers
+            self.radii[:] = radii
+            self.refit()
+            return
+        for index in changed:
+            self.update(index, centers[index], radii[index])
+
+    def nearest_hit(self, origins, directions, eps=HIT_EPSILON):
+        """
+        Ближайшие попадания пакета лучей (те же правила, что у полного перебора).
+
+        Возвращает (t, idx): расстояние и индекс сферы, для промахов idx == -1.
+        """
+        n = len(origins)
+        t_best = np.full(n, np.inf)
+        idx_best = np.full(n, -1, dtype=np.int64)
+        if n == 0 or self.root < 0:
+            return t_best, idx_best
+
+        safe = np.where(directions == 0, 1e-300, directions)
+        inv = 1.0 / safe
+        with np.errstate(over='ignore', invalid='ignore'):
+            result = self._traverse(origins, directions, inv, t_best, idx_best, eps)
+        PROFILER.count('bvh_node_tests', self.node_tests)
+        PROFILER.count('intersection_tests', self.sphere_tests)
+        return result
+
+    def _traverse(self, origins, directions, inv, t_best, idx_best, eps):
+        """Обход дерева фронтом пар (луч, узел)"""
+        n = len(origins)
+
+        rays = np.arange(n)
+        nodes = np.full(n, self.root)
+        self.node_tests = 0
+        self.sphere_tests = 0
+
+        while len(rays):
+            # Тест луча с AABB узла (метод плит)
+            self.node_tests += len(rays)
+            o = origins[rays]
+            t0 = (self.box_min[nodes] - o) * inv[rays]
+            t1 = (self.box_max[nodes] - o) * inv[rays]
+            t_near = np.minimum(t0, t1).max(axis=1)
+            t_far = np.maximum(t0, t1).min(axis=1)
+            keep = (t_far >= t_near) & (t_far > eps) & (t_near <= t_best[rays])
+            rays, nodes = rays[keep], nodes[keep]
+
+            leaf = self.count[nodes] > 0
+            if leaf.any():
+                self._test_leaves(rays[leaf], nodes[leaf], origins, directions,
+                                  t_best, idx_best, eps)
+
+            inner = ~leaf
+            rays = np.concatenate([rays[inner], rays[inner]])
+            nodes = np.concatenate([self.left[nodes[inner]], self.right[nodes[inner]]])
+
+        return t_best, idx_best
+
+    def _test_leaves(self, rays, nodes, origins, directions, t_best, idx_best, eps):
+        """Проверка лучей со сферами листьев и обновление ближайших попаданий"""
+        counts = self.count[nodes]
+        pair_rays = np.repeat(rays, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        prims = self.order[np.repeat(self.start[nodes], counts) + offsets]
+        self.sphere_tests += len(prims)
+
+        o = origins[pair_rays]
+        d = directions[pair_rays]
+        oc = o - self.centers[prims]
+        a = np.einsum('ij,ij->i', d, d)
+        b = 2 * np.einsum('ij,ij->i', oc, d)
+        c = np.einsum('ij,ij->i', oc, oc) - self.radii[prims] ** 2
+
+        disc = b * b - 4 * a * c
+        sq = np.sqrt(np.maximum(disc, 0))
+        t1 = (-b - sq) / (2 * a)
+        t2 = (-b + sq) / (2 * a)
+        t = np.where(t1 > 0, t1, np.where(t2 > 0, t2, np.inf))
+        valid = (disc >= 0) & (t > eps)
+        if not valid.any():
+            return
+        pair_rays, prims, t = pair_rays[valid], prims[valid], t[valid]
+
+        # Для каждого луча - ближайшая сфера (при равенстве - с меньшим индексом)
+        sort = np.lexsort((prims, t, pair_rays))
+        pair_rays, prims, t = pair_rays[sort], prims[sort], t[sort]
+        first = np.ones(len(pair_rays), dtype=bool)
+        first[1:] = pair_rays[1:] != pair_rays[:-1]
+        pair_rays, prims, t = pair_rays[first], prims[first], t[first]
+
+        better = (t < t_best[pair_rays]) | ((t == t_best[pair_rays])
+                                            & (prims < idx_best[pair_rays]))
+        t_best[pair_rays[better]] = t[better]
+        idx_best[pair_rays[better]] = prims[better]
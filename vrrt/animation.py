@@ -0,0 +1,161 @@
+"""
+Пакетная отрисовка анимации вращения без окна.
+
+Траектория та же, что у анимации в интерфейсе: источник и приемник
+движутся по окружности радиуса ORBIT_RADIUS друг напротив друга.
+Кадр i соответствует углу i * step градусов (по умолчанию - шаг 2
+градуса, как в исходной анимации).
+
+Кадры считаются в пуле процессов: каждый процесс получает сцену один
+раз (initializer), трассирует свои кадры, рисует их в буфер кадра
+(растр или попиксельная трассировка) и сам записывает файл
+frame_00000.png. В работе одновременно не больше max_in_flight
+кадров, поэтому память не растет с их числом.
+"""
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .pixeltrace import SphereSet, render_pixels
+from .raster import RasterRenderer, save_image
+from .render import VRView
+from .scene import Scene
+
+# Радиус орбиты источника и приемника и шаг анимации (градусы на кадр)
+ORBIT_RADIUS = 3
+ANIMATION_STEP = 2
+
+# Камера по умолчанию: та же позиция, что в интерфейсе, взгляд на сцену
+CAMERA_POS = (5, 3, 10)
+CAMERA_ANGLE = 180
+
+BACKENDS = ('raster', 'raytrace')
+
+
+def orbit_positions(angle):
+    """Положения источника и приемника для угла анимации (градусы)"""
+    a = math.radians(angle)
+    b = math.radians(angle + 180)
+    source = [ORBIT_RADIUS * math.cos(a), 1, ORBIT_RADIUS * math.sin(a)]
+    target = [ORBIT_RADIUS * math.cos(b), -1, ORBIT_RADIUS * math.sin(b)]
+    return source, target
+
+
+class FrameOptions:
+    """Параметры отрисовки кадров (передаются в процессы пула)"""
+
+    def __init__(self, out_dir, step=ANIMATION_STEP, width=1000, height=700,
+                 camera_pos=CAMERA_POS, camera_angle=CAMERA_ANGLE, backend='raster',
+                 image_format='png', seed=0):
+        self.out_dir = out_dir
+        self.step = step
+        self.width = width
+        self.height = height
+        self.camera_pos = list(camera_pos)
+        self.camera_angle = camera_angle
+        self.backend = backend
+        self.image_format = image_format
+        self.seed = seed
+
+    def path(self, index):
+        return os.path.join(self.out_dir, f'frame_{index:05d}.{self.image_format}')
+
+
+# Состояние процесса пула (задается initializer)
+_worker = {}
+
+
+def _init_worker(scene_dict, options):
+    _worker['scene'] = Scene.from_dict(scene_dict)
+    _worker['options'] = options
+
+
+def render_frame(scene, index, options):
+    """
+    Отрисовка и запись одного кадра.
+
+    Возвращает (index, путь, число отрезков, время трассировки и отрисовки, с).
+    """
+    source, target = orbit_positions(index * options.step)
+    scene.source, scene.target = source, target
+    view = VRView(scene, options.width, options.height)
+    view.camera_pos = list(options.camera_pos)
+    view.camera_angle = options.camera_angle
+    # Один и тот же набор направлений для всех кадров, как в интерфейсе
+    view.path_cache.seed = options.seed
+
+    start = time.perf_counter()
+    renderer = RasterRenderer(None, view)
+    if options.backend == 'raytrace':
+        spheres = SphereSet(renderer.sphere_objects(), scene.source)
+        image = render_pixels(spheres, renderer.projection(), scene.reflection_depth)
+        segments = 0
+    else:
+        renderer.render()
+        image = renderer.frame
+        segments = len(view.ray_segments())
+    path = options.path(index)
+    save_image(path, image)
+    return index, path, segments, time.perf_counter() - start
+
+
+def _render_job(index):
+    return render_frame(_worker['scene'], index, _worker['options'])
+
+
+def render_animation(scene, options, frames, first=0, workers=0, max_in_flight=None,
+                     progress=None):
+    """
+    Отрисовка кадров [first, first + frames) в пуле процессов.
+
+    workers = 0 - по числу ядер, 1 - в текущем процессе без пула.
+    progress(готово, всего, результат кадра) вызывается по мере готовности.
+    Возвращает словарь с числом кадров, временем и кадрами в секунду.
+    """
+    os.makedirs(options.out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    if max_in_flight is None:
+        max_in_flight = 2 * workers
+    indices = iter(range(first, first + frames))
+    done = 0
+    segments = 0
+    t0 = time.perf_counter()
+
+    if workers == 1:
+        for index in indices:
+            result = render_frame(scene.copy(), index, options)
+            done += 1
+            segments += result[2]
+            if progress is not None:
+                progress(done, frames, result)
+    else:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=(scene.to_dict(), options)) as pool:
+            pending = set()
+            for index in indices:
+                pending.add(pool.submit(_render_job, index))
+                if len(pending) < max_in_flight:
+                    continue
+                # Ограничение числа кадров в работе
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    done += 1
+                    segments += result[2]
+                    if progress is not None:
+                        progress(done, frames, result)
+            for future in pending:
+                result = future.result()
+                done += 1
+                segments += result[2]
+                if progress is not None:
+                    progress(done, frames, result)
+
+    elapsed = time.perf_counter() - t0
+    return {'frames': done, 'seconds': elapsed, 'fps': done / elapsed if elapsed else 0.0,
+            'segments': segments, 'workers': workers}
+
@@ -0,0 +1,133 @@
+"""
+Кэш трассированных путей.
+
+Пути лучей в мировых координатах не зависят от камеры, только от
+зеркал, источника, глубины и выборки направлений. Поэтому при движении
+камеры пути берутся из кэша и лишь заново проецируются на экран.
+
+get() трассирует синхронно. Для трассировки в фоновом потоке есть
+раздельные peek() / trace() / store(): trace() не обращается к записям
+кэша, поэтому кэш изменяется только из потока интерфейса.
+
+ProgressivePaths накапливает лучи для неизменной сцены: к путям из
+кэша добавляются следующие порции выборки направлений.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from .profiler import PROFILER
+from .tracer import RaySegments, trace_scene
+
+# Предел числа лучей при прогрессивном накоплении
+PROGRESSIVE_MAX_RAYS = 1024
+
+
+class PathCache:
+    """Кэш RaySegments по состоянию сцены (LRU на несколько записей)"""
+
+    def __init__(self, seed=0, maxsize=8, tracer=None):
+        self.seed = seed
+        self.maxsize = maxsize
+        # Необязательный трассировщик с методом trace_scene (например,
+        # ParallelTracer); результат от него не зависит, поэтому в ключ не входит
+        self.tracer = tracer
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def scene_key(self, scene, num_rays=None, depth=None):
+        """Ключ кэша: все, от чего зависят пути лучей (num_rays/depth - замена параметров сцены)"""
+        if num_rays is None:
+            num_rays = scene.num_rays
+        if depth is None:
+            depth = scene.reflection_depth
+        # Массивы хранилища сравниваются побайтно, без обхода сфер
+        centers, radii = scene.mirror_arrays()
+        mirrors = (centers.tobytes(), radii.tobytes(), scene.dtype.str)
+        return (mirrors, tuple(float(c) for c in scene.source),
+                int(num_rays), int(depth), scene.sampler, self.seed)
+
+    def get(self, scene):
+        """Пути лучей сцены: из кэша или новой трассировкой"""
+        key = self.scene_key(scene)
+        segments = self.peek(key)
+        if segments is None:
+            segments = self.trace(scene)
+            self.store(key, segments)
+        return segments
+
+    def peek(self, key):
+        """Пути лучей по ключу без трассировки (None, если их нет в кэше)"""
+        segments = self._entries.get(key)
+        if segments is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        return segments
+
+    def trace(self, scene, cancel=None, start=0):
+        """
+        Трассировка сцены без обращения к кэшу (безопасно из другого потока).
+
+        start - номер первого луча: продолжение выборки для прогрессивного
+        накопления (для случайных методов - свой генератор на каждую порцию).
+        """
+        # Фиксированное зерно: одна и та же сцена дает один и тот же набор лучей
+        rng = np.random.default_rng(self.seed if start == 0 else [self.seed, start])
+        trace = self.tracer.trace_scene if self.tracer is not None else trace_scene
+        with PROFILER.stage('trace'):
+            return trace(scene, rng=rng, cancel=cancel, start=start)
+
+    def store(self, key, segments):
+        """Запись результата трассировки в кэш"""
+        self._entries[key] = segments
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Сброс кэша"""
+        self._entries.clear()
+
+
+class ProgressivePaths:
+    """
+    Прогрессивное накопление путей для неизменной сцены.
+
+    Начало - пути обычного кадра (reset). На кадрах простоя трассируется
+    следующая порция лучей (next_batch) и добавляется к накопленным (add).
+    Порция равна уже накопленному числу лучей, поэтому плотность
+    удваивается за шаг, пока не достигнет max_rays.
+    """
+
+    def __init__(self, max_rays=PROGRESSIVE_MAX_RAYS):
+        self.max_rays = max_rays
+        self.key = None
+        self.segments = None
+        self.rays = 0
+
+    def reset(self, key, segments, rays):
+        """Новая база накопления: пути кадра сцены с ключом key"""
+        self.key = key
+        self.segments = segments
+        self.rays = rays
+
+    def clear(self):
+        """Сброс накопления"""
+        self.reset(None, None, 0)
+
+    def next_batch(self):
+        """Следующая порция (start, count) или None, если накопление завершено"""
+        if self.key is None or self.rays >= self.max_rays:
+            return None
+        return self.rays, min(self.rays, self.max_rays - self.rays)
+
+    def add(self, key, start, count, segments):
+        """Добавление порции; устаревшие порции (другая сцена) отбрасываются"""
+        if key != self.key or start != self.rays:
+            return False
+        self.segments = RaySegments.concatenate([self.segments, segments])
+        self.rays += count
+        return True
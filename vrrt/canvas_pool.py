@@ -0,0 +1,138 @@
+"""
+Пулы элементов холста (retained mode).
+
+Вместо canvas.delete("all") и пересоздания всех элементов на каждом
+кадре элементы хранятся в пулах по тегам. Кадр описывается вызовами
+add(), а при фиксации кадра существующие элементы обновляются через
+coords/itemconfig только если что-то изменилось. Элементы создаются
+или удаляются лишь когда меняется их количество.
+
+Модуль не импортирует tkinter: подойдет любой объект с интерфейсом Canvas.
+"""
+from .profiler import PROFILER
+
+
+class ItemPool:
+    """Пул однотипных элементов холста с общим тегом"""
+
+    def __init__(self, canvas, kind, tag):
+        self.canvas = canvas
+        self.kind = kind            # 'line', 'oval', 'text', ...
+        self.tag = tag
+        self.items = []             # идентификаторы элементов холста
+        self._coords = []           # последние координаты каждого элемента
+        self._options = []          # последние опции каждого элемента
+        self._frame = []            # элементы текущего кадра
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Сброс счетчиков обращений к холсту"""
+        self.created = 0
+        self.deleted = 0
+        self.moved = 0
+        self.configured = 0
+
+    def begin(self):
+        """Начало описания кадра"""
+        self._frame = []
+
+    def add(self, coords, **options):
+        """Добавление элемента в кадр"""
+        self._frame.append((tuple(float(c) for c in coords), options))
+
+    def commit(self):
+        """Синхронизация холста с описанным кадром; True, если пул вырос"""
+        frame = self._frame
+        self._frame = []
+        n = len(frame)
+
+        # Лишние элементы удаляем
+        if len(self.items) > n:
+            surplus = self.items[n:]
+            self.canvas.delete(*surplus)
+            self.deleted += len(surplus)
+            del self.items[n:], self._coords[n:], self._options[n:]
+
+        # Существующие элементы обновляем только при изменениях
+        for k in range(len(self.items)):
+            coords, options = frame[k]
+            item = self.items[k]
+            if coords != self._coords[k]:
+                self.canvas.coords(item, *coords)
+                self._coords[k] = coords
+                self.moved += 1
+            old = self._options[k]
+            if options != old:
+                changed = {key: value for key, value in options.items()
+                           if old.get(key) != value}
+                if changed:
+                    self.canvas.itemconfig(item, **changed)
+                    self.configured += 1
+                self._options[k] = dict(old, **options)
+
+        # Недостающие элементы создаем
+        grew = n > len(self.items)
+        create = getattr(self.canvas, 'create_' + self.kind)
+        for coords, options in frame[len(self.items):]:
+            item = create(*coords, tags=(self.tag,), **options)
+            self.items.append(item)
+            self._coords.append(coords)
+            self._options.append(dict(options))
+            self.created += 1
+        return grew
+
+    def clear(self):
+        """Удаление всех элементов пула"""
+        self.begin()
+        self.commit()
+
+
+class RetainedCanvas:
+    """Набор пулов холста в порядке отрисовки (снизу вверх)"""
+
+    def __init__(self, canvas, layers, prefix):
+        self.canvas = canvas
+        self.pools = {}
+        self.order = []
+        for name, kind in layers:
+            self.pools[name] = ItemPool(canvas, kind, f'{prefix}_{name}')
+            self.order.append(name)
+
+    def __getitem__(self, name):
+        return self.pools[name]
+
+    def begin_frame(self, names=None):
+        """Начало кадра для указанных пулов (по умолчанию - для всех)"""
+        for name in names or self.order:
+            self.pools[name].begin()
+
+    def end_frame(self, names=None):
+        """Фиксация кадра; при росте пулов восстанавливаем порядок слоев"""
+        before = self.stats() if PROFILER.enabled else None
+        grew = False
+        with PROFILER.stage('canvas_commit'):
+            for name in names or self.order:
+                grew = self.pools[name].commit() or grew
+            if grew:
+                for name in self.order:
+                    self.canvas.tag_raise(self.pools[name].tag)
+        if before is not None:
+            after = self.stats()
+            for key in ('created', 'deleted', 'moved', 'configured'):
+                PROFILER.count(f'canvas_{key}', after[key] - before[key])
+
+    def clear(self):
+        """Удаление элементов всех пулов"""
+        for pool in self.pools.values():
+            pool.clear()
+
+    def stats(self):
+        """Суммарные счетчики обращений к холсту"""
+        totals = {'created': 0, 'deleted': 0, 'moved': 0, 'configured': 0, 'items': 0}
+        for pool in self.pools.values():
+            totals['created'] += pool.created
+            totals['deleted'] += pool.deleted
+            totals['moved'] += pool.moved
+            totals['configured'] += pool.configured
+            totals['items'] += len(pool.items)
+        return totals
@@ -0,0 +1,215 @@
+"""
+Пакетный режим (без Tkinter).
+
+Пример:
+    python -m vrrt trace scene.json --rays 100000 --depth 5
+    python -m vrrt export scene.json paths.npy --rays 10000000
+    python -m vrrt animate scene.json frames/ --frames 180 --workers 0
+    python -m vrrt irradiance scene.json --rel-error 0.02
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from .animation import ANIMATION_STEP, BACKENDS, CAMERA_ANGLE, FrameOptions, render_animation
+from .energy import MAX_RAYS, REL_ERROR, ROULETTE_THRESHOLD, estimate_irradiance
+from .export import CHUNK_RAYS, FORMATS, export_paths
+from .parallel import ParallelTracer
+from .sampling import SAMPLERS
+from .scene import Scene
+from .tracer import trace_scene
+
+
+def cmd_trace(args):
+    """Трассировка сцены и замер пропускной способности"""
+    scene = Scene.load(args.scene) if args.scene else Scene()
+    num_rays = args.rays if args.rays is not None else scene.num_rays
+    depth = args.depth if args.depth is not None else scene.reflection_depth
+    if args.sampler is not None:
+        scene.sampler = args.sampler
+    if args.float32:
+        scene.mirrors = scene.mirrors.copy(np.float32)
+
+    tracer = ParallelTracer(args.workers) if args.workers != 1 else None
+    trace = tracer.trace_scene if tracer is not None else trace_scene
+    if tracer is not None:
+        # Прогрев пула процессов, чтобы не учитывать их запуск
+        tracer.trace_scene(scene, tracer.min_parallel_rays, depth,
+                           np.random.default_rng(args.seed))
+
+    timings = []
+    for _ in range(args.repeat):
+        rng = np.random.default_rng(args.seed)
+        t0 = time.perf_counter()
+        segments = trace(scene, num_rays, depth, rng, roulette=args.roulette, seed=args.seed)
+        timings.append(time.perf_counter() - t0)
+    if tracer is not None:
+        tracer.close()
+
+    best = min(timings)
+    print(f"Сцена: {args.scene or '(по умолчанию)'}, зеркал: {len(scene.mirrors)}")
+    print(f"Лучей: {num_rays} ({scene.sampler}), глубина: {depth}, отрезков: {len(segments)}, "
+          f"процессов: {tracer.workers if tracer is not None else 1}")
+    print(f"Время: {best * 1000:.2f} мс (лучшее из {args.repeat})")
+    print(f"Лучей/с: {num_rays / best:,.0f}, отрезков/с: {len(segments) / best:,.0f}")
+    print(f"Память отрезков: {segments.nbytes / 1024:,.1f} КБ "
+          f"({segments.nbytes / max(len(segments), 1):.0f} байт на отрезок, {scene.dtype})")
+    return 0
+
+
+def cmd_export(args):
+    """Трассировка и потоковая запись путей в файл"""
+    scene = Scene.load(args.scene) if args.scene else Scene()
+    num_rays = args.rays if args.rays is not None else scene.num_rays
+    if args.sampler is not None:
+        scene.sampler = args.sampler
+
+    tracer = ParallelTracer(args.workers) if args.workers != 1 else None
+    trace = tracer.trace_scene if tracer is not None else trace_scene
+    t0 = time.perf_counter()
+
+    def progress(rays, segments):
+        elapsed = time.perf_counter() - t0
+        print(f"\rЛучей: {rays:,} из {num_rays:,}, отрезков: {segments:,}, "
+              f"{rays / elapsed:,.0f} лучей/с", end='', file=sys.stderr)
+
+    try:
+        written = export_paths(scene, args.output, args.format, num_rays, args.depth,
+                               args.chunk, args.seed, args.append,
+                               progress if not args.quiet else None, trace)
+    finally:
+        if tracer is not None:
+            tracer.close()
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"Записано отрезков: {written:,} в {args.output} "
+          f"за {time.perf_counter() - t0:.2f} с")
+    return 0
+
+
+def cmd_animate(args):
+    """Пакетная отрисовка кадров анимации вращения в файлы"""
+    scene = Scene.load(args.scene) if args.scene else Scene()
+    if args.rays is not None:
+        scene.num_rays = args.rays
+    if args.depth is not None:
+        scene.reflection_depth = args.depth
+    options = FrameOptions(args.output, args.step, args.width, args.height,
+                           camera_angle=args.camera_angle, backend=args.backend,
+                           image_format=args.format, seed=args.seed)
+    t0 = time.perf_counter()
+
+    def progress(done, total, result):
+        elapsed = time.perf_counter() - t0
+        print(f"\rКадров: {done} из {total}, {done / elapsed:.2f} кадр/с", end='',
+              file=sys.stderr)
+
+    stats = render_animation(scene, options, args.frames, args.first, args.workers,
+                             progress=progress if not args.quiet else None)
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"Кадров: {stats['frames']} в {args.output} ({args.backend}, {args.width}x{args.height}), "
+          f"процессов: {stats['workers']}")
+    print(f"Время: {stats['seconds']:.2f} с, кадров/с: {stats['fps']:.2f}")
+    return 0
+
+
+def cmd_irradiance(args):
+    """Оценка освещенности приемника с учетом энергии лучей"""
+    scene = Scene.load(args.scene) if args.scene else Scene()
+    if args.sampler is not None:
+        scene.sampler = args.sampler
+    t0 = time.perf_counter()
+    estimate = estimate_irradiance(scene, args.rel_error, max_rays=args.max_rays,
+                                   threshold=args.threshold, seed=args.seed)
+    elapsed = time.perf_counter() - t0
+    print(f"Сцена: {args.scene or '(по умолчанию)'}, зеркал: {len(scene.mirrors)}")
+    print(f"Освещенность: {estimate.irradiance:.6g} (погрешность {estimate.rel_error:.2%}), "
+          f"поток: {estimate.flux:.4%} мощности источника")
+    print(f"Лучей: {estimate.rays:,} ({'сходимость' if estimate.converged else 'предел'}), "
+          f"попаданий: {estimate.hits:,}, оборвано рулеткой: {estimate.killed:,}")
+    print(f"Отражений на луч: {estimate.mean_bounces:.2f}, время: {elapsed:.2f} с")
+    return 0
+
+
+def build_parser():
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(prog='python -m vrrt',
+                                     description='VR Ray Tracing Studio - пакетный режим')
+    sub = parser.add_subparsers(dest='command')
+    sub.required = True
+
+    p = sub.add_parser('trace', help='трассировка сцены и замер лучей/с')
+    p.add_argument('scene', nargs='?', help='JSON файл сцены (по умолчанию встроенная)')
+    p.add_argument('--rays', type=int, help='количество лучей')
+    p.add_argument('--depth', type=int, help='глубина отражений')
+    p.add_argument('--repeat', type=int, default=3, help='число повторов замера')
+    p.add_argument('--seed', type=int, default=0, help='зерно генератора направлений')
+    p.add_argument('--sampler', choices=SAMPLERS,
+                   help='метод выборки направлений (по умолчанию - из сцены)')
+    p.add_argument('--float32', action='store_true',
+                   help='компактный режим: зеркала и отрезки в float32')
+    p.add_argument('--roulette', type=float, metavar='THRESHOLD',
+                   help='ослабление лучей reflectivity и русская рулетка ниже порога энергии')
+    p.add_argument('--workers', type=int, default=1,
+                   help='число процессов (0 - по числу ядер)')
+    p.set_defaults(func=cmd_trace)
+
+    p = sub.add_parser('export', help='потоковая выгрузка путей лучей в файл')
+    p.add_argument('scene', nargs='?', help='JSON файл сцены (по умолчанию встроенная)')
+    p.add_argument('output', help='файл результата (.ndjson, .csv или .npy)')
+    p.add_argument('--format', choices=FORMATS, help='формат (по умолчанию - по расширению)')
+    p.add_argument('--rays', type=int, help='количество лучей')
+    p.add_argument('--depth', type=int, help='глубина отражений')
+    p.add_argument('--chunk', type=int, default=CHUNK_RAYS, help='лучей в одной порции')
+    p.add_argument('--seed', type=int, default=0, help='зерно генератора направлений')
+    p.add_argument('--sampler', choices=SAMPLERS,
+                   help='метод выборки направлений (по умолчанию - из сцены)')
+    p.add_argument('--workers', type=int, default=1,
+                   help='число процессов (0 - по числу ядер)')
+    p.add_argument('--append', action='store_true',
+                   help='дописать в существующий файл (лучи нумеруются после записанных)')
+    p.add_argument('--quiet', action='store_true', help='без вывода прогресса')
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser('animate', help='отрисовка кадров анимации вращения в файлы')
+    p.add_argument('scene', nargs='?', help='JSON файл сцены (по умолчанию встроенная)')
+    p.add_argument('output', help='папка для кадров frame_00000.png, ...')
+    p.add_argument('--frames', type=int, default=180, help='число кадров')
+    p.add_argument('--first', type=int, default=0, help='номер первого кадра')
+    p.add_argument('--step', type=float, default=ANIMATION_STEP, help='шаг угла на кадр (градусы)')
+    p.add_argument('--rays', type=int, help='количество лучей')
+    p.add_argument('--depth', type=int, help='глубина отражений')
+    p.add_argument('--seed', type=int, default=0, help='зерно генератора направлений')
+    p.add_argument('--backend', choices=BACKENDS, default='raster',
+                   help='растр с путями лучей или попиксельная трассировка')
+    p.add_argument('--format', choices=('png', 'ppm'), default='png', help='формат кадров')
+    p.add_argument('--width', type=int, default=1000, help='ширина кадра')
+    p.add_argument('--height', type=int, default=700, help='высота кадра')
+    p.add_argument('--camera-angle', type=float, default=CAMERA_ANGLE,
+                   help='угол поворота камеры (градусы)')
+    p.add_argument('--workers', type=int, default=0,
+                   help='число процессов (0 - по числу ядер, 1 - без пула)')
+    p.add_argument('--quiet', action='store_true', help='без вывода прогресса')
+    p.set_defaults(func=cmd_animate)
+
+    p = sub.add_parser('irradiance', help='оценка освещенности приемника')
+    p.add_argument('scene', nargs='?', help='JSON файл сцены (по умолчанию встроенная)')
+    p.add_argument('--rel-error', type=float, default=REL_ERROR,
+                   help='допустимая относительная погрешность')
+    p.add_argument('--max-rays', type=int, default=MAX_RAYS, help='предел числа лучей')
+    p.add_argument('--threshold', type=float, default=ROULETTE_THRESHOLD,
+                   help='порог энергии для русской рулетки')
+    p.add_argument('--seed', type=int, default=0, help='зерно генератора направлений')
+    p.add_argument('--sampler', choices=SAMPLERS,
+                   help='метод выборки направлений (по умолчанию - из сцены)')
+    p.set_defaults(func=cmd_irradiance)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
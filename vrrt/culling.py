@@ -0,0 +1,79 @@
+"""
+Отсечение невидимого перед отрисовкой VR сцены.
+
+Все проверки выполняются над массивами до создания элементов холста
+или растеризации:
+    - отрезки (лучи, нормали, сетка) целиком за ближней плоскостью
+      отбрасываются, пересекающие ее - обрезаются в системе камеры;
+      затем экранные отрезки обрезаются областью вывода (Лян-Барски),
+      и отрезки вне ее отбрасываются;
+    - сферы вне пирамиды видимости (с учетом экранного радиуса и
+      ореола) отбрасываются.
+
+Число отброшенных объектов попадает в счетчики профилировщика.
+Детализация по расстоянию: сетка - FloorGrid (vrrt.grid), мелкие
+детали сфер - MIN_DETAIL_PX.
+"""
+import numpy as np
+
+from .profiler import PROFILER
+from .projection import clip_segments
+
+# Экранный радиус сферы: radius * SPHERE_SCALE / dist_factor
+SPHERE_SCALE = 200
+
+# Детали сфер (блик, ореол, кольцо отражения) меньше этого размера
+# в пикселях не рисуются
+MIN_DETAIL_PX = 1.5
+
+# Точки, обрезанные ближней плоскостью, ставятся чуть перед ней
+NEAR_MARGIN = 1.001
+
+
+def project_segments(projection, starts, ends, width, height, counter='culled_segments'):
+    """
+    Проекция 3D отрезков (N, 3) с отсечением.
+
+    width, height - размер области вывода (ее положение - projection.offset).
+    Возвращает (p1, p2, dist, keep): экранные концы (N, 2), коэффициент
+    VR масштаба начала отрезка (N,) и маску видимых отрезков.
+    """
+    cam1 = projection.to_camera(starts)
+    cam2 = projection.to_camera(ends)
+    near = projection.near
+    behind1 = cam1[:, 2] <= near
+    behind2 = cam2[:, 2] <= near
+    keep = ~(behind1 & behind2)
+
+    # Обрезка ближней плоскостью
+    cross = keep & (behind1 | behind2)
+    if cross.any():
+        a, b = cam1[cross], cam2[cross]
+        t = (near * NEAR_MARGIN - a[:, 2]) / (b[:, 2] - a[:, 2])
+        cut = a + t[:, None] * (b - a)
+        cam1[cross] = np.where(behind1[cross, None], cut, a)
+        cam2[cross] = np.where(behind2[cross, None], cut, b)
+
+    xy1, dist, _ = projection.camera_to_screen(cam1)
+    xy2, _, _ = projection.camera_to_screen(cam2)
+    offset = np.array(projection.offset, dtype=float)
+    p1, p2, inside = clip_segments(xy1 - offset, xy2 - offset, width, height)
+    keep &= inside
+    PROFILER.count(counter, int(len(keep) - np.count_nonzero(keep)))
+    return p1 + offset, p2 + offset, dist, keep
+
+
+def cull_spheres(projection, centers, extents, width, height):
+    """
+    Отбрасывание сфер вне пирамиды видимости.
+
+    extents - мировые радиусы с учетом ореола. Возвращает (xy, dist,
+    visible), как Projection.project, но visible учитывает и область вывода.
+    """
+    xy, dist, visible = projection.project(centers)
+    r = np.asarray(extents, dtype=float) * SPHERE_SCALE / np.where(visible, dist, 1.0)
+    ox, oy = projection.offset
+    visible &= ((xy[:, 0] + r > ox) & (xy[:, 0] - r < ox + width)
+                & (xy[:, 1] + r > oy) & (xy[:, 1] - r < oy + height))
+    PROFILER.count('culled_spheres', int(len(visible) - np.count_nonzero(visible)))
+    return xy, dist, visible
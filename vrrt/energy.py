@@ -0,0 +1,175 @@
+"""
+Энергия лучей и оценка освещенности приемника.
+
+Каждый луч источника несет долю 1/N его мощности. При отражении
+энергия умножается на reflectivity зеркала, а лучи, энергия которых
+упала ниже порога, проходят русскую рулетку: луч продолжается с
+вероятностью energy / threshold и получает энергию threshold, иначе
+обрывается. Оценка остается несмещенной, а тусклые пути не
+расходуют отражения впустую. Ослабление и рулетка - tracer.Roulette,
+как в trace_wavefront: с тем же seed обрываются те же лучи, что и
+при trace_scene(..., roulette=threshold, seed=seed). Глубина ограничена только MAX_DEPTH
+(предохранитель), а не reflection_depth сцены.
+
+Приемник - сфера радиуса RECEIVER_RADIUS в точке target (так он и
+нарисован). Луч, который на очередном звене встречает приемник
+раньше зеркала, отдает ему свою энергию. Поток на приемник - среднее
+по лучам, освещенность - поток на площадь сечения приемника.
+
+Лучи трассируются порциями. После каждой порции считается
+относительная стандартная ошибка среднего, и трассировка
+останавливается, когда она не больше rel_error.
+"""
+import math
+
+import numpy as np
+
+from .sampling import sample_directions
+from .tracer import (HIT_EPSILON, ROULETTE_THRESHOLD, Roulette, TraceCancelled,
+                     nearest_sphere_hits, reflect_hits)
+
+# Радиус приемника (как у VRRenderer.sphere_objects)
+RECEIVER_RADIUS = 0.3
+
+# Предел числа отражений (порог рулетки - tracer.ROULETTE_THRESHOLD)
+MAX_DEPTH = 64
+
+# Порции трассировки и критерий остановки по дисперсии
+BATCH_RAYS = 2000
+MIN_RAYS = 4000
+MAX_RAYS = 200000
+REL_ERROR = 0.05
+
+
+def trace_energy(origin, directions, centers, radii, roulette, receiver,
+                 receiver_radius=RECEIVER_RADIUS, max_depth=MAX_DEPTH, eps=HIT_EPSILON,
+                 accel=None):
+    """
+    Трассировка пакета лучей с учетом энергии (начальная энергия - 1).
+
+    roulette - tracer.Roulette (reflectivity зеркал, порог и seed).
+    Возвращает (received, bounces, killed): энергию, дошедшую до
+    приемника от каждого луча (0 - не дошла), число отражений каждого
+    луча и число лучей, оборванных рулеткой.
+    """
+    directions = np.asarray(directions, dtype=float)
+    centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+    radii = np.asarray(radii, dtype=float).reshape(-1)
+    receiver = np.asarray(receiver, dtype=float).reshape(1, 3)
+    n = len(directions)
+
+    lengths = np.linalg.norm(directions, axis=1)
+    dirs = directions / np.where(lengths > 0, lengths, 1)[:, None]
+    origins = np.broadcast_to(np.asarray(origin, dtype=float), (n, 3)).copy()
+    energy = np.ones(n)
+    ray_ids = np.arange(n)
+    received = np.zeros(n)
+    bounces = np.zeros(n, dtype=np.int64)
+    killed = roulette.killed
+
+    for depth in range(max_depth + 1):
+        if len(ray_ids) == 0:
+            break
+        if accel is not None:
+            t, idx = accel.nearest_hit(origins, dirs, eps)
+        else:
+            t, idx = nearest_sphere_hits(origins, dirs, centers, radii, eps)
+        t_recv, idx_recv = nearest_sphere_hits(origins, dirs, receiver,
+                                               np.array([receiver_radius]), eps)
+        # Приемник ближе зеркала: энергия луча доставлена
+        arrived = (idx_recv >= 0) & (t_recv < t)
+        received[ray_ids[arrived]] = energy[arrived]
+
+        hit = (idx >= 0) & ~arrived
+        origins, dirs, ray_ids, energy = origins[hit], dirs[hit], ray_ids[hit], energy[hit]
+        t, idx = t[hit], idx[hit]
+        bounces[ray_ids] = depth + 1
+
+        points, _, reflected, ok = reflect_hits(origins, dirs, t, idx, centers)
+        energy, keep = roulette.apply(energy, idx, ray_ids, depth)
+        go = ok & keep
+        origins, dirs, ray_ids, energy = points[go], reflected[go], ray_ids[go], energy[go]
+
+    return received, bounces, roulette.killed - killed
+
+
+class IrradianceEstimate:
+    """Итог оценки: поток и освещенность приемника с погрешностью"""
+
+    def __init__(self, receiver_radius=RECEIVER_RADIUS):
+        self.receiver_radius = receiver_radius
+        self.rays = 0
+        self.hits = 0
+        self.killed = 0
+        self.bounces = 0
+        self.converged = False
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def add(self, received, bounces, killed):
+        """Учет порции лучей"""
+        self.rays += len(received)
+        self.hits += int(np.count_nonzero(received))
+        self.killed += killed
+        self.bounces += int(bounces.sum())
+        self._sum += float(received.sum())
+        self._sum_sq += float(np.dot(received, received))
+
+    @property
+    def flux(self):
+        """Доля мощности источника, дошедшая до приемника"""
+        return self._sum / self.rays if self.rays else 0.0
+
+    @property
+    def irradiance(self):
+        """Освещенность: поток на площадь сечения приемника"""
+        return self.flux / (math.pi * self.receiver_radius ** 2)
+
+    @property
+    def std_error(self):
+        """Стандартная ошибка среднего потока"""
+        if self.rays < 2:
+            return math.inf
+        mean = self.flux
+        variance = max(self._sum_sq / self.rays - mean * mean, 0.0) * self.rays / (self.rays - 1)
+        return math.sqrt(variance / self.rays)
+
+    @property
+    def rel_error(self):
+        """Относительная погрешность (inf, пока в приемник ничего не попало)"""
+        return self.std_error / self.flux if self.flux > 0 else math.inf
+
+    @property
+    def mean_bounces(self):
+        """Среднее число отражений на луч"""
+        return self.bounces / self.rays if self.rays else 0.0
+
+
+def estimate_irradiance(scene, rel_error=REL_ERROR, batch_rays=BATCH_RAYS, min_rays=MIN_RAYS,
+                        max_rays=MAX_RAYS, threshold=ROULETTE_THRESHOLD, max_depth=MAX_DEPTH,
+                        receiver_radius=RECEIVER_RADIUS, seed=0, cancel=None):
+    """
+    Оценка освещенности приемника сцены порциями по batch_rays лучей.
+
+    Останавливается, когда относительная погрешность не больше rel_error
+    (но не раньше min_rays лучей) или набрано max_rays лучей. Порции
+    получают свой генератор направлений ([seed, номер первого луча]), как
+    в PathCache.trace, а рулетка - Roulette с тем же seed. cancel() == True
+    прерывает оценку между порциями (TraceCancelled).
+    """
+    centers, radii = scene.mirror_arrays()
+    accel = scene.accelerator()
+    estimate = IrradianceEstimate(receiver_radius)
+    for start in range(0, max_rays, batch_rays):
+        if cancel is not None and cancel():
+            raise TraceCancelled()
+        count = min(batch_rays, max_rays - start)
+        rng = np.random.default_rng(seed if start == 0 else [seed, start])
+        directions = sample_directions(scene.sampler, count, start, rng)
+        roulette = Roulette(scene.mirrors.reflectivity, threshold, seed, start)
+        estimate.add(*trace_energy(scene.source, directions, centers, radii, roulette,
+                                   scene.target, receiver_radius, max_depth, accel=accel))
+        if estimate.rays >= min_rays and estimate.rel_error <= rel_error:
+            estimate.converged = True
+            break
+    return estimate
@@ -0,0 +1,231 @@
+"""
+Потоковая выгрузка трассированных путей.
+
+Лучи трассируются порциями по chunk_rays (iter_segments), и каждая
+порция сразу записывается в файл, поэтому память ограничена размером
+порции при любом общем числе лучей. Запись отрезка: номер луча,
+номер отражения, индекс зеркала, начало (origin), точка попадания
+(hit) и нормаль.
+
+Форматы:
+    ndjson - по JSON объекту на строку
+    csv    - таблица с заголовком
+    npy    - двоичный массив записей RECORD_DTYPE в формате .npy;
+             файл можно дописывать (append) и открывать без загрузки
+             в память: np.load(path, mmap_mode='r')
+
+Порции для случайных методов выборки получают свой генератор
+([seed, номер первого луча]), как в PathCache.trace; от размера порции
+не зависят только пути для halton и sobol.
+
+При дописывании (append) номера лучей и выборка направлений
+продолжаются после наибольшего номера луча в файле, поэтому
+дописанные пути не повторяют уже записанные.
+"""
+import ast
+import json
+import os
+
+import numpy as np
+
+from .tracer import trace_scene
+
+# Лучей в одной порции трассировки
+CHUNK_RAYS = 50000
+
+# Формат чисел в текстовых форматах
+FLOAT_FORMAT = '%.9g'
+
+FORMATS = ('ndjson', 'csv', 'npy')
+
+# Двоичная запись отрезка
+RECORD_DTYPE = np.dtype([('ray', '<i4'), ('depth', '<i2'), ('mirror', '<i4'),
+                         ('origin', '<f8', (3,)), ('hit', '<f8', (3,)),
+                         ('normal', '<f8', (3,))])
+
+# Размер заголовка .npy: с запасом, чтобы перезаписывать его на месте
+NPY_HEADER_SIZE = 256
+
+CSV_COLUMNS = ('ray', 'depth', 'mirror', 'origin_x', 'origin_y', 'origin_z',
+               'hit_x', 'hit_y', 'hit_z', 'normal_x', 'normal_y', 'normal_z')
+
+
+def iter_segments(scene, num_rays=None, depth=None, chunk_rays=CHUNK_RAYS, seed=0,
+                  trace=trace_scene, start=0):
+    """Генератор порций RaySegments для лучей [start, start + num_rays) сцены"""
+    if num_rays is None:
+        num_rays = scene.num_rays
+    end = start + num_rays
+    for lo in range(start, end, chunk_rays):
+        count = min(chunk_rays, end - lo)
+        rng = np.random.default_rng(seed if lo == 0 else [seed, lo])
+        yield trace(scene, count, depth, rng, start=lo)
+
+
+def _next_ray_text(path, ray_of, header=False):
+    """Номер луча после наибольшего в текстовом файле (ray_of(строка) - номер луча)"""
+    last = -1
+    with open(path, encoding='utf-8') as f:
+        if header:
+            next(f, None)
+        for line in f:
+            if line.strip():
+                last = max(last, ray_of(line))
+    return last + 1
+
+
+def segment_table(segments):
+    """Отрезки в виде таблицы (K, 12) в порядке CSV_COLUMNS"""
+    return np.column_stack([segments.ray, segments.depth, segments.mirror,
+                            segments.starts, segments.ends, segments.normals])
+
+
+def segment_records(segments):
+    """Отрезки в виде массива записей RECORD_DTYPE"""
+    records = np.empty(len(segments), dtype=RECORD_DTYPE)
+    records['ray'] = segments.ray
+    records['depth'] = segments.depth
+    records['mirror'] = segments.mirror
+    records['origin'] = segments.starts
+    records['hit'] = segments.ends
+    records['normal'] = segments.normals
+    return records
+
+
+class NDJSONWriter:
+    """Запись отрезков: по JSON объекту на строку"""
+
+    def __init__(self, path, append=False):
+        # Номер первого луча для дописывания
+        self.next_ray = 0
+        if append and os.path.exists(path):
+            self.next_ray = _next_ray_text(path, lambda line: json.loads(line)['ray'])
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8')
+        vec = ','.join([FLOAT_FORMAT] * 3)
+        self.fmt = ('{"ray":%d,"depth":%d,"mirror":%d,'
+                    f'"origin":[{vec}],"hit":[{vec}],"normal":[{vec}]}}')
+        self.count = 0
+
+    def write(self, segments):
+        np.savetxt(self.file, segment_table(segments), fmt=self.fmt)
+        self.count += len(segments)
+
+    def close(self):
+        self.file.close()
+
+
+class CSVWriter:
+    """Запись отрезков в CSV с заголовком"""
+
+    def __init__(self, path, append=False):
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.next_ray = 0
+        if exists:
+            self.next_ray = _next_ray_text(path, lambda line: int(line.split(',', 1)[0]),
+                                           header=True)
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8', newline='')
+        if not exists:
+            self.file.write(','.join(CSV_COLUMNS) + '\n')
+        self.fmt = ','.join(['%d'] * 3 + [FLOAT_FORMAT] * 9)
+        self.count = 0
+
+    def write(self, segments):
+        np.savetxt(self.file, segment_table(segments), fmt=self.fmt)
+        self.count += len(segments)
+
+    def close(self):
+        self.file.close()
+
+
+class NPYWriter:
+    """
+    Дописываемый массив записей в формате .npy.
+
+    Заголовок фиксированного размера перезаписывается при закрытии с
+    итоговым числом записей, данные дописываются в конец файла.
+    """
+
+    def __init__(self, path, append=False):
+        self.count = 0
+        self.next_ray = 0
+        if append and os.path.exists(path):
+            self.file = open(path, 'r+b')
+            self.count = self._read_header()
+            if self.count:
+                records = np.memmap(path, RECORD_DTYPE, 'r', NPY_HEADER_SIZE, (self.count,))
+                self.next_ray = int(records['ray'].max()) + 1
+                del records
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.file = open(path, 'w+b')
+            self._write_header()
+
+    def _write_header(self):
+        header = repr({'descr': np.lib.format.dtype_to_descr(RECORD_DTYPE),
+                       'fortran_order': False, 'shape': (self.count,)})
+        prefix = b'\x93NUMPY\x01\x00'
+        body_size = NPY_HEADER_SIZE - len(prefix) - 2
+        header = header.ljust(body_size - 1) + '\n'
+        self.file.seek(0)
+        self.file.write(prefix + body_size.to_bytes(2, 'little') + header.encode('latin1'))
+
+    def _read_header(self):
+        self.file.seek(0)
+        prefix = self.file.read(10)
+        if prefix[:8] != b'\x93NUMPY\x01\x00':
+            raise ValueError('файл не является .npy версии 1.0')
+        body_size = int.from_bytes(prefix[8:10], 'little')
+        if body_size + 10 != NPY_HEADER_SIZE:
+            raise ValueError('файл создан не NPYWriter: дописывать нельзя')
+        header = ast.literal_eval(self.file.read(body_size).decode('latin1'))
+        if np.dtype(np.lib.format.descr_to_dtype(header['descr'])) != RECORD_DTYPE:
+            raise ValueError('формат записей файла отличается от RECORD_DTYPE')
+        return header['shape'][0]
+
+    def write(self, segments):
+        self.file.write(segment_records(segments).tobytes())
+        self.count += len(segments)
+
+    def close(self):
+        self._write_header()
+        self.file.close()
+
+
+WRITERS = {'ndjson': NDJSONWriter, 'csv': CSVWriter, 'npy': NPYWriter}
+
+
+def format_for(path):
+    """Формат по расширению файла"""
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext in ('json', 'jsonl'):
+        return 'ndjson'
+    if ext not in FORMATS:
+        raise ValueError(f"неизвестный формат файла: {path}")
+    return ext
+
+
+def export_paths(scene, path, fmt=None, num_rays=None, depth=None,
+                 chunk_rays=CHUNK_RAYS, seed=0, append=False, progress=None,
+                 trace=trace_scene):
+    """
+    Трассировка и запись путей порциями. Возвращает число записанных отрезков.
+
+    С append лучи нумеруются после наибольшего номера в файле.
+    progress(лучей, отрезков) вызывается после каждой порции.
+    """
+    if num_rays is None:
+        num_rays = scene.num_rays
+    writer = WRITERS[fmt or format_for(path)](path, append=append)
+    written = 0
+    rays = 0
+    try:
+        for segments in iter_segments(scene, num_rays, depth, chunk_rays, seed, trace,
+                                      writer.next_ray):
+            writer.write(segments)
+            written += len(segments)
+            rays = min(num_rays, rays + chunk_rays)
+            if progress is not None:
+                progress(rays, written)
+    finally:
+        writer.close()
+    return written
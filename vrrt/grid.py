@@ -0,0 +1,80 @@
+"""
+Геометрия сетки пола VR сцены.
+"""
+import numpy as np
+
+
+# Границы расстояний от камеры до блока сетки для уровней детализации:
+# ближе первой - шаг 1, дальше - шаг 2, за второй - шаг 4
+LOD_DISTANCES = (12.0, 20.0)
+
+
+class FloorGrid:
+    """
+    Сетка пола с уровнями детализации (LOD).
+
+    Пол разбит на квадратные блоки по block ячеек. Для каждого уровня L
+    заранее построены отрезки с шагом 2**L: линии только через каждые
+    2**L ячеек, длиной 2**L ячеек. На кадр для каждого блока
+    выбирается уровень по расстоянию от камеры до центра блока, и
+    рисуются только отрезки этого уровня. Линии на границах блоков есть
+    на всех уровнях, поэтому стыки блоков разного уровня без разрывов.
+    """
+
+    def __init__(self, grid_size=10, spacing=1.0, y=-1.0, block=4,
+                 lod_distances=LOD_DISTANCES):
+        self.lod_distances = np.asarray(lod_distances, dtype=float)
+        self.levels = []
+        for level in range(len(lod_distances) + 1):
+            step = 2 ** level
+            if block % step:
+                raise ValueError('размер блока должен делиться на шаг каждого уровня')
+            self.levels.append(self._level_lines(grid_size, spacing, y, step, block))
+
+        # Центры блоков (индексы блоков - от минимального)
+        first = -grid_size // block
+        count = grid_size // block - first + 1
+        centers = (np.arange(count) + first + 0.5) * block * spacing
+        bx, bz = np.meshgrid(centers, centers, indexing='ij')
+        self.block_centers = np.stack([bx.ravel(), np.full(bx.size, y), bz.ravel()], axis=1)
+        self.block_first = first
+        self.block_count = count
+
+    def _level_lines(self, grid_size, spacing, y, step, block):
+        """Отрезки уровня с шагом step: (starts, ends, индекс блока)"""
+        lo, hi = -grid_size, grid_size + 1
+        # Положения линий и начала отрезков вдоль линии, кратные шагу
+        lines = np.array([k for k in range(lo, hi) if k % step == 0], dtype=float)
+        seg_lo = np.arange(lo - lo % step, hi, step, dtype=float)
+        seg_start = np.maximum(seg_lo, lo)
+        seg_end = np.minimum(seg_lo + step, hi)
+
+        p, a = np.meshgrid(lines, seg_start, indexing='ij')
+        _, b = np.meshgrid(lines, seg_end, indexing='ij')
+        p, a, b = p.ravel(), a.ravel(), b.ravel()
+        yy = np.full_like(p, y)
+        # Линии вдоль Z (x = p) и вдоль X (z = p)
+        starts = np.concatenate([np.stack([p, yy, a], axis=1), np.stack([a, yy, p], axis=1)])
+        ends = np.concatenate([np.stack([p, yy, b], axis=1), np.stack([b, yy, p], axis=1)])
+        cell_x = np.concatenate([p, a])
+        cell_z = np.concatenate([a, p])
+        first = -grid_size // block
+        count = grid_size // block - first + 1
+        blocks = ((np.floor(cell_x / block) - first) * count
+                  + np.floor(cell_z / block) - first).astype(int)
+        return starts * spacing, ends * spacing, blocks
+
+    def block_levels(self, camera_pos):
+        """Уровень детализации каждого блока для положения камеры"""
+        dist = np.linalg.norm(self.block_centers - np.asarray(camera_pos, dtype=float), axis=1)
+        return np.searchsorted(self.lod_distances, dist)
+
+    def lines(self, camera_pos):
+        """Отрезки сетки (starts, ends) для положения камеры"""
+        levels = self.block_levels(camera_pos)
+        starts, ends = [], []
+        for level, (s, e, blocks) in enumerate(self.levels):
+            mask = levels[blocks] == level
+            starts.append(s[mask])
+            ends.append(e[mask])
+        return np.concatenate(starts), np.concatenate(ends)
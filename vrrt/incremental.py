@@ -0,0 +1,436 @@
+"""
+Инкрементальная перетрассировка при изменении отдельных зеркал.
+
+PathIndex хранит пути лучей как звенья (pieces): отрезок от начала до
+попадания в зеркало или уход - луч, не попавший ни в одно зеркало
+(сдвинутое зеркало может оказаться у него на пути). Для звеньев
+построены два индекса:
+    - зеркало -> звенья, которые в него попадают;
+    - равномерная пространственная сетка: ячейка -> звенья, проходящие
+      через нее (по точкам вдоль звена с шагом в половину ячейки).
+Индексы хранятся в виде CSR (сортированные номера + смещения).
+
+При перемещении сферы или смене ее радиуса затронуты лучи, которые в
+нее попадали, и лучи, звено которых на новом месте пересекает сферу
+раньше своего конца (кандидаты берутся из ячеек вокруг сферы). Такие
+лучи перетрассируются с первого затронутого отражения, поэтому время
+правки растет с числом затронутых лучей, а не с числом всех путей.
+
+Индекс строится из готовых RaySegments без повторной трассировки:
+направления звеньев восстанавливаются теми же операциями, что в
+trace_wavefront, и перетрассировка неизмененной сцены дает те же пути.
+Новые звенья дописываются в конец; когда их становится много, индекс
+перестраивается (compact).
+
+В маленьких сценах сдвинутое зеркало задевает большую долю лучей, и
+полная трассировка дешевле поиска затронутых звеньев: prefer_incremental
+выбирает способ по числу зеркал и лучей (порог замерен
+benchmarks/suite.py --only edit).
+"""
+import numpy as np
+
+from .pixeltrace import primary_rays
+from .profiler import PROFILER
+from .sampling import sample_directions
+from .tracer import DEPTH_DTYPE, HIT_EPSILON, INDEX_DTYPE, RaySegments, nearest_sphere_hits
+
+# Ячеек сетки вдоль наибольшей стороны сцены
+GRID_RESOLUTION = 32
+
+# Перестроение индекса, когда дописанных звеньев больше этой доли
+COMPACT_FRACTION = 0.5
+
+# Частичная перетрассировка выгоднее полной: всегда от INCREMENTAL_MIRRORS
+# зеркал, от INCREMENTAL_MIN_MIRRORS - при зеркалах x лучах от INCREMENTAL_WORK
+# (5 зеркал, 100 лучей: 0.9 мс полная против 3.3 мс частичной;
+# 50 зеркал, 100 лучей: 2.5 против 0.7 мс)
+INCREMENTAL_MIRRORS = 48
+INCREMENTAL_MIN_MIRRORS = 16
+INCREMENTAL_WORK = 8192
+
+# Поля звена: (имя, тип, форма строки)
+PIECE_FIELDS = (('origin', float, (3,)), ('direction', float, (3,)), ('end', float, (3,)),
+                ('normal', float, (3,)), ('length', float, ()), ('depth', DEPTH_DTYPE, ()),
+                ('mirror', INDEX_DTYPE, ()), ('ray', INDEX_DTYPE, ()), ('alive', bool, ()))
+
+
+def _csr(keys, count):
+    """Порядок элементов по ключу и смещения групп (ключи 0..count-1)"""
+    order = np.argsort(keys, kind='stable')
+    offsets = np.searchsorted(keys[order], np.arange(count + 1))
+    return order, offsets
+
+
+def _gather(order, offsets, groups):
+    """Элементы указанных групп CSR одним массивом"""
+    starts, ends = offsets[groups], offsets[np.asarray(groups) + 1]
+    sizes = ends - starts
+    total = int(sizes.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    first = np.repeat(starts - np.concatenate([[0], np.cumsum(sizes)[:-1]]), sizes)
+    return order[first + np.arange(total)]
+
+
+def _reflect(dirs, normals):
+    """Отраженное направление - те же операции, что в trace_wavefront"""
+    dot = np.einsum('ij,ij->i', dirs, normals)
+    return dirs - 2 * dot[:, None] * normals
+
+
+def prefer_incremental(num_mirrors, num_rays):
+    """Выгодна ли частичная перетрассировка сцены такого размера"""
+    if num_mirrors >= INCREMENTAL_MIRRORS:
+        return True
+    return num_mirrors >= INCREMENTAL_MIN_MIRRORS and num_mirrors * num_rays >= INCREMENTAL_WORK
+
+
+def pick_mirror(projection, x, y, centers, radii):
+    """
+    Зеркало под экранной точкой (x, y): (индекс, глубина центра в
+    системе камеры) или None. Глубина нужна для перетаскивания
+    в плоскости, параллельной экрану (Projection.unproject).
+    """
+    dirs = primary_rays(projection, np.array([x], dtype=float), np.array([y], dtype=float))
+    t, idx = nearest_sphere_hits(projection.camera_pos[None], dirs,
+                                 np.asarray(centers, dtype=float).reshape(-1, 3),
+                                 np.asarray(radii, dtype=float).reshape(-1), eps=0)
+    if idx[0] < 0:
+        return None
+    z = projection.to_camera(np.asarray(centers[idx[0]], dtype=float))[0, 2]
+    return int(idx[0]), float(z)
+
+
+class PathIndex:
+    """
+    Пути лучей сцены с индексами для инкрементальной перетрассировки.
+
+    max_depth - наибольший номер отражения путей. Создается через
+    from_segments; update(centers, radii) перетрассирует только лучи,
+    затронутые изменившимися сферами, и возвращает новые RaySegments.
+    """
+
+    def __init__(self, source, centers, radii, max_depth, eps=HIT_EPSILON):
+        self.source = np.array(source, dtype=float)
+        self.centers = np.array(centers, dtype=float).reshape(-1, 3)
+        self.radii = np.array(radii, dtype=float).reshape(-1)
+        self.max_depth = max_depth
+        self.eps = eps
+        self.size = 0
+        self.base = 0               # звенья [0, base) входят в CSR индексы
+        self.arrays = {name: np.empty((0,) + shape, dtype=dtype)
+                       for name, dtype, shape in PIECE_FIELDS}
+        self.last_affected = 0      # лучей перетрассировано при последней правке
+        self.num_rays = 0
+        self.dtype = np.dtype(np.float64)     # тип чисел отрезков (как у сцены)
+        self.state = None           # параметры сцены, от которых зависят пути
+        self._segments = None
+
+    @classmethod
+    def from_segments(cls, segments, directions, source, centers, radii, max_depth):
+        """
+        Индекс по готовым путям.
+
+        directions - исходные направления лучей (N, 3), как при трассировке;
+        номера лучей в segments - от 0.
+        """
+        index = cls(source, centers, radii, max_depth)
+        directions = np.asarray(directions, dtype=float)
+        n = len(directions)
+        lengths = np.linalg.norm(directions, axis=1)
+        current = directions / np.where(lengths > 0, lengths, 1)[:, None]
+        last_end = np.broadcast_to(index.source, (n, 3)).copy()
+        last_depth = np.full(n, -1)
+        stopped = np.zeros(n, dtype=bool)
+
+        starts = segments.starts.astype(float)
+        ends = segments.ends.astype(float)
+        normals = segments.normals.astype(float)
+        piece_dirs = np.empty_like(starts)
+        for depth in range(max_depth + 1):
+            rows = np.flatnonzero(segments.depth == depth)
+            if len(rows) == 0:
+                break
+            rays = segments.ray[rows]
+            piece_dirs[rows] = current[rays]
+            current[rays] = _reflect(current[rays], normals[rows])
+            last_end[rays] = ends[rows]
+            last_depth[rays] = depth
+            # Вырожденная нормаль обрывает луч (как в trace_wavefront)
+            stopped[rays] = ~np.any(normals[rows] != 0, axis=1)
+
+        index._append(starts, piece_dirs, ends, normals,
+                      np.linalg.norm(ends - starts, axis=1), segments.depth,
+                      segments.mirror, segments.ray)
+        escapes = np.flatnonzero((last_depth < max_depth) & ~stopped)
+        index._append_escapes(last_end[escapes], current[escapes],
+                              last_depth[escapes] + 1, escapes)
+        index.num_rays = n
+        index.build()
+        return index
+
+    @classmethod
+    def from_scene(cls, scene, segments, seed=0):
+        """Индекс путей кадра сцены (направления - как у PathCache.trace с зерном seed)"""
+        rng = np.random.default_rng(seed)
+        directions = sample_directions(scene.sampler, scene.num_rays, 0, rng)
+        centers, radii = scene.mirror_arrays()
+        index = cls.from_segments(segments, directions, scene.source, centers, radii,
+                                  scene.reflection_depth)
+        index.dtype = scene.dtype
+        index.state = cls.scene_state(scene, seed)
+        return index
+
+    @staticmethod
+    def scene_state(scene, seed=0):
+        """Все, от чего зависят пути, кроме положения и радиусов зеркал"""
+        return (tuple(float(c) for c in scene.source), int(scene.num_rays),
+                int(scene.reflection_depth), scene.sampler, seed, scene.dtype.str,
+                len(scene.mirrors))
+
+    def matches(self, scene, seed=0):
+        """Подходит ли индекс для сцены (иначе его нужно построить заново)"""
+        return self.state == self.scene_state(scene, seed)
+
+    def update_scene(self, scene):
+        """Перетрассировка по текущим зеркалам сцены (см. update)"""
+        centers, radii = scene.mirror_arrays()
+        return self.update(centers, radii, scene.accelerator())
+
+    # --- Хранение звеньев ---
+
+    def _append(self, origin, direction, end, normal, length, depth, mirror, ray):
+        """Дописывание звеньев (массивы растут с запасом, как у SphereStore)"""
+        count = len(depth)
+        if self.size + count > len(self.arrays['depth']):
+            capacity = max(2 * len(self.arrays['depth']), self.size + count, 64)
+            for name, array in self.arrays.items():
+                grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+                grown[:self.size] = array[:self.size]
+                self.arrays[name] = grown
+        values = {'origin': origin, 'direction': direction, 'end': end, 'normal': normal,
+                  'length': length, 'depth': depth, 'mirror': mirror, 'ray': ray, 'alive': True}
+        for name, value in values.items():
+            self.arrays[name][self.size:self.size + count] = value
+        self.size += count
+        self._segments = None
+
+    def _append_escapes(self, origin, direction, depth, ray):
+        """Уходы: лучи без попадания (конец и нормаль не определены)"""
+        count = len(depth)
+        self._append(origin, direction, np.full((count, 3), np.nan), np.zeros((count, 3)),
+                     np.full(count, np.inf), depth, np.full(count, -1), ray)
+
+    def __getattr__(self, name):
+        # Поля звеньев без запаса: index.origin, index.depth, ...
+        arrays = self.__dict__.get('arrays')
+        if arrays is not None and name in arrays:
+            return arrays[name][:self.size]
+        raise AttributeError(name)
+
+    # --- Индексы ---
+
+    def build(self, extra=None):
+        """
+        Перестроение индексов по живым звеньям (с уплотнением).
+
+        extra - сферы (centers (K, 3), radii (K,)), которые должны
+        поместиться в сетку.
+        """
+        keep = np.flatnonzero(self.alive)
+        if len(keep) < self.size:
+            for array in self.arrays.values():
+                array[:len(keep)] = array[keep]
+            self.size = len(keep)
+        self.base = self.size
+
+        # Границы сетки: пути, зеркала и (при необходимости) новая сфера
+        finite = np.isfinite(self.length)
+        points = [self.source[None], self.origin, self.end[finite],
+                  self.centers - self.radii[:, None], self.centers + self.radii[:, None]]
+        if extra is not None:
+            centers, radii = extra
+            points += [centers - radii[:, None], centers + radii[:, None]]
+        points = np.concatenate(points)
+        lo, hi = points.min(axis=0), points.max(axis=0)
+        self.cell = max(float((hi - lo).max()) / GRID_RESOLUTION, 1e-6)
+        self.lo = lo - self.cell
+        self.shape = np.ceil((hi + self.cell - self.lo) / self.cell).astype(int) + 1
+
+        cells, pieces = self._cells(np.arange(self.base))
+        self.grid_order, self.grid_offsets = _csr(cells, int(np.prod(self.shape)))
+        self.grid_pieces = pieces
+        self.mirror_order, self.mirror_offsets = _csr(self.mirror + 1, len(self.centers) + 1)
+        self.ray_order, self.ray_offsets = _csr(self.ray, self.num_rays)
+        # Пары (ячейка, звено) для звеньев, дописанных после build
+        self.extra_cells = np.empty(0, dtype=np.int64)
+        self.extra_pieces = np.empty(0, dtype=np.int64)
+
+    def _cells(self, pieces):
+        """Пары (ячейка, звено) для звеньев pieces (без повторов)"""
+        if len(pieces) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        origin = self.origin[pieces]
+        direction = self.direction[pieces]
+        length = self.length[pieces].copy()
+        # Уходы обрезаются границами сетки (метод плит)
+        escape = ~np.isfinite(length)
+        if escape.any():
+            hi = self.lo + self.shape * self.cell
+            with np.errstate(divide='ignore', invalid='ignore'):
+                inv = 1.0 / direction[escape]
+                t1 = (self.lo - origin[escape]) * inv
+                t2 = (hi - origin[escape]) * inv
+            exit_t = np.nanmin(np.maximum(t1, t2), axis=1)
+            length[escape] = np.clip(exit_t, 0, None)
+
+        step = self.cell / 2
+        samples = (length / step).astype(np.int64) + 2
+        piece_of = np.repeat(np.arange(len(pieces)), samples)
+        first = np.repeat(np.cumsum(samples) - samples, samples)
+        s = np.minimum((np.arange(len(piece_of)) - first) * step, length[piece_of])
+        points = origin[piece_of] + s[:, None] * direction[piece_of]
+        ijk = np.clip(((points - self.lo) / self.cell).astype(np.int64), 0, self.shape - 1)
+        cells = np.ravel_multi_index(ijk.T, self.shape)
+        pairs = np.unique(cells * len(pieces) + piece_of)
+        return pairs // len(pieces), np.asarray(pieces)[pairs % len(pieces)]
+
+    def _index_appended(self, first):
+        """Ячейки для звеньев [first, size), дописанных после build"""
+        cells, pieces = self._cells(np.arange(first, self.size))
+        self.extra_cells = np.concatenate([self.extra_cells, cells])
+        self.extra_pieces = np.concatenate([self.extra_pieces, pieces])
+
+    def fit(self, centers, radii):
+        """Перестроение сетки, если сферы выходят за ее границы"""
+        hi = self.lo + (self.shape - 1) * self.cell
+        if np.any(centers - radii[:, None] < self.lo) or np.any(centers + radii[:, None] > hi):
+            self.build((centers, radii))
+
+    def pieces_near(self, center, radius):
+        """Живые звенья, проходящие через ячейки вокруг сферы (кандидаты; сфера - внутри сетки)"""
+        center = np.asarray(center, dtype=float)
+        # Запас в одну ячейку: точки звена берутся с шагом в половину ячейки
+        lo = np.floor((center - radius - self.lo) / self.cell).astype(int) - 1
+        hi = np.floor((center + radius - self.lo) / self.cell).astype(int) + 1
+        lo, hi = np.clip(lo, 0, self.shape - 1), np.clip(hi, 0, self.shape - 1)
+        axes = [np.arange(a, b + 1) for a, b in zip(lo, hi)]
+        cells = np.ravel_multi_index([g.ravel() for g in np.meshgrid(*axes, indexing='ij')],
+                                     self.shape)
+        found = [self.grid_pieces[_gather(self.grid_order, self.grid_offsets, cells)],
+                 self.extra_pieces[np.isin(self.extra_cells, cells)]]
+        found = np.unique(np.concatenate(found))
+        return found[self.alive[found]]
+
+    def pieces_of_mirror(self, mirror):
+        """Живые звенья, попадающие в зеркало"""
+        base = _gather(self.mirror_order, self.mirror_offsets, [mirror + 1])
+        extra = self.base + np.flatnonzero(self.mirror[self.base:] == mirror)
+        found = np.concatenate([base, extra])
+        return found[self.alive[found]]
+
+    def pieces_of_rays(self, rays):
+        """Живые звенья указанных лучей"""
+        base = _gather(self.ray_order, self.ray_offsets, rays)
+        extra = self.base + np.flatnonzero(np.isin(self.ray[self.base:], rays))
+        found = np.concatenate([base, extra])
+        return found[self.alive[found]]
+
+    # --- Правка ---
+
+    def affected(self, mirror, center, radius):
+        """
+        Звенья, затронутые изменением сферы mirror (center, radius - новые).
+
+        Это звенья, попадавшие в нее, и звенья, которые теперь
+        пересекают ее раньше своего конца.
+        """
+        hits = self.pieces_of_mirror(mirror)
+        near = self.pieces_near(center, radius)
+        t, idx = nearest_sphere_hits(self.origin[near], self.direction[near],
+                                     np.asarray(center, dtype=float)[None],
+                                     np.array([radius], dtype=float), self.eps)
+        crossing = near[(idx >= 0) & (t < self.length[near])]
+        return np.concatenate([hits, crossing])
+
+    def update(self, centers, radii, accel=None):
+        """
+        Перетрассировка после изменения сфер; возвращает новые RaySegments.
+
+        Число сфер должно совпадать с прежним. accel - ускоряющая
+        структура для новых центров (как у trace_wavefront).
+        """
+        centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        radii = np.asarray(radii, dtype=float).reshape(-1)
+        if len(centers) != len(self.centers):
+            raise ValueError('число сфер изменилось: нужен новый индекс')
+        changed = np.flatnonzero(np.any(centers != self.centers, axis=1) | (radii != self.radii))
+        if len(changed) == 0:
+            return self.segments()
+
+        with PROFILER.stage('incremental_trace'):
+            # Перестроение - до выбора звеньев: оно меняет их номера
+            self.fit(centers[changed], radii[changed])
+            pieces = np.concatenate([self.affected(i, centers[i], radii[i]) for i in changed])
+            # Для каждого луча - первое затронутое отражение
+            order = np.lexsort((self.depth[pieces], self.ray[pieces]))
+            pieces = pieces[order]
+            first = np.ones(len(pieces), dtype=bool)
+            first[1:] = self.ray[pieces][1:] != self.ray[pieces][:-1]
+            restart = pieces[first]
+            rays = self.ray[restart]
+
+            # Звенья с первого затронутого отражения снимаются
+            old = self.pieces_of_rays(rays)
+            start_depth = np.zeros(self.num_rays, dtype=int)
+            start_depth[rays] = self.depth[restart]
+            self.arrays['alive'][old[self.depth[old] >= start_depth[self.ray[old]]]] = False
+
+            self.centers, self.radii = centers.copy(), radii.copy()
+            first_new = self.size
+            self._trace(self.origin[restart].copy(), self.direction[restart].copy(),
+                        rays, self.depth[restart].astype(int), accel)
+            self.last_affected = len(rays)
+            PROFILER.count('retraced_rays', len(rays))
+
+            if self.size - self.base > COMPACT_FRACTION * max(self.base, 1):
+                self.build()
+            else:
+                self._index_appended(first_new)
+        return self.segments()
+
+    def _trace(self, origins, dirs, rays, depths, accel=None):
+        """
+        Волновая трассировка лучей с разных отражений (depths - номер
+        отражения каждого луча); звенья дописываются в индекс.
+        """
+        while len(rays):
+            if accel is not None:
+                t, idx = accel.nearest_hit(origins, dirs, self.eps)
+            else:
+                t, idx = nearest_sphere_hits(origins, dirs, self.centers, self.radii, self.eps)
+            hit = idx >= 0
+            miss = ~hit
+            self._append_escapes(origins[miss], dirs[miss], depths[miss], rays[miss])
+
+            origins, dirs, rays, depths = origins[hit], dirs[hit], rays[hit], depths[hit]
+            t, idx = t[hit], idx[hit]
+            points = origins + t[:, None] * dirs
+            normals = points - self.centers[idx]
+            normal_len = np.linalg.norm(normals, axis=1)
+            ok = normal_len > 0
+            normals = normals / np.where(ok, normal_len, 1)[:, None]
+            self._append(origins, dirs, points, normals, t, depths, idx, rays)
+
+            reflected = _reflect(dirs, normals)
+            go = ok & (depths < self.max_depth)
+            origins, dirs, rays, depths = points[go], reflected[go], rays[go], depths[go] + 1
+
+    def segments(self):
+        """Пути в виде RaySegments (живые звенья с попаданием)"""
+        if self._segments is None:
+            rows = np.flatnonzero(self.alive & (self.mirror >= 0))
+            self._segments = RaySegments(self.origin[rows], self.end[rows], self.normal[rows],
+                                         self.depth[rows], self.mirror[rows],
+                                         self.ray[rows]).astype(self.dtype)
+        return self._segments
@@ -0,0 +1,226 @@
+"""
+Многопроцессная трассировка лучей.
+
+Набор лучей делится на шарды, которые трассируются в пуле процессов.
+Сцена (центры и радиусы сфер), направления лучей и выходные буферы
+отрезков лежат в разделяемой памяти (multiprocessing.shared_memory),
+поэтому между процессами передаются только имена буферов и границы
+шардов, а не списки кортежей.
+
+Выходной буфер имеет фиксированную раскладку: для каждого луча
+max_depth + 1 ячеек (по одной на отражение). Каждый луч трассируется
+независимо, поэтому результат не зависит ни от числа процессов,
+ни от разбиения на шарды, и после сжатия совпадает с trace_wavefront.
+"""
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .accel import ACCEL_MIN_SPHERES, SphereBVH
+from .sampling import sample_directions
+from .tracer import (DEPTH_DTYPE, INDEX_DTYPE, RaySegments, TraceCancelled, scene_roulette,
+                     trace_wavefront)
+
+# Меньшие пакеты выгоднее трассировать в текущем процессе
+MIN_PARALLEL_RAYS = 4096
+
+# Шардов на один процесс (для выравнивания нагрузки)
+SHARDS_PER_WORKER = 4
+
+# Период проверки отмены во время ожидания шардов (с)
+CANCEL_POLL_INTERVAL = 0.05
+
+# Кэш BVH в процессе-исполнителе: (имя буфера сцены, BVH)
+_worker_bvh = (None, None)
+
+
+def _attach(name):
+    """Подключение к существующему блоку разделяемой памяти"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # До Python 3.13 исполнители делят resource_tracker с родителем,
+        # который и удаляет блок, так что повторная регистрация безвредна
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedArrays:
+    """Набор массивов NumPy в одном блоке разделяемой памяти"""
+
+    def __init__(self, layout, name=None):
+        # layout: список (имя, форма, dtype)
+        self.layout = [(key, tuple(shape), np.dtype(dtype)) for key, shape, dtype in layout]
+        offsets = []
+        size = 0
+        for _, shape, dtype in self.layout:
+            size = (size + 63) // 64 * 64
+            offsets.append(size)
+            size += int(np.prod(shape)) * dtype.itemsize
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        else:
+            self.shm = _attach(name)
+        self.arrays = {}
+        for (key, shape, dtype), offset in zip(self.layout, offsets):
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf,
+                                          offset=offset)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def close(self):
+        """Отключение (и удаление, если блок создан этим объектом)"""
+        self.arrays.clear()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _trace_shard(task):
+    """Трассировка шарда лучей в процессе-исполнителе"""
+    global _worker_bvh
+    scene_name, scene_layout, rays_name, rays_layout, lo, hi, max_depth, roulette = task
+    scene = SharedArrays(scene_layout, scene_name)
+    rays = SharedArrays(rays_layout, rays_name)
+    try:
+        centers, radii = scene['centers'], scene['radii']
+        accel = None
+        if len(radii) >= ACCEL_MIN_SPHERES:
+            if _worker_bvh[0] != scene_name:
+                _worker_bvh = (scene_name, SphereBVH(centers, radii))
+            accel = _worker_bvh[1]
+
+        segments = trace_wavefront(rays['origin'], rays['directions'][lo:hi],
+                                   centers, radii, max_depth, accel=accel, roulette=roulette)
+        ray = segments.ray + lo
+        depth = segments.depth
+        rays['starts'][ray, depth] = segments.starts
+        rays['ends'][ray, depth] = segments.ends
+        rays['normals'][ray, depth] = segments.normals
+        rays['mirror'][ray, depth] = segments.mirror
+        # Ссылки на разделяемые буферы нужно отпустить до их закрытия
+        del centers, radii
+        return roulette.killed if roulette is not None else 0
+    finally:
+        scene.close()
+        rays.close()
+
+
+class ParallelTracer:
+    """Трассировка пакета лучей в пуле процессов через разделяемую память"""
+
+    def __init__(self, workers=None, min_parallel_rays=MIN_PARALLEL_RAYS):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_parallel_rays = min_parallel_rays
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            # spawn безопасен и для процесса с Tk и потоками
+            context = multiprocessing.get_context('spawn')
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._pool
+
+    def trace(self, origin, directions, centers, radii, max_depth, accel=None,
+              cancel=None, roulette=None):
+        """
+        То же, что trace_wavefront, но с разбиением лучей по процессам.
+
+        accel используется только при трассировке в текущем процессе
+        (маленький пакет); исполнители строят свой BVH по разделяемым данным.
+        cancel проверяется во время ожидания шардов: еще не начатые
+        шарды снимаются с очереди, запущенные дорабатывают.
+        roulette (tracer.Roulette) передается шардам со сдвигом номеров
+        лучей, поэтому рулетка дает те же пути, что и в одном процессе.
+        """
+        directions = np.asarray(directions, dtype=float).reshape(-1, 3)
+        centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        radii = np.asarray(radii, dtype=float).reshape(-1)
+        n = len(directions)
+        if self.workers <= 1 or n < self.min_parallel_rays:
+            if accel is None and len(radii) >= ACCEL_MIN_SPHERES:
+                accel = SphereBVH(centers, radii)
+            return trace_wavefront(origin, directions, centers, radii, max_depth,
+                                   accel=accel, cancel=cancel, roulette=roulette)
+
+        slots = max_depth + 1
+        scene_layout = [('centers', centers.shape, float), ('radii', radii.shape, float)]
+        rays_layout = [('origin', (3,), float), ('directions', (n, 3), float),
+                       ('starts', (n, slots, 3), float), ('ends', (n, slots, 3), float),
+                       ('normals', (n, slots, 3), float), ('mirror', (n, slots), INDEX_DTYPE)]
+        scene = SharedArrays(scene_layout)
+        rays = SharedArrays(rays_layout)
+        try:
+            scene['centers'][:] = centers
+            scene['radii'][:] = radii
+            rays['origin'][:] = origin
+            rays['directions'][:] = directions
+            rays['mirror'][:] = -1
+
+            step = max(1, -(-n // (self.workers * SHARDS_PER_WORKER)))
+            tasks = [(scene.name, scene_layout, rays.name, rays_layout,
+                      lo, min(n, lo + step), max_depth,
+                      roulette.shifted(lo) if roulette is not None else None)
+                     for lo in range(0, n, step)]
+            executor = self._executor()
+            pending = {executor.submit(_trace_shard, task) for task in tasks}
+            while pending:
+                done, pending = wait(pending, timeout=CANCEL_POLL_INTERVAL,
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    killed = future.result()
+                    if roulette is not None:
+                        roulette.killed += killed
+                if pending and cancel is not None and cancel():
+                    for future in pending:
+                        future.cancel()
+                    # Запущенные шарды пишут в буферы - ждем их до закрытия
+                    wait(pending)
+                    raise TraceCancelled()
+
+            # Сжатие: порядок по глубине, внутри глубины - по номеру луча
+            depth_idx, ray_idx = np.nonzero(rays['mirror'].T >= 0)
+            return RaySegments(rays['starts'][ray_idx, depth_idx],
+                               rays['ends'][ray_idx, depth_idx],
+                               rays['normals'][ray_idx, depth_idx],
+                               depth_idx.astype(DEPTH_DTYPE),
+                               rays['mirror'][ray_idx, depth_idx],
+                               ray_idx.astype(INDEX_DTYPE))
+        finally:
+            scene.close()
+            rays.close()
+
+    def trace_scene(self, scene, num_rays=None, depth=None, rng=None, cancel=None,
+                    start=0, roulette=None, seed=0):
+        """Параллельный аналог tracer.trace_scene"""
+        if num_rays is None:
+            num_rays = scene.num_rays
+        if depth is None:
+            depth = scene.reflection_depth
+        directions = sample_directions(scene.sampler, num_rays, start, rng)
+        centers, radii = scene.mirror_arrays()
+        segments = self.trace(scene.source, directions, centers, radii, depth,
+                              accel=scene.accelerator(), cancel=cancel,
+                              roulette=scene_roulette(scene, roulette, seed, start))
+        segments.ray += start
+        return segments.astype(scene.dtype)
+
+    def close(self):
+        """Остановка пула процессов"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,252 @@
+"""
+Попиксельная трассировка VR сцены (image order).
+
+Из позиции камеры через каждый пиксель выпускается первичный луч.
+В точке попадания в зеркало считается освещение от источника (с тенью)
+и блик, а луч отражается дальше до reflection_depth; доля отраженного
+света задается reflectivity зеркала. Источник и приемник светятся
+собственным цветом, промахи дают цвет неба.
+
+Кадр считается плитками по TILE_SIZE пикселей, между плитками
+проверяется отмена. Изображение уточняется от крупных блоков к
+полному разрешению (BLOCK_SIZES): сначала один луч на блок 8x8
+пикселей, затем 4x4, 2x2 и по лучу на пиксель.
+
+PixelTraceRenderer выполняет расчет в фоновом потоке (TraceWorker):
+при движении камеры или изменении сцены текущий расчет отменяется
+и начинается заново с самого грубого уровня.
+"""
+import numpy as np
+
+from .profiler import PROFILER
+from .raster import BACKGROUND, RasterRenderer, hex_to_rgb
+from .render import Layer
+from .tracer import HIT_EPSILON, TraceCancelled, nearest_sphere_hits
+from .worker import JobFailed, TraceWorker
+
+# Сторона плитки (в лучах) между проверками отмены
+TILE_SIZE = 64
+
+# Размеры блоков пикселей на один луч - от грубого к полному разрешению
+BLOCK_SIZES = (8, 4, 2, 1)
+
+# Освещение: фоновая доля, показатель блика
+AMBIENT = 0.15
+SHININESS = 32
+
+# Цвет неба у горизонта (к зениту - BACKGROUND)
+HORIZON = (0.12, 0.12, 0.25)
+
+
+class SphereSet:
+    """Сферы для попиксельной трассировки в виде массивов"""
+
+    def __init__(self, objects, light):
+        # objects - список (pos, radius, color, reflectivity, emissive),
+        # как у VRRenderer.sphere_objects(); light - точечный источник света
+        self.centers = np.array([obj[0] for obj in objects], dtype=float).reshape(-1, 3)
+        self.radii = np.array([obj[1] for obj in objects], dtype=float)
+        self.colors = np.array([hex_to_rgb(obj[2]) for obj in objects]).reshape(-1, 3)
+        self.reflectivity = np.array([obj[3] for obj in objects], dtype=float)
+        self.emissive = np.array([obj[4] for obj in objects], dtype=bool)
+        self.light = np.asarray(light, dtype=float)
+
+
+def primary_rays(projection, xs, ys):
+    """Направления лучей из камеры через экранные точки (xs, ys) - обратная проекция"""
+    cam = np.empty((len(xs), 3))
+    cam[:, 0] = (xs - projection.center[0]) / projection.fov
+    cam[:, 1] = -(ys - projection.center[1]) / projection.fov
+    cam[:, 2] = 1.0
+    dirs = cam @ projection.rotation
+    return dirs / np.linalg.norm(dirs, axis=1)[:, None]
+
+
+def sky(dirs):
+    """Цвет неба по направлению луча"""
+    up = np.clip(dirs[:, 1], 0, 1)[:, None]
+    return np.asarray(HORIZON) * (1 - up) + np.asarray(BACKGROUND) * up
+
+
+def shade_rays(spheres, origins, dirs, max_depth):
+    """
+    Цвет (N, 3) для пакета лучей с отражениями до max_depth.
+
+    На каждом отражении в цвет добавляется (1 - reflectivity) от
+    освещенности зеркала, а вес луча умножается на reflectivity.
+    На последнем отражении зеркало дает свой цвет полностью.
+    """
+    n = len(origins)
+    color = np.zeros((n, 3))
+    weight = np.ones(n)
+    alive = np.arange(n)
+    mirrors = ~spheres.emissive
+    for depth in range(max_depth + 1):
+        if len(alive) == 0:
+            break
+        t, idx = nearest_sphere_hits(origins, dirs, spheres.centers, spheres.radii)
+        hit = idx >= 0
+
+        miss = ~hit
+        color[alive[miss]] += weight[miss, None] * sky(dirs[miss])
+
+        glow = hit & spheres.emissive[np.maximum(idx, 0)]
+        color[alive[glow]] += weight[glow, None] * spheres.colors[idx[glow]]
+
+        keep = hit & ~glow
+        alive, weight = alive[keep], weight[keep]
+        origins, dirs, t, idx = origins[keep], dirs[keep], t[keep], idx[keep]
+        points = origins + t[:, None] * dirs
+        normals = points - spheres.centers[idx]
+        normals /= np.linalg.norm(normals, axis=1)[:, None]
+
+        # Освещение точечным источником с тенью от зеркал
+        to_light = spheres.light - points
+        light_dist = np.linalg.norm(to_light, axis=1)
+        to_light /= np.maximum(light_dist, 1e-12)[:, None]
+        shadow_t, _ = nearest_sphere_hits(points + normals * HIT_EPSILON, to_light,
+                                          spheres.centers[mirrors], spheres.radii[mirrors])
+        lit = (shadow_t >= light_dist).astype(float)
+        diffuse = np.clip(np.einsum('ij,ij->i', normals, to_light), 0, None) * lit
+        dot = np.einsum('ij,ij->i', dirs, normals)
+        reflected = dirs - 2 * dot[:, None] * normals
+        specular = np.clip(np.einsum('ij,ij->i', reflected, to_light), 0, None) ** SHININESS * lit
+
+        base = spheres.colors[idx] * (AMBIENT + (1 - AMBIENT) * diffuse)[:, None]
+        reflectivity = spheres.reflectivity[idx]
+        if depth == max_depth:
+            reflectivity = np.zeros_like(reflectivity)
+        color[alive] += weight[:, None] * ((1 - reflectivity)[:, None] * base
+                                           + specular[:, None])
+        weight = weight * reflectivity
+
+        bounce = weight > 0
+        alive, weight = alive[bounce], weight[bounce]
+        origins, dirs = points[bounce], reflected[bounce]
+    return color
+
+
+def render_pixels(spheres, projection, max_depth, block=1, cancel=None):
+    """
+    Изображение (H, W, 3) с одним лучом на блок block x block пикселей.
+
+    Возвращается изображение в разрешении блоков (ceil(H/block), ceil(W/block));
+    cancel() == True прерывает расчет между плитками (TraceCancelled).
+    """
+    h = -(-projection.height // block)
+    w = -(-projection.width // block)
+    image = np.empty((h, w, 3), dtype=np.float32)
+    origin = projection.camera_pos
+    for y0 in range(0, h, TILE_SIZE):
+        for x0 in range(0, w, TILE_SIZE):
+            if cancel is not None and cancel():
+                raise TraceCancelled()
+            y1 = min(h, y0 + TILE_SIZE)
+            x1 = min(w, x0 + TILE_SIZE)
+            gy, gx = np.mgrid[y0:y1, x0:x1]
+            # Луч через центр блока
+            xs = (gx.ravel() + 0.5) * block
+            ys = (gy.ravel() + 0.5) * block
+            dirs = primary_rays(projection, xs, ys)
+            origins = np.broadcast_to(origin, dirs.shape).copy()
+            tile = shade_rays(spheres, origins, dirs, max_depth)
+            image[y0:y1, x0:x1] = tile.reshape(y1 - y0, x1 - x0, 3)
+    return image
+
+
+class PixelTraceRenderer(RasterRenderer):
+    """
+    Попиксельно трассированная VR сцена с прогрессивным уточнением.
+
+    render() отправляет расчет для текущего состояния камеры и сцены и
+    показывает последнее готовое изображение; poll() забирает готовые
+    уровни из фонового потока и запускает следующий (True - есть новое
+    изображение и кадр нужно перерисовать).
+    """
+
+    def __init__(self, canvas, view, make_image=None, prefix='vr'):
+        super().__init__(canvas, view, make_image, prefix)
+        self.worker = None
+        self.job_key = None         # состояние, для которого идет расчет
+        self.result = None          # (block, image) последнего готового уровня
+        self.error = None           # JobFailed последнего упавшего расчета
+        self.version = 0
+        self.layers = [Layer('pixels', [], self.pixels_key, self.draw_pixels)]
+
+    def state_key(self):
+        """Все, от чего зависит изображение: камера, сферы и глубина"""
+        return (self.spheres_key(), self.view.scene.reflection_depth)
+
+    def pixels_key(self):
+        key = self.state_key()
+        if key != self.job_key:
+            self.job_key = key
+            self.submit(0)
+        return self.version
+
+    def submit(self, level):
+        """Расчет уровня level (индекс в BLOCK_SIZES) для текущего состояния"""
+        if self.worker is None:
+            self.worker = TraceWorker(self._job)
+        spheres = SphereSet(self.sphere_objects(), self.view.scene.source)
+        payload = (spheres, self.projection(), self.view.scene.reflection_depth,
+                   BLOCK_SIZES[level])
+        self.worker.submit((self.job_key, level), payload)
+
+    @staticmethod
+    def _job(payload, cancel):
+        spheres, projection, depth, block = payload
+        with PROFILER.stage(f'pixel_trace_{block}x{block}'):
+            image = render_pixels(spheres, projection, depth, block, cancel)
+        PROFILER.count('pixel_rays', image.shape[0] * image.shape[1])
+        return block, image
+
+    def poll(self):
+        """Прием готовых уровней; True - изображение обновилось"""
+        if self.worker is None:
+            return False
+        updated = False
+        for (key, level), result in self.worker.poll():
+            if key != self.job_key:
+                continue
+            if isinstance(result, JobFailed):
+                self.error = result
+                continue
+            self.error = None
+            self.result = result
+            self.version += 1
+            updated = True
+            if level + 1 < len(BLOCK_SIZES):
+                self.submit(level + 1)
+        return updated
+
+    def block(self):
+        """Размер блока показанного изображения (None - изображения еще нет)"""
+        return self.result[0] if self.result is not None else None
+
+    def draw_pixels(self):
+        """Изображение уровня растягивается до размера холста"""
+        width, height = self.view.width, self.view.height
+        if self.result is None:
+            self.frame = np.empty((height, width, 3), dtype=np.float32)
+            self.frame[:] = BACKGROUND
+            return
+        block, image = self.result
+        frame = np.repeat(np.repeat(image, block, axis=0), block, axis=1)
+        self.frame = frame[:height, :width]
+
+    def compose(self):
+        """Кадр уже собран в draw_pixels"""
+
+    def clear(self):
+        """Снятие изображения и отмена расчета"""
+        if self.worker is not None:
+            self.worker.cancel()
+        self.job_key = None
+        super().clear()
+
+    def close(self):
+        """Остановка фонового потока"""
+        if self.worker is not None:
+            self.worker.close()
+            self.worker = None
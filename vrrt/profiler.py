@@ -0,0 +1,142 @@
+"""
+Профилировщик кадра: время этапов и счетчики горячих путей.
+
+Этапы (отрисовка слоев, трассировка, сборка кадра) замеряются
+контекстным менеджером stage(), счетчики (проверки пересечений, лучи,
+оборвавшиеся на каждом отражении, созданные и обновленные элементы
+холста) увеличиваются вызовом count(). Замеры группируются по кадрам:
+last - итоги последнего кадра для живой панели, events - лента
+событий, которую можно сохранить в формате Chrome Trace
+(chrome://tracing, Perfetto) для разбора вне приложения.
+
+По умолчанию профилировщик выключен, и stage()/count() почти ничего
+не стоят. Модуль не зависит от остального пакета; общий экземпляр -
+PROFILER.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Сколько событий хранить для выгрузки (старые отбрасываются)
+MAX_EVENTS = 100000
+
+
+class FrameStats:
+    """Итоги одного кадра: время этапов (мс) и счетчики"""
+
+    __slots__ = ('stages', 'counters', 'total_ms')
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.total_ms = 0.0
+
+
+class Profiler:
+    """Замеры этапов и счетчики с разбиением по кадрам"""
+
+    def __init__(self, enabled=False, max_events=MAX_EVENTS, clock=time.perf_counter):
+        self.enabled = enabled
+        self.clock = clock
+        self.events = deque(maxlen=max_events)
+        self.last = FrameStats()        # последний завершенный кадр
+        self.frames = 0
+        self._current = FrameStats()
+        self._frame_start = None
+        self._origin = clock()
+        self._lock = threading.Lock()
+
+    def _ts(self, t):
+        """Время от запуска профилировщика в микросекундах (для Chrome Trace)"""
+        return (t - self._origin) * 1e6
+
+    @contextmanager
+    def stage(self, name):
+        """Замер этапа (вложенные этапы попадают в ленту как вложенные интервалы)"""
+        if not self.enabled:
+            yield
+            return
+        start = self.clock()
+        try:
+            yield
+        finally:
+            end = self.clock()
+            ms = (end - start) * 1000
+            with self._lock:
+                stages = self._current.stages
+                stages[name] = stages.get(name, 0.0) + ms
+                self.events.append({'name': name, 'ph': 'X', 'ts': self._ts(start),
+                                    'dur': (end - start) * 1e6, 'pid': os.getpid(),
+                                    'tid': threading.get_ident()})
+
+    def count(self, name, n=1):
+        """Увеличение счетчика текущего кадра"""
+        if not self.enabled:
+            return
+        with self._lock:
+            counters = self._current.counters
+            counters[name] = counters.get(name, 0) + n
+
+    @contextmanager
+    def frame(self):
+        """Границы кадра: по выходу итоги переносятся в last"""
+        if not self.enabled:
+            yield
+            return
+        start = self.clock()
+        try:
+            with self.stage('frame'):
+                yield
+        finally:
+            with self._lock:
+                stats, self._current = self._current, FrameStats()
+                stats.total_ms = (self.clock() - start) * 1000
+                self.last = stats
+                self.frames += 1
+                # Счетчики кадра - отдельным событием-графиком
+                if stats.counters:
+                    self.events.append({'name': 'counters', 'ph': 'C', 'ts': self._ts(start),
+                                        'pid': os.getpid(), 'args': dict(stats.counters)})
+
+    def reset(self):
+        """Сброс ленты событий и итогов"""
+        with self._lock:
+            self.events.clear()
+            self.last = FrameStats()
+            self._current = FrameStats()
+            self.frames = 0
+
+    def summary(self, width=24):
+        """Итоги последнего кадра в виде строк для информационной панели"""
+        last = self.last
+        lines = [f'Кадр: {last.total_ms:.1f} мс']
+        for name, ms in sorted(last.stages.items(), key=lambda item: -item[1]):
+            if name != 'frame':
+                lines.append(f'  {name[:width]:<{width}} {ms:7.2f} мс')
+        for name, value in sorted(last.counters.items()):
+            lines.append(f'  {name[:width]:<{width}} {value:7d}')
+        return lines
+
+    def chrome_trace(self):
+        """Лента событий в формате Chrome Trace (JSON Object Format)"""
+        with self._lock:
+            events = list(self.events)
+        names = {tid for tid in (event.get('tid') for event in events) if tid is not None}
+        main = threading.main_thread().ident
+        for tid in names:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+                           'args': {'name': 'main' if tid == main else f'worker-{tid}'}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path):
+        """Сохранение ленты событий в JSON файл"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+
+# Общий профилировщик приложения
+PROFILER = Profiler()
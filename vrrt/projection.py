@@ -0,0 +1,117 @@
+"""
+Перспективная проекция 3D точек на экран с эффектом VR.
+
+Преобразование камеры строится один раз на состояние камеры,
+после чего целые массивы точек проецируются одним векторным вызовом.
+offset - положение области вывода на холсте (для стереопары каждый
+глаз рисуется в своей половине холста). clip_segments обрезает
+экранные отрезки прямоугольником области вывода.
+"""
+import math
+
+import numpy as np
+
+# Фокусное расстояние в пикселях и ближняя плоскость отсечения
+FOV = 500
+NEAR_PLANE = 0.1
+
+# Межзрачковое расстояние по умолчанию для стереопары (единицы сцены)
+IPD = 0.065
+
+
+class Projection:
+    """Проекция для фиксированного состояния камеры"""
+
+    def __init__(self, camera_pos, camera_angle, width, height,
+                 fov=FOV, near=NEAR_PLANE, offset=(0, 0)):
+        self.camera_pos = np.array(camera_pos, dtype=float)
+        self.camera_angle = camera_angle
+        self.width = width
+        self.height = height
+        self.fov = fov
+        self.near = near
+        self.offset = tuple(offset)
+
+        # Вращение камеры вокруг оси Y (вычисляется один раз)
+        angle_rad = math.radians(camera_angle)
+        cos_a = math.cos(angle_rad)
+        sin_a = math.sin(angle_rad)
+        self.rotation = np.array([[cos_a, 0.0, -sin_a],
+                                  [0.0, 1.0, 0.0],
+                                  [sin_a, 0.0, cos_a]])
+        self.center = np.array([width // 2 + self.offset[0],
+                                height // 2 + self.offset[1]], dtype=float)
+
+    def key(self):
+        """Состояние камеры, от которого зависит проекция"""
+        return (tuple(self.camera_pos), self.camera_angle, self.width,
+                self.height, self.fov, self.near, self.offset)
+
+    def to_camera(self, points):
+        """Перевод точек (N, 3) в систему координат камеры"""
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        return (points - self.camera_pos) @ self.rotation.T
+
+    def project(self, points):
+        """
+        Проекция массива точек (N, 3).
+
+        Возвращает (xy, dist_factor, visible): экранные координаты (N, 2),
+        коэффициент VR масштаба (N,) и маску точек перед ближней плоскостью.
+        """
+        return self.camera_to_screen(self.to_camera(points))
+
+    def camera_to_screen(self, cam):
+        """Проекция точек (N, 3), уже переведенных в систему камеры (как project)"""
+        z = cam[:, 2]
+        visible = z > self.near
+
+        scale = self.fov / np.where(visible, z, 1.0)
+        xy = np.empty((len(cam), 2))
+        xy[:, 0] = self.center[0] + cam[:, 0] * scale
+        xy[:, 1] = self.center[1] - cam[:, 1] * scale
+
+        # Эффект VR искажения
+        dist_factor = 1 + z / 10
+        return xy, dist_factor, visible
+
+    def unproject(self, x, y, z):
+        """Мировая точка под экранной точкой (x, y) на глубине z от камеры"""
+        cam = np.array([(x - self.center[0]) * z / self.fov,
+                        -(y - self.center[1]) * z / self.fov, z])
+        return cam @ self.rotation + self.camera_pos
+
+    def project_point(self, point):
+        """Проекция одной точки: (x, y, dist_factor) или None"""
+        xy, dist, visible = self.project(point)
+        if not visible[0]:
+            return None
+        return (xy[0, 0], xy[0, 1], dist[0])
+
+
+def clip_segments(p1, p2, width, height):
+    """
+    Отсечение отрезков прямоугольником [0, width) x [0, height) (Лян-Барски).
+
+    Возвращает (p1, p2, keep): обрезанные концы и маску отрезков,
+    у которых осталась видимая часть.
+    """
+    p1 = np.asarray(p1, dtype=float)
+    p2 = np.asarray(p2, dtype=float)
+    d = p2 - p1
+    t0 = np.zeros(len(p1))
+    t1 = np.ones(len(p1))
+    keep = np.ones(len(p1), dtype=bool)
+    bounds = ((0, -d[:, 0], p1[:, 0]), (0, d[:, 0], width - 1 - p1[:, 0]),
+              (1, -d[:, 1], p1[:, 1]), (1, d[:, 1], height - 1 - p1[:, 1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for _, p, q in bounds:
+            parallel = p == 0
+            keep &= ~(parallel & (q < 0))
+            r = q / np.where(parallel, 1, p)
+            entering = ~parallel & (p < 0)
+            leaving = ~parallel & (p > 0)
+            t0 = np.where(entering, np.maximum(t0, r), t0)
+            t1 = np.where(leaving, np.minimum(t1, r), t1)
+    keep &= t0 <= t1
+    return p1 + t0[:, None] * d, p1 + t1[:, None] * d, keep
@@ -0,0 +1,452 @@
+"""
+Программная растеризация VR сцены в буфер кадра NumPy.
+
+Вместо тысяч элементов холста (create_line/create_oval) отрезки лучей,
+нормали, сферы, сетка и звезды рисуются в пиксели массива (H, W, 3),
+а готовый кадр показывается одним изображением на холсте. Стоимость
+кадра зависит от числа закрашенных пикселей, а не от числа элементов Tk.
+
+Лучи и нормали смешиваются аддитивно с весом ray_intensity: в местах,
+где проходит много лучей, изображение становится ярче. Сферы
+непрозрачны и накладываются поверх сетки.
+
+Слои те же, что у VRRenderer (небо, сетка, сферы, лучи), и с теми же
+ключами; каждый слой хранит свой буфер, и при изменении одного слоя
+остальные берутся из кэша.
+
+Модуль не импортирует tkinter: изображение для показа создается
+функцией make_image, переданной извне (например, tk.PhotoImage).
+"""
+import random
+import struct
+import zlib
+
+import numpy as np
+
+from .profiler import PROFILER
+from .culling import MIN_DETAIL_PX, SPHERE_SCALE, cull_spheres
+from .projection import clip_segments
+from .render import Layer, VRRenderer
+
+# Цвет фона холста VR (#0a0a1a)
+BACKGROUND = (10 / 255, 10 / 255, 26 / 255)
+
+# Радиус круга (пиксели), начиная с которого непрозрачная середина
+# записывается срезами строк, а не по индексам пикселей
+SLICE_RADIUS = 48
+
+
+def hex_to_rgb(color):
+    """Цвет '#rrggbb' -> (r, g, b) в долях 0..1"""
+    color = color.lstrip('#')
+    return tuple(int(color[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+class Framebuffer:
+    """Буфер кадра RGB (float32, доли 0..1) с аддитивной отрисовкой"""
+
+    def __init__(self, width, height, background=None, alpha=False):
+        self.width = width
+        self.height = height
+        self.rgb = np.zeros((height, width, 3), dtype=np.float32)
+        if background is not None:
+            self.rgb[:] = background
+        # Покрытие (для слоев, накладываемых поверх других)
+        self.alpha = np.zeros((height, width), dtype=np.float32) if alpha else None
+        self.pixels = 0             # число закрашенных пикселей (статистика)
+
+    def _accumulate(self, x, y, colors):
+        """Аддитивное добавление цветов (N, 3) в пиксели (x, y)"""
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        index = y[inside] * self.width + x[inside]
+        colors = colors[inside]
+        self.pixels += len(index)
+        flat = self.rgb.reshape(-1, 3)
+        size = self.width * self.height
+        if len(index) < size // 16:
+            # Мало пикселей: поэлементное сложение дешевле прохода по всему кадру
+            np.add.at(flat, index, colors)
+            return
+        for c in range(3):
+            flat[:, c] += np.bincount(index, weights=colors[:, c], minlength=size)
+
+    def add_lines(self, p1, p2, colors, weight=1.0, width=1, dash=None):
+        """
+        Отрезки p1 -> p2 (N, 2) цветами colors (N, 3) или (3,).
+
+        Отрезок проходится с шагом в один пиксель по большей оси;
+        width > 1 утолщает линию сдвигом по меньшей оси,
+        dash = (штрих, пробел) в пикселях дает пунктир.
+        """
+        p1, p2, keep = clip_segments(p1, p2, self.width, self.height)
+        colors = np.broadcast_to(np.asarray(colors, dtype=np.float32), (len(keep), 3))
+        p1, p2, colors = p1[keep], p2[keep], colors[keep]
+        if not len(p1):
+            return
+
+        d = p2 - p1
+        steps = np.ceil(np.abs(d).max(axis=1)).astype(np.int64) + 1
+        seg = np.repeat(np.arange(len(p1)), steps)
+        offsets = np.cumsum(steps) - steps
+        k = np.arange(steps.sum()) - offsets[seg]
+        t = k / np.maximum(steps[seg] - 1, 1)
+        x = p1[seg, 0] + d[seg, 0] * t
+        y = p1[seg, 1] + d[seg, 1] * t
+
+        if dash:
+            on, off = dash
+            length = np.hypot(d[:, 0], d[:, 1])
+            visible = (t * length[seg]) % (on + off) < on
+            x, y, seg = x[visible], y[visible], seg[visible]
+
+        samples = colors[seg] * weight
+        steep = np.abs(d[seg, 1]) > np.abs(d[seg, 0])
+        for shift in range(-(width // 2), width - width // 2):
+            xi = np.rint(x + np.where(steep, shift, 0)).astype(np.int64)
+            yi = np.rint(y + np.where(steep, 0, shift)).astype(np.int64)
+            self._accumulate(xi, yi, samples)
+
+    def add_points(self, xy, sizes, colors):
+        """Квадратные точки (звезды) со стороной 2*size + 1"""
+        xy = np.rint(np.asarray(xy, dtype=float)).astype(np.int64)
+        colors = np.asarray(colors, dtype=np.float32)
+        xs, ys, cs = [], [], []
+        for size in np.unique(sizes):
+            mask = sizes == size
+            for dx in range(-size, size + 1):
+                for dy in range(-size, size + 1):
+                    xs.append(xy[mask, 0] + dx)
+                    ys.append(xy[mask, 1] + dy)
+                    cs.append(colors[mask])
+        self._accumulate(np.concatenate(xs), np.concatenate(ys), np.concatenate(cs))
+
+    def over_disc(self, x, y, radius, shade, opaque=0.0):
+        """
+        Круг поверх содержимого (смешивание "over").
+
+        shade(nx, ny) -> (rgb (N, 3), alpha (N,)) получает координаты
+        пикселей круга, нормированные на радиус. Пиксели берутся по
+        строкам в пределах radius + 1 от центра (запас на сглаженный
+        край), углы описанного квадрата не обрабатываются. Внутри
+        opaque (в долях радиуса) shade обязан давать alpha == 1: эти
+        пиксели просто заменяются, смешивается только кайма. В буфере
+        цвет хранится умноженным на покрытие.
+        """
+        if radius <= 0:
+            return
+        reach = radius + 1
+        y0 = max(int(np.floor(y - reach)), 0)
+        y1 = min(int(np.ceil(y + reach)) + 1, self.height)
+        if y0 >= y1:
+            return
+        rows = np.arange(y0, y1)
+        dy2 = (rows - y) ** 2
+        half = np.sqrt(np.maximum(reach * reach - dy2, 0))
+        x0 = np.maximum(np.floor(x - half).astype(np.int64), 0)
+        x1 = np.minimum(np.ceil(x + half).astype(np.int64) + 1, self.width)
+        x1 = np.maximum(x1, x0)
+        # Непрозрачная середина строки [c0, c1) внутри [x0, x1)
+        inner = max(opaque, 0.0) * radius
+        half = np.sqrt(np.maximum(inner * inner - dy2, 0))
+        core = inner * inner > dy2
+        c0 = np.where(core, np.ceil(x - half).astype(np.int64), x1).clip(x0, x1)
+        c1 = np.where(core, np.floor(x + half).astype(np.int64) + 1, x1).clip(c0, x1)
+
+        row_c, col_c = _span_pixels(rows, c0, c1)
+        row_e, col_e = _span_pixels(np.concatenate([rows, rows]),
+                                    np.concatenate([x0, c1]), np.concatenate([c0, x1]))
+        n_core = len(col_c)
+        row = np.concatenate([row_c, row_e])
+        col = np.concatenate([col_c, col_e])
+        if not len(col):
+            return
+        scale = np.float32(1 / radius)
+        nx = (col.astype(np.float32) - np.float32(x)) * scale
+        ny = (row.astype(np.float32) - np.float32(y)) * scale
+        rgb, alpha = shade(nx, ny)
+
+        index = row * self.width + col
+        core, edge = index[:n_core], index[n_core:]
+        alpha, keep = alpha[n_core:], 1 - alpha[n_core:]
+        flat = self.rgb.reshape(-1, 3)
+        if radius >= SLICE_RADIUS:
+            # Длинные строки: срезы строк дешевле поэлементной записи
+            start = 0
+            for r, a, b in zip(rows.tolist(), c0.tolist(), c1.tolist()):
+                self.rgb[r, a:b] = rgb[start:start + b - a]
+                start += b - a
+        else:
+            flat[core] = rgb[:n_core]
+        flat[edge] = flat[edge] * keep[:, None] + rgb[n_core:] * alpha[:, None]
+        if self.alpha is not None:
+            coverage = self.alpha.reshape(-1)
+            coverage[core] = 1
+            coverage[edge] = coverage[edge] * keep + alpha
+        self.pixels += len(index)
+
+    def to_ppm(self):
+        """Кадр в формате PPM (P6) для tk.PhotoImage(data=...)"""
+        return encode_ppm(self.rgb)
+
+
+def _span_pixels(rows, x0, x1):
+    """Пиксели (row, col) отрезков строк [x0, x1)"""
+    counts = x1 - x0
+    row = np.repeat(rows, counts)
+    col = np.arange(len(row)) + np.repeat(x0 - (np.cumsum(counts) - counts), counts)
+    return row, col
+
+
+def to_bytes(rgb):
+    """RGB (H, W, 3) в долях 0..1 -> uint8"""
+    return (np.clip(rgb, 0, 1) * 255 + 0.5).astype(np.uint8)
+
+
+def encode_ppm(rgb):
+    """Изображение в формате PPM (P6)"""
+    height, width = rgb.shape[:2]
+    return f'P6 {width} {height} 255 '.encode('ascii') + to_bytes(rgb).tobytes()
+
+
+def encode_png(rgb, level=6):
+    """Изображение в формате PNG (RGB, 8 бит, без фильтров строк)"""
+    height, width = rgb.shape[:2]
+    rows = np.empty((height, 1 + 3 * width), dtype=np.uint8)
+    rows[:, 0] = 0
+    rows[:, 1:] = to_bytes(rgb).reshape(height, -1)
+
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(rows.tobytes(), level)) + chunk(b'IEND', b''))
+
+
+def save_image(path, rgb):
+    """Запись изображения в .png или .ppm (по расширению)"""
+    data = encode_png(rgb) if path.lower().endswith('.png') else encode_ppm(rgb)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+class RasterRenderer(VRRenderer):
+    """
+    Отрисовка VR сцены в буфер кадра NumPy с показом одним изображением.
+
+    Ключи слоев и проекция - как у VRRenderer; вместо пулов элементов
+    каждый слой рисует в свой буфер. Буфер имеет размер области вывода,
+    поэтому слои рисуются без сдвига, а origin задает место изображения.
+    """
+
+    def __init__(self, canvas, view, make_image=None, prefix='vr', origin=(0, 0)):
+        super().__init__(canvas, view, prefix)
+        self.origin = tuple(origin)
+        self.make_image = make_image
+        self.image = None
+        self.image_size = None
+        self.image_item = None
+        self.frame = None
+        self.buffers = {}
+        self._under = None          # небо, сетка и сферы без лучей
+        self._under_builds = None
+        self.layers = [
+            Layer('sky', [], self.sky_key, self.draw_starry_sky),
+            Layer('grid', [], self.grid_key, self.draw_vr_grid),
+            Layer('spheres', [], self.spheres_key, self.draw_spheres),
+            Layer('rays', [], self.rays_key, self.draw_3d_rays),
+        ]
+
+    def _buffer(self, name, background=None, alpha=False):
+        fb = Framebuffer(self.view.width, self.view.height, background, alpha)
+        self.buffers[name] = fb
+        return fb
+
+    def render(self):
+        """Отрисовка кадра: перестраиваются только слои с изменившимся ключом"""
+        rebuilt = []
+        for layer in self.layers:
+            key = layer.key()
+            if key == layer.built_key:
+                continue
+            with PROFILER.stage(layer.draw.__name__):
+                layer.draw()
+            layer.built_key = key
+            layer.builds += 1
+            rebuilt.append(layer.name)
+            buffer = self.buffers.get(layer.name)
+            if buffer is not None:
+                PROFILER.count('raster_pixels', buffer.pixels)
+
+        if rebuilt:
+            with PROFILER.stage('compose'):
+                self.compose()
+            with PROFILER.stage('present'):
+                self.present()
+        return rebuilt
+
+    def compose(self):
+        """
+        Сборка кадра: фон + небо + сетка, сферы поверх, лучи - аддитивно.
+
+        Подложка (все, кроме лучей) хранится между кадрами и собирается
+        заново только после перестройки одного из ее слоев.
+        """
+        builds = tuple(layer.builds for layer in self.layers if layer.name != 'rays')
+        if builds != self._under_builds:
+            under = self.buffers['sky'].rgb + self.buffers['grid'].rgb
+            spheres = self.buffers['spheres']
+            under *= 1 - spheres.alpha[..., None]
+            under += spheres.rgb
+            self._under, self._under_builds = under, builds
+        self.frame = self._under + self.buffers['rays'].rgb
+
+    def present(self):
+        """Показ кадра одним элементом холста"""
+        if self.make_image is None:
+            return
+        height, width = self.frame.shape[:2]
+        if self.image is None or self.image_size != (width, height):
+            self.image = self.make_image(width, height)
+            self.image_size = (width, height)
+        self.image.configure(data=encode_ppm(self.frame), format='PPM')
+        if self.image_item is None:
+            self.image_item = self.canvas.create_image(*self.origin, image=self.image,
+                                                       anchor='nw', tags=(f'{self.prefix}_raster',))
+        else:
+            self.canvas.itemconfig(self.image_item, image=self.image)
+
+    def clear(self):
+        """Удаление изображения с холста (при смене способа отрисовки)"""
+        if self.image_item is not None:
+            self.canvas.delete(self.image_item)
+            self.image_item = None
+        self.invalidate()
+
+    # --- Слои ---
+
+    def draw_starry_sky(self):
+        """Звездное небо (те же звезды, что у VRRenderer)"""
+        fb = self._buffer('sky', BACKGROUND)
+        rng = random.Random(42)  # Для постоянства звезд
+        xy, sizes, colors = [], [], []
+        for _ in range(100):
+            x = rng.randint(0, self.view.width)
+            y = rng.randint(0, self.view.height)
+            brightness = rng.randint(100, 255)
+            size = rng.randint(1, 2)
+            xy.append((x, y))
+            sizes.append(size)
+            colors.append((brightness / 255,) * 3)
+        fb.add_points(xy, np.array(sizes), colors)
+
+    def draw_vr_grid(self):
+        """3D сетка пола"""
+        fb = self._buffer('grid')
+        if not self.view.show_grid:
+            return
+        starts, ends = self.floor_grid.lines(self.view.camera_pos)
+        p1, p2, dist, shown = self.project_segments(starts, ends, 'culled_grid')
+        green = np.clip((100 * dist[shown]).astype(int), 0, 255) / 255
+        colors = np.zeros((len(green), 3))
+        colors[:, 1] = green
+        fb.add_lines(p1[shown], p2[shown], colors)
+
+    def draw_spheres(self):
+        """Сферы с освещением (ближние рисуются поверх дальних)"""
+        fb = self._buffer('spheres', alpha=True)
+        objects = self.sphere_objects()
+        extents = [radius * (3 if emissive else 1) for _, radius, _, _, emissive in objects]
+        xy, dist, visible = cull_spheres(self.projection(), [obj[0] for obj in objects],
+                                         extents, self.view.width, self.view.height)
+        # Дальние сферы рисуем первыми
+        for k in sorted(np.flatnonzero(visible), key=lambda k: -dist[k]):
+            _, radius, color, reflectivity, emissive = objects[k]
+            screen_radius = radius * SPHERE_SCALE / dist[k]
+            rgb = np.array(hex_to_rgb(color), dtype=np.float32)
+            if emissive:
+                self._glow(fb, xy[k], screen_radius, rgb,
+                           halo=screen_radius >= MIN_DETAIL_PX)
+            else:
+                self._mirror(fb, xy[k], screen_radius, rgb, reflectivity)
+
+    @staticmethod
+    def _mirror(fb, center, radius, rgb, reflectivity):
+        """Зеркальная сфера: освещение слева сверху, блик и белый контур"""
+        # Операции на месте во float32: пикселей у близкой сферы - сотни тысяч
+        def shade(nx, ny):
+            r2 = nx * nx + ny * ny
+            d = np.sqrt(r2)
+            # Расстояние до края в пикселях
+            edge = 1 - d
+            edge *= np.float32(radius)
+            # Сглаженный край круга (1 пиксель)
+            alpha = np.clip(edge + 0.5, 0, 1)
+            nz = np.sqrt(np.clip(1 - r2, 0, 1, out=r2), out=r2)
+            light = nz - nx
+            light -= ny
+            light *= np.float32(1 / np.sqrt(3))
+            np.clip(light, 0, 1, out=light)
+            # light ** 24 умножениями: степень с показателем заметно дороже
+            light8 = light * light
+            light8 *= light8
+            light8 *= light8
+            spec = light8 * light8
+            spec *= light8
+            spec *= np.float32(reflectivity)
+            # Контур шириной 2 пикселя: color * (1 - ring) + ring
+            ring = np.abs(edge - 1, out=edge)
+            np.clip(1 - ring, 0, 1, out=ring)
+            keep = 1 - ring
+            light *= np.float32(0.65)
+            light += np.float32(0.35)
+            light *= keep
+            spec *= keep
+            spec += ring
+            color = light[:, None] * rgb
+            color += spec[:, None]
+            return color, alpha
+
+        fb.over_disc(center[0], center[1], radius, shade, opaque=1 - 1 / radius)
+
+    @staticmethod
+    def _glow(fb, center, radius, rgb, halo=True):
+        """Светящийся объект: ядро и полупрозрачный ореол до трех радиусов"""
+        extent = 3 if halo else 1
+
+        def shade(nx, ny):
+            d = np.sqrt(nx * nx + ny * ny) * extent     # в радиусах ядра
+            alpha = np.clip((1 - d) * radius + 0.5, 0, 1)
+            if halo:
+                alpha = np.maximum(alpha, 0.5 * np.clip(1 - (d - 1) / 2, 0, 1))
+            return np.broadcast_to(rgb, alpha.shape + (3,)), alpha
+
+        fb.over_disc(center[0], center[1], radius * extent, shade,
+                     opaque=(1 - 1 / radius) / extent)
+
+    def draw_3d_rays(self):
+        """Лучи (аддитивно с весом ray_intensity) и нормали"""
+        fb = self._buffer('rays')
+        segments = self.view.ray_segments()
+        n = len(segments)
+        if n == 0:
+            return
+        start_xy, end_xy, _, shown = self.project_segments(
+            segments.starts, segments.ends, 'culled_rays')
+
+        max_depth = max(self.view.scene.reflection_depth, int(segments.depth.max()))
+        palette = np.array([hex_to_rgb(c) for _, c in sorted(self.depth_colors(max_depth).items())],
+                           dtype=np.float32)
+        weight = self.view.scene.ray_intensity
+        depth = segments.depth
+        # Ширина и штрих - как у элементов холста: 3-depth пикселя, пунктир после отражений
+        for d in np.unique(depth[shown]):
+            mask = shown & (depth == d)
+            fb.add_lines(start_xy[mask], end_xy[mask], palette[d], weight,
+                         width=max(1, 3 - int(d)), dash=(5, 3) if d > 0 else None)
+
+        if self.view.show_normals:
+            p1, p2, _, mask = self.project_segments(
+                segments.ends, segments.ends + segments.normals, 'culled_normals')
+            fb.add_lines(p1[mask], p2[mask], (1.0, 1.0, 1.0), weight, dash=(2, 2))
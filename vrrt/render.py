@@ -0,0 +1,329 @@
+"""
+Послойная отрисовка VR сцены на холст.
+
+Кадр состоит из слоев (небо, сетка, сферы, лучи). У каждого слоя есть
+ключ - состояние, от которого зависит его содержимое. Слой
+перестраивается только когда ключ изменился: небо - при смене размера
+холста, сетка - при движении камеры или переключении show_grid, лучи -
+при изменении путей, камеры или параметров лучей.
+
+Пути лучей рендерер получает от view.ray_segments(). VRView трассирует
+синхронно через кэш, а окно приложения возвращает последний готовый
+результат фоновой трассировки, поэтому слой лучей привязан к самому
+объекту путей, а не к состоянию сцены.
+
+Перед созданием элементов невидимые отрезки и сферы отбрасываются,
+а частично видимые линии обрезаются (vrrt.culling).
+
+Модуль не импортирует tkinter: холст передается извне, поэтому
+отрисовку можно выполнять и с заглушкой холста (например, в бенчмарках).
+"""
+import random
+
+import numpy as np
+
+from .cache import PathCache
+from .canvas_pool import RetainedCanvas
+from .culling import MIN_DETAIL_PX, SPHERE_SCALE, cull_spheres, project_segments
+from .grid import FloorGrid
+from .profiler import PROFILER
+from .projection import IPD, Projection
+from .scene import Scene
+
+# Пулы элементов VR холста в порядке отрисовки (снизу вверх)
+VR_POOLS = [('stars', 'oval'), ('grid', 'line'), ('spheres', 'oval'),
+            ('rays', 'line'), ('normals', 'line')]
+
+
+class VRView:
+    """
+    Состояние просмотра VR сцены для VRRenderer.
+
+    Интерфейс VRRayTracing3D совпадает с этим классом, поэтому
+    рендерер одинаково работает и с окном приложения, и без него.
+    """
+
+    def __init__(self, scene=None, width=1000, height=700):
+        self.scene = scene if scene is not None else Scene()
+        self.path_cache = PathCache()
+        self.width = width
+        self.height = height
+        self.camera_pos = [5, 3, 10]
+        self.camera_angle = 0
+        self.ipd = IPD
+        self.show_normals = True
+        self.show_grid = True
+
+    def ray_segments(self):
+        """Пути лучей для кадра (синхронная трассировка через кэш)"""
+        return self.path_cache.get(self.scene)
+
+
+class Layer:
+    """Слой кадра, перестраиваемый только при смене ключа"""
+
+    def __init__(self, name, pools, key, draw):
+        self.name = name
+        self.pools = pools      # имена пулов холста, принадлежащих слою
+        self.key = key          # функция, возвращающая ключ состояния слоя
+        self.draw = draw        # функция, описывающая содержимое слоя
+        self.built_key = None
+        self.builds = 0
+
+    def invalidate(self):
+        """Принудительная перестройка слоя на следующем кадре"""
+        self.built_key = None
+
+
+class VRRenderer:
+    """
+    Отрисовка VR сцены на холст с кэшированием слоев.
+
+    origin - левый верхний угол области вывода на холсте (по умолчанию
+    весь холст; у глаз стереопары - своя половина).
+    """
+
+    def __init__(self, canvas, view, prefix='vr', origin=(0, 0)):
+        self.canvas = canvas
+        self.view = view
+        self.prefix = prefix
+        self.offset = tuple(origin)     # сдвиг экранных координат слоев
+        self.items = RetainedCanvas(canvas, VR_POOLS, prefix=prefix)
+        self.floor_grid = FloorGrid(grid_size=10, spacing=1.0)
+        self._projection = None
+
+        self.layers = [
+            Layer('sky', ['stars'], self.sky_key, self.draw_starry_sky),
+            Layer('grid', ['grid'], self.grid_key, self.draw_vr_grid),
+            Layer('spheres', ['spheres'], self.spheres_key, self.draw_spheres),
+            Layer('rays', ['rays', 'normals'], self.rays_key, self.draw_3d_rays),
+        ]
+
+    def layer(self, name):
+        """Слой по имени"""
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+        raise KeyError(name)
+
+    def invalidate(self, *names):
+        """Сброс кэша указанных слоев (по умолчанию - всех)"""
+        for layer in self.layers:
+            if not names or layer.name in names:
+                layer.invalidate()
+
+    def clear(self):
+        """Удаление всех элементов с холста (при смене способа отрисовки)"""
+        self.items.clear()
+        self.invalidate()
+
+    def projection(self):
+        """Проекция для текущего состояния камеры (строится один раз на состояние)"""
+        view = self.view
+        key = (tuple(view.camera_pos), view.camera_angle, view.width, view.height)
+        projection = self._projection
+        if projection is None or projection.key()[:4] != key or projection.offset != self.offset:
+            self._projection = Projection(view.camera_pos, view.camera_angle,
+                                          view.width, view.height, offset=self.offset)
+        return self._projection
+
+    def render(self):
+        """Отрисовка кадра: перестраиваются только слои с изменившимся ключом"""
+        rebuilt = []
+        for layer in self.layers:
+            key = layer.key()
+            if key == layer.built_key:
+                continue
+            self.items.begin_frame(layer.pools)
+            with PROFILER.stage(layer.draw.__name__):
+                layer.draw()
+            layer.built_key = key
+            layer.builds += 1
+            rebuilt.append(layer)
+
+        if rebuilt:
+            self.items.end_frame([pool for layer in rebuilt for pool in layer.pools])
+        return [layer.name for layer in rebuilt]
+
+    def project_segments(self, starts, ends, counter='culled_segments'):
+        """
+        Проекция 3D отрезков с отсечением ближней плоскостью и областью вывода.
+
+        Холст не обрезает элементы сам, поэтому у стереопары линии одного
+        глаза иначе заходили бы на половину другого.
+        """
+        return project_segments(self.projection(), starts, ends,
+                                self.view.width, self.view.height, counter)
+
+    # --- Ключи слоев ---
+
+    def sky_key(self):
+        return (self.view.width, self.view.height, self.offset)
+
+    def grid_key(self):
+        return (self.projection().key(), bool(self.view.show_grid))
+
+    def spheres_key(self):
+        return (self.projection().key(), tuple(
+            (tuple(pos), radius, color, reflectivity, emissive)
+            for pos, radius, color, reflectivity, emissive in self.sphere_objects()))
+
+    def rays_key(self):
+        view = self.view
+        scene = view.scene
+        # Объект путей сравнивается по идентичности и удерживается ключом
+        return (self.projection().key(), view.ray_segments(), scene.reflection_depth,
+                scene.ray_intensity, bool(view.show_normals))
+
+    # --- Слои ---
+
+    def draw_starry_sky(self):
+        """Рисуем звездное небо для VR эффекта"""
+        rng = random.Random(42)  # Для постоянства звезд
+        stars = self.items['stars']
+        ox, oy = self.offset
+
+        for _ in range(100):
+            x = ox + rng.randint(0, self.view.width)
+            y = oy + rng.randint(0, self.view.height)
+            brightness = rng.randint(100, 255)
+            size = rng.randint(1, 2)
+            color = f'#{brightness:02x}{brightness:02x}{brightness:02x}'
+            stars.add((x-size, y-size, x+size, y+size), fill=color, outline='')
+
+    def draw_vr_grid(self):
+        """Рисуем 3D сетку пола"""
+        if not self.view.show_grid:
+            return
+        # Вдали от камеры - сетка с более крупным шагом
+        starts, ends = self.floor_grid.lines(self.view.camera_pos)
+
+        # Проецируем и отсекаем все линии одним вызовом
+        p1, p2, dist, shown = self.project_segments(starts, ends, 'culled_grid')
+        alpha = np.clip((100 * dist).astype(int), 0, 255)
+
+        grid = self.items['grid']
+        for k in np.flatnonzero(shown):
+            color = f'#00{alpha[k]:02x}00'
+            grid.add((p1[k, 0], p1[k, 1], p2[k, 0], p2[k, 1]), fill=color, width=1)
+
+    def sphere_objects(self):
+        """Все сферы сцены: (pos, radius, color, reflectivity, emissive)"""
+        scene = self.view.scene
+        objects = [(mirror['pos'], mirror['radius'], mirror['color'],
+                    mirror['reflectivity'], False) for mirror in scene.mirrors]
+        objects.append((scene.source, 0.3, '#ff4444', 1.0, True))
+        objects.append((scene.target, 0.3, '#ffff44', 1.0, True))
+        return objects
+
+    def draw_spheres(self):
+        """Рисуем все сферы сцены, проецируя их центры одним вызовом"""
+        objects = self.sphere_objects()
+        # Сферы целиком вне области вывода не рисуем (ореол - до трех радиусов)
+        extents = [radius * (3 if emissive else 1) for _, radius, _, _, emissive in objects]
+        xy, dist, visible = cull_spheres(self.projection(), [obj[0] for obj in objects],
+                                         extents, self.view.width, self.view.height)
+        for k in np.flatnonzero(visible):
+            _, radius, color, reflectivity, emissive = objects[k]
+            self.draw_sphere(xy[k, 0], xy[k, 1], dist[k], radius, color,
+                             reflectivity, emissive)
+
+    def draw_sphere(self, x, y, dist, radius, color, reflectivity, emissive=False):
+        """Рисуем 3D сферу с эффектом освещения (x, y, dist - результат проекции)"""
+        # Размер сферы зависит от расстояния
+        screen_radius = radius * SPHERE_SCALE / dist
+
+        # У всех овалов пула одинаковый набор опций, чтобы при
+        # переиспользовании элемента не оставалось чужих настроек
+        ovals = self.items['spheres']
+
+        if emissive:
+            # Светящийся объект (источник/приемник); ореол - только если
+            # его кольца шире MIN_DETAIL_PX
+            halos = 3 if screen_radius >= MIN_DETAIL_PX else 1
+            for i in range(halos, 0, -1):
+                ovals.add((x - screen_radius*i, y - screen_radius*i,
+                           x + screen_radius*i, y + screen_radius*i),
+                          outline='', fill=color, width=0,
+                          stipple='gray50' if i > 1 else '', dash=())
+        else:
+            # Зеркало с градиентом
+            ovals.add((x - screen_radius, y - screen_radius,
+                       x + screen_radius, y + screen_radius),
+                      outline='white', fill=color, width=2, stipple='', dash=())
+
+            # Блик и кольцо отражения (радиус блика и зазор кольца - 0.2
+            # радиуса) на маленьких сферах неразличимы
+            if screen_radius * 0.2 < MIN_DETAIL_PX:
+                return
+
+            # Блик
+            highlight_x = x - screen_radius * 0.3
+            highlight_y = y - screen_radius * 0.3
+            highlight_r = screen_radius * 0.2
+            ovals.add((highlight_x - highlight_r, highlight_y - highlight_r,
+                       highlight_x + highlight_r, highlight_y + highlight_r),
+                      fill='white', outline='', width=1, stipple='gray50', dash=())
+
+            # Отражение (эффект зеркала)
+            if reflectivity > 0.7:
+                ovals.add((x - screen_radius*0.8, y - screen_radius*0.8,
+                           x + screen_radius*0.8, y + screen_radius*0.8),
+                          fill='', outline='cyan', width=1, stipple='', dash=(2, 2))
+
+    def draw_3d_rays(self):
+        """Рисуем лучи в 3D пространстве"""
+        # Трассировка выполняется только при изменении сцены
+        self.draw_ray_segments(self.view.ray_segments())
+
+    def depth_colors(self, max_depth=None):
+        """Цвета лучей по номеру отражения"""
+        scene = self.view.scene
+        if max_depth is None:
+            max_depth = scene.reflection_depth
+        colors_by_depth = {}
+        for depth in range(max_depth + 1):
+            intensity = scene.ray_intensity * (1 - depth * 0.3)
+            color_val = max(0, min(255, int(255 * intensity)))
+            colors = [(255, color_val, 0), (0, 255, color_val),
+                      (color_val, 0, 255), (255, 0, color_val)]
+            r, g, b = colors[depth % 4]
+            colors_by_depth[depth] = f'#{r:02x}{g:02x}{b:02x}'
+        return colors_by_depth
+
+    def draw_ray_segments(self, segments):
+        """Рисуем отрезки лучей и нормали в точках отражения"""
+        n = len(segments)
+        if n == 0:
+            return
+
+        # Лучи и нормали проецируются и отсекаются целыми массивами
+        show_normals = self.view.show_normals
+        start_xy, end_xy, _, ray_shown = self.project_segments(
+            segments.starts, segments.ends, 'culled_rays')
+        if show_normals:
+            normal_start, normal_xy, _, normal_shown = self.project_segments(
+                segments.ends, segments.ends + segments.normals, 'culled_normals')
+        else:
+            normal_shown = np.zeros(n, dtype=bool)
+
+        # Показанные пути могут быть трассированы с прежней глубиной
+        depth_colors = self.depth_colors(max(self.view.scene.reflection_depth,
+                                             int(segments.depth.max())))
+        rays = self.items['rays']
+        normals = self.items['normals']
+        # Обходим только отрезки, от которых что-то видно в области вывода
+        for k in np.flatnonzero(ray_shown | normal_shown):
+            depth = int(segments.depth[k])
+
+            # Рисуем луч до точки пересечения
+            if ray_shown[k]:
+                rays.add((start_xy[k, 0], start_xy[k, 1], end_xy[k, 0], end_xy[k, 1]),
+                         fill=depth_colors[depth], width=max(1, 3-depth),
+                         dash=(5, 3) if depth > 0 else ())
+
+            # Нормаль в точке пересечения
+            if normal_shown[k]:
+                normals.add((normal_start[k, 0], normal_start[k, 1],
+                             normal_xy[k, 0], normal_xy[k, 1]),
+                            fill='white', width=1, dash=(2, 2))
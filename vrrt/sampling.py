@@ -0,0 +1,129 @@
+"""
+Выборка направлений лучей в конусе излучения источника.
+
+Направление задается точкой (u, v) единичного квадрата:
+theta = 2*pi*u (азимут), phi = -pi/4 + pi/2*v (угол над горизонтом),
+то есть конус 90 градусов, как в исходном draw_3d_rays.
+
+Методы выборки:
+    random     - независимые равномерные точки (по генератору rng)
+    stratified - по одной случайной точке в каждой клетке сетки
+    halton     - последовательность Холтона (основания 2 и 3)
+    sobol      - последовательность Соболя (первые два измерения)
+
+Последовательности Холтона и Соболя детерминированы и продолжаемы:
+точки [start, start + count) дополняют уже выпущенные, поэтому при
+прогрессивном накоплении новые лучи заполняют пробелы между старыми.
+"""
+import math
+
+import numpy as np
+
+SAMPLERS = ('random', 'stratified', 'halton', 'sobol')
+
+# Направляющие числа Соболя для второго измерения (многочлен x + 1)
+_SOBOL_BITS = 32
+_SOBOL_V1 = np.array([1 << (31 - k) for k in range(_SOBOL_BITS)], dtype=np.uint64)
+_SOBOL_V2 = np.empty(_SOBOL_BITS, dtype=np.uint64)
+_m = 1
+for _k in range(_SOBOL_BITS):
+    _SOBOL_V2[_k] = _m << (31 - _k)
+    _m = (2 * _m) ^ _m
+del _m, _k
+
+
+def cone_directions(uv):
+    """Единичные направления (N, 3) для точек квадрата uv (N, 2)"""
+    theta = 2 * math.pi * uv[:, 0]
+    phi = -math.pi / 4 + math.pi / 2 * uv[:, 1]
+
+    dirs = np.empty((len(uv), 3))
+    dirs[:, 0] = np.cos(phi) * np.cos(theta)
+    dirs[:, 1] = np.sin(phi)
+    dirs[:, 2] = np.cos(phi) * np.sin(theta)
+    return dirs
+
+
+def random_points(count, rng):
+    """Независимые равномерные точки квадрата"""
+    # Порядок чисел генератора тот же, что в sample_cone_directions
+    u = rng.random(count)
+    v = rng.random(count)
+    return np.stack([u, v], axis=1)
+
+
+def stratified_points(count, rng):
+    """
+    Точки с расслоением: по одной в каждой клетке сетки rows x cols.
+
+    Если count не раскладывается в сетку, остаток берется равномерно.
+    """
+    rows = max(1, int(math.sqrt(count)))
+    cols = count // rows
+    cells = rows * cols
+    jitter = rng.random((count, 2))
+    points = np.empty((count, 2))
+    i = np.arange(cells)
+    points[:cells, 0] = (i % cols + jitter[:cells, 0]) / cols
+    points[:cells, 1] = (i // cols + jitter[:cells, 1]) / rows
+    points[cells:] = jitter[cells:]
+    return points
+
+
+def radical_inverse(indices, base):
+    """Обращение цифр индексов в системе счисления base (ван дер Корпут)"""
+    indices = np.array(indices, dtype=np.int64)
+    result = np.zeros(len(indices))
+    scale = 1.0 / base
+    while indices.any():
+        indices, digit = np.divmod(indices, base)
+        result += digit * scale
+        scale /= base
+    return result
+
+
+def halton_points(start, count):
+    """Точки [start, start + count) последовательности Холтона"""
+    # Нулевая точка (0, 0) пропускается
+    indices = np.arange(start + 1, start + count + 1)
+    return np.stack([radical_inverse(indices, 2), radical_inverse(indices, 3)], axis=1)
+
+
+def sobol_points(start, count):
+    """Точки [start, start + count) двумерной последовательности Соболя"""
+    indices = np.arange(start + 1, start + count + 1, dtype=np.uint64)
+    x = np.zeros(count, dtype=np.uint64)
+    y = np.zeros(count, dtype=np.uint64)
+    for k in range(_SOBOL_BITS):
+        # Старших единичных битов не осталось ни у одного индекса
+        if not (indices >> np.uint64(k)).any():
+            break
+        bit = ((indices >> np.uint64(k)) & np.uint64(1)).astype(bool)
+        x[bit] ^= _SOBOL_V1[k]
+        y[bit] ^= _SOBOL_V2[k]
+    return np.stack([x, y], axis=1) / float(1 << _SOBOL_BITS)
+
+
+def sample_points(method, count, start=0, rng=None):
+    """
+    Точки квадрата выбранным методом.
+
+    random и stratified используют rng (для продолжения выборки нужен
+    другой генератор), halton и sobol - номер первой точки start.
+    """
+    if method in ('random', 'stratified'):
+        if rng is None:
+            rng = np.random.default_rng()
+        if method == 'random':
+            return random_points(count, rng)
+        return stratified_points(count, rng)
+    if method == 'halton':
+        return halton_points(start, count)
+    if method == 'sobol':
+        return sobol_points(start, count)
+    raise ValueError(f"неизвестный метод выборки: {method}")
+
+
+def sample_directions(method, count, start=0, rng=None):
+    """Направления лучей (count, 3) в конусе излучения"""
+    return cone_directions(sample_points(method, count, start, rng))
@@ -0,0 +1,161 @@
+"""
+Модель 3D сцены: зеркала, источник, приемник и параметры лучей.
+
+Не зависит от Tkinter, поэтому используется и в интерфейсе,
+и в пакетном режиме. Сцена сохраняется и загружается в JSON.
+
+Зеркала хранятся в SphereStore (структура массивов); список словарей,
+переданный в конструктор, преобразуется в хранилище.
+"""
+import json
+
+import numpy as np
+
+from .accel import ACCEL_MIN_SPHERES, SphereBVH
+from .store import SphereStore
+
+DEFAULT_MIRRORS = [
+    {'pos': [-2, 0, 0], 'radius': 1.2, 'color': '#4169E1', 'reflectivity': 0.9},
+    {'pos': [2, 1, -1], 'radius': 1.0, 'color': '#32CD32', 'reflectivity': 0.8},
+    {'pos': [0, -1, 2], 'radius': 0.9, 'color': '#9370DB', 'reflectivity': 0.85},
+    {'pos': [-1, 1.5, -2], 'radius': 0.8, 'color': '#FF6346', 'reflectivity': 0.7},
+    {'pos': [1.5, -0.5, 1], 'radius': 0.7, 'color': '#FFD700', 'reflectivity': 0.95}
+]
+
+
+class Scene:
+    """Описание 3D сцены без привязки к интерфейсу"""
+
+    def __init__(self, mirrors=None, source=None, target=None,
+                 num_rays=36, reflection_depth=3, ray_intensity=0.8, sampler='random',
+                 dtype=np.float64):
+        if mirrors is None:
+            mirrors = DEFAULT_MIRRORS
+        if not isinstance(mirrors, SphereStore):
+            mirrors = SphereStore.from_dicts(mirrors, dtype=dtype)
+        self.mirrors = mirrors
+        self.source = list(source) if source is not None else [-3, 1, 2]
+        self.target = list(target) if target is not None else [3, -1, -2]
+        self.num_rays = num_rays
+        self.reflection_depth = reflection_depth
+        self.ray_intensity = ray_intensity
+        self.sampler = sampler      # метод выборки направлений (vrrt.sampling)
+        self._accel = None
+        self._accel_state = None
+
+    @property
+    def dtype(self):
+        """Тип чисел хранилища зеркал (float32 - компактный режим)"""
+        return self.mirrors.dtype
+
+    def mirror_arrays(self):
+        """Центры (M, 3) и радиусы (M,) зеркал - массивы хранилища без копирования"""
+        return self.mirrors.centers, self.mirrors.radii
+
+    def accelerator(self):
+        """
+        BVH над зеркалами для больших сцен (None для маленьких).
+
+        Строится при первом обращении; если зеркала с тех пор сдвинулись
+        или изменили радиус, дерево обновляется инкрементально (refit).
+        """
+        if len(self.mirrors) < ACCEL_MIN_SPHERES:
+            self._accel = None
+            return None
+        # Хранилище не менялось - дерево актуально
+        state = (id(self.mirrors), self.mirrors.version)
+        if self._accel is not None and state == self._accel_state:
+            return self._accel
+        centers, radii = self.mirror_arrays()
+        if self._accel is None:
+            self._accel = SphereBVH(centers, radii)
+        else:
+            self._accel.sync(centers, radii)
+        self._accel_state = state
+        return self._accel
+
+    def attach_accelerator(self, accel):
+        """
+        BVH, построенный для прошлой копии сцены: дерево синхронизируется с
+        зеркалами этой сцены инкрементально (refit), а не строится заново.
+
+        Возвращает accelerator(). Дерево не должно использоваться
+        одновременно другой сценой (копии в одном рабочем потоке).
+        """
+        if accel is not None:
+            self._accel = accel
+            self._accel_state = None
+        return self.accelerator()
+
+    def copy(self):
+        """
+        Независимая копия сцены (например, для трассировки в другом потоке).
+
+        BVH не копируется: рабочий поток передает копиям свое дерево
+        через attach_accelerator.
+        """
+        return Scene(self.mirrors.copy(), self.source, self.target,
+                     self.num_rays, self.reflection_depth, self.ray_intensity,
+                     self.sampler)
+
+    def to_dict(self):
+        """Сериализация сцены в словарь"""
+        return {
+            'mirrors': self.mirrors.to_dicts(),
+            'source': list(self.source),
+            'target': list(self.target),
+            'num_rays': self.num_rays,
+            'reflection_depth': self.reflection_depth,
+            'ray_intensity': self.ray_intensity,
+            'sampler': self.sampler,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Создание сцены из словаря (отсутствующие поля - по умолчанию)"""
+        mirrors = data.get('mirrors')
+        if mirrors is not None:
+            mirrors = [{'pos': list(m['pos']),
+                        'radius': float(m['radius']),
+                        'color': m.get('color', '#4169E1'),
+                        'reflectivity': float(m.get('reflectivity', 0.9))}
+                       for m in mirrors]
+        return cls(mirrors=mirrors,
+                   source=data.get('source'),
+                   target=data.get('target'),
+                   num_rays=int(data.get('num_rays', 36)),
+                   reflection_depth=int(data.get('reflection_depth', 3)),
+                   ray_intensity=float(data.get('ray_intensity', 0.8)),
+                   sampler=data.get('sampler', 'random'))
+
+    @classmethod
+    def random(cls, num_mirrors, seed=0, extent=5.0, fill=0.05, dtype=np.float64):
+        """
+        Случайная сцена из num_mirrors сфер в кубе [-extent, extent]^3.
+
+        Радиусы подбираются так, чтобы доля объема, занятая сферами,
+        была примерно равна fill при любом количестве сфер.
+        """
+        rng = np.random.default_rng(seed)
+        radius = (fill * (2 * extent) ** 3 / (num_mirrors * 4 / 3 * np.pi)) ** (1 / 3)
+        centers = rng.uniform(-extent, extent, (num_mirrors, 3))
+        radii = radius * rng.uniform(0.5, 1.5, num_mirrors)
+
+        # Источник в центре куба не должен оказаться внутри сферы
+        outside = np.linalg.norm(centers, axis=1) > radii + 0.1
+        mirrors = SphereStore.from_arrays(centers[outside], radii[outside], '#4169E1', 0.9,
+                                          dtype=dtype)
+        return cls(mirrors=mirrors, source=[0, 0, 0], target=[extent, 0, 0])
+
+    @classmethod
+    def load(cls, path):
+        """Загрузка сцены из JSON файла (с построением BVH для больших сцен)"""
+        with open(path, encoding='utf-8') as f:
+            scene = cls.from_dict(json.load(f))
+        scene.accelerator()
+        return scene
+
+    def save(self, path):
+        """Сохранение сцены в JSON файл"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
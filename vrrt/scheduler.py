@@ -0,0 +1,203 @@
+"""
+Планировщик кадров.
+
+Запросы перерисовки (клавиши, перетаскивание, ползунки, анимация) не
+рисуют сразу, а помечают цели кадра как устаревшие. Все запросы до
+ближайшего кадра объединяются, и каждая цель перерисовывается не чаще
+одного раза за кадр с частотой не выше target_fps.
+
+Цели, которые сейчас не видны (например, сцена на скрытой вкладке),
+не рисуются: запросы к ним копятся и выполняются одним кадром, когда
+цель становится видимой (set_visible). Анимация скрытых целей
+приостанавливается.
+
+Планировщик измеряет время кадра и во время взаимодействия снижает
+качество (долю лучей, а затем и глубину отражений), чтобы держать
+целевую частоту. Когда ввод затихает, качество восстанавливается
+и запрашивается кадр в полном качестве.
+
+Модуль не импортирует tkinter: функция отложенного вызова (root.after)
+передается извне.
+"""
+import time
+
+# Целевая частота кадров
+TARGET_FPS = 30
+
+# Пауза ввода, после которой восстанавливается полное качество (мс)
+IDLE_MS = 250
+
+# Минимальная доля качества и шаги его изменения
+MIN_QUALITY = 0.1
+QUALITY_DOWN = 0.7
+QUALITY_UP = 1.25
+
+# Сглаживание измерений времени кадра (экспоненциальное среднее)
+SMOOTHING = 0.3
+
+# Минимальное число лучей при сниженном качестве
+MIN_RAYS = 8
+
+
+class FrameScheduler:
+    """Объединение запросов перерисовки и адаптивное качество"""
+
+    def __init__(self, after, render, quality_targets=(), target_fps=TARGET_FPS,
+                 idle_ms=IDLE_MS, clock=time.perf_counter):
+        self.after = after          # after(ms, callback), например root.after
+        self.render = render        # render(targets) - отрисовка набора целей
+        # Цели, вид которых зависит от качества (перерисовываются при его восстановлении)
+        self.quality_targets = tuple(quality_targets)
+        self.interval_ms = 1000.0 / target_fps
+        self.idle_ms = idle_ms
+        self.clock = clock
+
+        self.quality = 1.0
+        self.frame_ms = 0.0         # сглаженное время отрисовки кадра
+        self.work_ms = 0.0          # сглаженное время фоновой работы (трассировки)
+        self.frames = 0
+        self.requests = 0
+
+        self._dirty = set()
+        self._hidden = set()        # устаревшие, но невидимые цели
+        self.visible = None         # видимые цели (None - все)
+        self._frame_pending = False
+        self._idle_pending = False
+        self._last_frame = None
+        self._last_input = None
+        self._animations = []
+
+    # --- Запросы ---
+
+    def invalidate(self, *targets, interactive=False):
+        """Пометить цели устаревшими; interactive - запрос от ввода пользователя"""
+        self.requests += 1
+        self._dirty.update(targets)
+        if interactive:
+            self._last_input = self.clock()
+            self._schedule_idle_check()
+        self._schedule_frame()
+
+    def is_visible(self, target):
+        """Видна ли цель сейчас"""
+        return self.visible is None or target in self.visible
+
+    def set_visible(self, *targets):
+        """Смена видимых целей: накопленные запросы к ним рисуются ближайшим кадром"""
+        was_animating = self._animating()
+        self.visible = set(targets)
+        shown = self._hidden & self.visible
+        self._hidden -= shown
+        self._dirty.update(shown)
+        resumed = not was_animating and self._animating()
+        if resumed:
+            # Время, пока анимация стояла, в шаг не входит
+            self._last_frame = None
+            # Качество восстановится, когда анимация снова остановится или скроется
+            self._schedule_idle_check()
+        if shown or resumed:
+            self._schedule_frame()
+
+    def _animating(self):
+        """Есть ли анимация хотя бы одной видимой цели"""
+        return any(self.is_visible(t) for _, targets in self._animations for t in targets)
+
+    def report_work(self, ms):
+        """Учет фоновой работы для кадра (например, времени трассировки)"""
+        self.work_ms = self._smooth(self.work_ms, ms)
+
+    def add_animation(self, step, *targets):
+        """
+        Покадровая анимация: step(dt) вызывается перед каждым кадром
+        (dt - секунды с прошлого шага), после чего цели перерисовываются.
+        """
+        self._animations.append((step, targets))
+        self.invalidate(*targets, interactive=True)
+
+    def remove_animation(self, step):
+        """Остановка анимации"""
+        self._animations = [(s, t) for s, t in self._animations if s != step]
+
+    def interacting(self):
+        """Идет ли сейчас взаимодействие (ввод или анимация видимой цели)"""
+        if self._animating():
+            return True
+        if self._last_input is None:
+            return False
+        return (self.clock() - self._last_input) * 1000 < self.idle_ms
+
+    def effective(self, num_rays, depth):
+        """Число лучей и глубина отражений с учетом текущего качества"""
+        if self.quality >= 1:
+            return num_rays, depth
+        rays = min(num_rays, max(MIN_RAYS, int(round(num_rays * self.quality))))
+        # Глубина снижается только после того, как лучей стало вчетверо меньше
+        if self.quality < 0.25:
+            depth = min(depth, max(1, depth - 1))
+        return rays, depth
+
+    # --- Кадры ---
+
+    def _schedule_frame(self):
+        if self._frame_pending:
+            return
+        delay = 0
+        if self._last_frame is not None:
+            elapsed = (self.clock() - self._last_frame) * 1000
+            delay = max(0, int(self.interval_ms - elapsed))
+        self._frame_pending = True
+        self.after(delay, self._frame)
+
+    def _frame(self):
+        self._frame_pending = False
+        now = self.clock()
+        dt = now - self._last_frame if self._last_frame is not None else 0.0
+        self._last_frame = now
+
+        if self._animating():
+            for step, targets in list(self._animations):
+                step(dt)
+                self._dirty.update(targets)
+
+        targets, self._dirty = self._dirty, set()
+        hidden = {t for t in targets if not self.is_visible(t)}
+        self._hidden |= hidden
+        targets -= hidden
+        if targets:
+            self.render(targets)
+            self.frames += 1
+            self.frame_ms = self._smooth(self.frame_ms, (self.clock() - now) * 1000)
+            if self.interacting():
+                self._adapt()
+        if self._animating():
+            self._schedule_frame()
+
+    def _adapt(self):
+        """Подстройка качества под бюджет кадра"""
+        cost = self.frame_ms + self.work_ms
+        if cost > self.interval_ms:
+            self.quality = max(MIN_QUALITY, self.quality * QUALITY_DOWN)
+        elif cost < self.interval_ms * 0.5:
+            self.quality = min(1.0, self.quality * QUALITY_UP)
+
+    def _schedule_idle_check(self):
+        if self._idle_pending:
+            return
+        self._idle_pending = True
+        self.after(self.idle_ms, self._check_idle)
+
+    def _check_idle(self):
+        """Восстановление полного качества после паузы ввода"""
+        self._idle_pending = False
+        if self.interacting():
+            self._schedule_idle_check()
+            return
+        if self.quality < 1:
+            self.quality = 1.0
+            self.invalidate(*self.quality_targets)
+
+    @staticmethod
+    def _smooth(value, sample):
+        if value == 0:
+            return sample
+        return value + SMOOTHING * (sample - value)
@@ -0,0 +1,539 @@
+"""
+2D схема: поиск путей источник -> зеркала -> приемник и их отрисовка.
+
+Точки отражения ищутся точно, по закону отражения, а не перебором
+точек окружности. Для одного отражения (задача Альхазена) корни
+невязки закона отражения находятся сразу для всех зеркал: смена знака
+на сетке углов и бисекция. Для нескольких отражений перебираются
+последовательности зеркал, и для каждой методом Ньютона ищется
+стационарная точка длины пути (принцип Ферма). Перекрытия проверяются
+одним пакетом: все отрезки найденных путей x все зеркала.
+
+При перетаскивании меняется только один объект, поэтому решения и
+результаты проверок перекрытия хранятся между событиями: после сдвига
+зеркала пересчитываются лишь последовательности, в которые оно входит
+(их отрезки проверяются заново со всеми зеркалами), а отрезки
+остальных путей проверяются только со сдвинутым зеркалом.
+
+Отрисовка разбита на слои (сетка, зеркала, метки, пути), как в
+render.VRRenderer: неподвижная сетка и несдвинутые зеркала не
+перерисовываются.
+"""
+import math
+
+import numpy as np
+
+from .canvas_pool import RetainedCanvas
+from .profiler import PROFILER
+from .render import Layer
+from .store import SphereStore
+
+# Пулы элементов 2D холста в порядке отрисовки (снизу вверх)
+SCHEMA_POOLS = [('grid', 'line'), ('mirrors', 'oval'), ('markers', 'oval'),
+                ('labels', 'text'), ('paths', 'line'), ('points', 'oval')]
+
+# Поиск корней для одного отражения: узлы сетки углов и шаги бисекции
+ROOT_SAMPLES = 96
+BISECTION_STEPS = 48
+
+# Метод Ньютона для нескольких отражений: итерации и допуск
+# (градиент длины пути относительно радиуса зеркала)
+NEWTON_STEPS = 30
+NEWTON_TOL = 1e-9
+
+# Предел числа последовательностей зеркал на одном уровне отражений:
+# глубже этого уровня пути не ищутся
+MAX_SEQUENCES = 5000
+
+# Цвета путей по числу отражений
+PATH_COLORS = ['cyan', '#ff66ff', '#ffaa00', '#66ff66', '#6699ff']
+
+
+def segment_hits_circle(p1, p2, center, radius):
+    """
+    Пересекают ли отрезки p1 -> p2 окружность (center, radius).
+
+    Все аргументы транслируются по правилам NumPy: p1, p2 и center -
+    точки (..., 2), radius - (...). Условие то же, что в исходной
+    проверке: дискриминант > 0 и хотя бы один корень в [0, 1].
+    """
+    p1 = np.asarray(p1, dtype=float)
+    p2 = np.asarray(p2, dtype=float)
+    center = np.asarray(center, dtype=float)
+    dx = p2[..., 0] - p1[..., 0]
+    dy = p2[..., 1] - p1[..., 1]
+    fx = p1[..., 0] - center[..., 0]
+    fy = p1[..., 1] - center[..., 1]
+
+    a = dx*dx + dy*dy
+    b = 2*(fx*dx + fy*dy)
+    c = fx*fx + fy*fy - radius*radius
+    disc = b*b - 4*a*c
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sq = np.sqrt(np.where(disc > 0, disc, 0))
+        t1 = (-b - sq) / (2*a)
+        t2 = (-b + sq) / (2*a)
+    return (disc > 0) & (((0 <= t1) & (t1 <= 1)) | ((0 <= t2) & (t2 <= 1)))
+
+
+def _unit(v):
+    length = np.sqrt(np.einsum('...i,...i->...', v, v))[..., None]
+    return v / np.where(length > 0, length, 1)
+
+
+def _polar(theta):
+    return np.stack([np.cos(theta), np.sin(theta)], axis=-1)
+
+
+def reflection_law(theta, centers, radii, prev, nxt):
+    """
+    Невязка закона отражения в точке окружности с углом theta.
+
+    f = cross(n, e1 + e2), где n - нормаль, e1, e2 - единичные векторы
+    из точки к prev и nxt: f == 0, когда нормаль - биссектриса угла.
+    valid - prev и nxt лежат снаружи касательной (точка видна обоим).
+    """
+    n = _polar(theta)
+    points = centers + radii[..., None] * n
+    to_prev = prev - points
+    to_next = nxt - points
+    s = _unit(to_prev) + _unit(to_next)
+    f = n[..., 0] * s[..., 1] - n[..., 1] * s[..., 0]
+    valid = (np.einsum('...i,...i->...', n, to_prev) > 0) & \
+            (np.einsum('...i,...i->...', n, to_next) > 0)
+    return f, valid
+
+
+def single_reflections(source, target, centers, radii):
+    """
+    Все точки зеркального отражения source -> окружность -> target.
+
+    Задача Альхазена решается численно для всех окружностей сразу:
+    невязка закона отражения считается на сетке углов, интервалы со
+    сменой знака уточняются бисекцией. Видимость проверяется уже у
+    корня: корень у края видимой дуги может лежать в интервале, один
+    из концов которого не виден. Возвращает (mirror, theta).
+    """
+    source = np.asarray(source, dtype=float)
+    target = np.asarray(target, dtype=float)
+    theta = np.linspace(0, 2 * math.pi, ROOT_SAMPLES + 1)
+    f, _ = reflection_law(theta[None, :], centers[:, None, :], radii[:, None], source, target)
+
+    bracket = (f[:, :-1] < 0) != (f[:, 1:] < 0)
+    mirror, k = np.nonzero(bracket)
+    lo, hi = theta[k], theta[k + 1]
+    f_lo = f[mirror, k]
+    c, r = centers[mirror], radii[mirror]
+    for _ in range(BISECTION_STEPS):
+        mid = (lo + hi) / 2
+        f_mid, _ = reflection_law(mid, c, r, source, target)
+        left = (f_mid < 0) == (f_lo < 0)
+        lo = np.where(left, mid, lo)
+        f_lo = np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+
+    root = (lo + hi) / 2
+    _, ok = reflection_law(root, c, r, source, target)
+    return mirror[ok], root[ok]
+
+
+def mirror_sequences(num_mirrors, bounces):
+    """Все последовательности зеркал длины bounces без повторов подряд (N, bounces)"""
+    seqs = np.arange(num_mirrors)[:, None]
+    for _ in range(bounces - 1):
+        rep = np.repeat(seqs, num_mirrors, axis=0)
+        nxt = np.tile(np.arange(num_mirrors), len(seqs))
+        keep = rep[:, -1] != nxt
+        seqs = np.hstack([rep[keep], nxt[keep, None]])
+    return seqs
+
+
+def _path_gradient(theta, centers, radii, source, target):
+    """Градиент длины ломаной source -> P1 -> ... -> Pk -> target по углам точек"""
+    n = _polar(theta)
+    points = centers + radii[..., None] * n
+    shape = points[:, :1].shape
+    chain = np.concatenate([np.broadcast_to(source, shape), points,
+                            np.broadcast_to(target, shape)], axis=1)
+    tangent = radii[..., None] * np.stack([-n[..., 1], n[..., 0]], axis=-1)
+    pull = _unit(points - chain[:, :-2]) + _unit(points - chain[:, 2:])
+    return np.einsum('...i,...i->...', pull, tangent), n, chain
+
+
+def solve_sequences(seqs, theta, centers, radii, source, target):
+    """
+    Многократные отражения по принципу Ферма.
+
+    Для каждой последовательности зеркал ищется стационарная точка длины
+    пути методом Ньютона (гессиан - односторонними разностями градиента);
+    в ней в каждой точке выполняется закон отражения. theta - начальные
+    углы (N, k). Возвращает (theta, ok): ok - сходимость и видимость
+    соседних точек пути снаружи каждого зеркала.
+    """
+    source = np.asarray(source, dtype=float)
+    target = np.asarray(target, dtype=float)
+    theta = np.array(theta, dtype=float)
+    c, r = centers[seqs], radii[seqs]
+    n, k = seqs.shape
+    h = 1e-6
+
+    active = np.arange(n)
+    for _ in range(NEWTON_STEPS):
+        if not len(active):
+            break
+        t, ca, ra = theta[active], c[active], r[active]
+        g, _, _ = _path_gradient(t, ca, ra, source, target)
+        done = (np.abs(g) < NEWTON_TOL * ra).all(axis=1)
+        active, t, ca, ra, g = active[~done], t[~done], ca[~done], ra[~done], g[~done]
+        if not len(active):
+            break
+
+        hess = np.empty((len(active), k, k))
+        for j in range(k):
+            e = np.zeros(k)
+            e[j] = h
+            g_plus, _, _ = _path_gradient(t + e, ca, ra, source, target)
+            hess[:, :, j] = (g_plus - g) / h
+
+        # Вырожденный гессиан - шаг по градиенту
+        singular = np.abs(np.linalg.det(hess)) < 1e-12 * np.prod(ra, axis=1) ** 2
+        hess[singular] = np.eye(k)
+        step = np.linalg.solve(hess, g[..., None])[..., 0]
+        step[singular] = np.sign(g[singular]) * 0.05
+        theta[active] = t - np.clip(step, -0.5, 0.5)
+
+    g, normals, chain = _path_gradient(theta, c, r, source, target)
+    points = chain[:, 1:-1]
+    facing = ((np.einsum('...i,...i->...', normals, chain[:, :-2] - points) > 0)
+              & (np.einsum('...i,...i->...', normals, chain[:, 2:] - points) > 0))
+    ok = (np.abs(g) < NEWTON_TOL * 100 * r).all(axis=1) & facing.all(axis=1)
+    return theta, ok
+
+
+def _initial_angles(seqs, centers, source, target):
+    """Начальные углы: биссектриса направлений на соседние центры"""
+    c = centers[seqs]
+    shape = c[:, :1].shape
+    anchors = np.concatenate([np.broadcast_to(np.asarray(source, dtype=float), shape), c,
+                              np.broadcast_to(np.asarray(target, dtype=float), shape)], axis=1)
+    s = _unit(anchors[:, :-2] - c) + _unit(anchors[:, 2:] - c)
+    return np.arctan2(s[..., 1], s[..., 0])
+
+
+class SchemaSolver:
+    """
+    Инкрементальный поиск путей источник -> зеркала -> приемник на 2D схеме.
+
+    Решения хранятся по уровням (числу отражений) вместе с версиями
+    зеркал, для которых они найдены. После сдвига зеркала заново
+    решаются только последовательности, в которые оно входит (со
+    старыми углами как начальным приближением); после сдвига
+    источника или приемника - все.
+
+    Для каждого пути уровня хранится матрица перекрытий: какие зеркала
+    закрывают хотя бы один его отрезок. Заново решенные пути
+    проверяются со всеми зеркалами, остальные - только со
+    сдвинутыми с прошлой проверки.
+    """
+
+    def __init__(self, max_sequences=MAX_SEQUENCES):
+        self.max_sequences = max_sequences
+        self.centers = np.empty((0, 2))
+        self.radii = np.empty(0)
+        self.source = None
+        self.target = None
+        self.depth = 1
+        self.depth_reached = 0      # глубина, до которой хватило лимита последовательностей
+        self.paths = []             # [(последовательность зеркал, [точки отражения])]
+        self.solved = 0             # число решенных последовательностей (статистика)
+        self.occlusion_tests = 0    # число проверок отрезок x зеркало (статистика)
+
+        self._clock = 0
+        self._versions = np.zeros(0, dtype=np.int64)
+        self._endpoints = 0
+        self._levels = {}
+        self._direct = None
+
+    def update(self, mirrors, source, target, depth=1):
+        """Синхронизация со схемой и пересчет путей. Возвращает True, если что-то изменилось."""
+        if isinstance(mirrors, SphereStore):
+            # Копии: хранилище меняется на месте, а сравнение идет с прошлым состоянием
+            centers = mirrors.centers.astype(float)
+            radii = mirrors.radii.astype(float)
+        else:
+            centers = np.array([m['center'] for m in mirrors], dtype=float).reshape(-1, 2)
+            radii = np.array([m['radius'] for m in mirrors], dtype=float)
+        source, target = tuple(source), tuple(target)
+        changed = depth != self.depth
+        self.depth = depth
+        self._clock += 1
+
+        if len(radii) != len(self.radii):
+            self._versions = np.full(len(radii), self._clock)
+            self._levels.clear()
+            changed = True
+        else:
+            moved = (centers != self.centers).any(axis=1) | (radii != self.radii)
+            if moved.any():
+                self._versions[moved] = self._clock
+                changed = True
+        if (source, target) != (self.source, self.target):
+            self._endpoints = self._clock
+            changed = True
+        self.centers, self.radii = centers, radii
+        self.source, self.target = source, target
+
+        if changed:
+            self._direct = None
+            with PROFILER.stage('schema_solve'):
+                self._solve()
+        return changed
+
+    def direct_visible(self):
+        """Виден ли приемник из источника напрямую"""
+        if self._direct is None:
+            self._direct = not segment_hits_circle(self.source, self.target,
+                                                   self.centers, self.radii).any()
+        return self._direct
+
+    def _solve(self):
+        candidates = []
+        self.depth_reached = 0
+        m = len(self.radii)
+        for k in range(1, self.depth + 1):
+            if m == 0 or m * (m - 1) ** (k - 1) > self.max_sequences:
+                break
+            if k == 1:
+                candidates.append(self._solve_single())
+            else:
+                candidates.append(self._solve_level(k))
+            self.depth_reached = k
+        self.paths = self._visible_paths(candidates)
+
+    def _solve_single(self):
+        """Одно отражение: все корни задачи Альхазена, только для сдвинутых зеркал"""
+        level = self._levels.get(1)
+        m = len(self.radii)
+        if level is None or level['endpoints'] != self._endpoints:
+            stale = np.ones(m, dtype=bool)
+            mirror, theta = np.empty(0, dtype=np.int64), np.empty(0)
+            occluders, tested = np.zeros((0, m), dtype=bool), -1
+        else:
+            stale = level['versions'] != self._versions
+            keep = ~stale[level['mirror']]
+            mirror, theta = level['mirror'][keep], level['theta'][keep]
+            occluders, tested = level['occluders'][keep], level['tested']
+        fresh = np.zeros(len(mirror), dtype=bool)
+
+        idx = np.flatnonzero(stale)
+        if len(idx):
+            new_mirror, new_theta = single_reflections(self.source, self.target,
+                                                       self.centers[idx], self.radii[idx])
+            mirror = np.concatenate([mirror, idx[new_mirror]])
+            theta = np.concatenate([theta, new_theta])
+            occluders = np.concatenate([occluders, np.zeros((len(new_mirror), m), dtype=bool)])
+            fresh = np.concatenate([fresh, np.ones(len(new_mirror), dtype=bool)])
+            order = np.argsort(mirror, kind='stable')
+            mirror, theta = mirror[order], theta[order]
+            occluders, fresh = occluders[order], fresh[order]
+            self.solved += len(idx)
+
+        level = {'mirror': mirror, 'theta': theta, 'occluders': occluders, 'tested': tested,
+                 'versions': self._versions.copy(), 'endpoints': self._endpoints}
+        self._levels[1] = level
+        return level, np.arange(len(mirror)), mirror[:, None], theta[:, None], fresh
+
+    def _solve_level(self, k):
+        """k отражений: Ньютон для последовательностей со сдвинутыми зеркалами"""
+        level = self._levels.get(k)
+        if level is None:
+            seqs = mirror_sequences(len(self.radii), k)
+            level = {'seqs': seqs, 'theta': _initial_angles(seqs, self.centers,
+                                                            self.source, self.target),
+                     'ok': np.zeros(len(seqs), dtype=bool),
+                     'occluders': np.zeros((len(seqs), len(self.radii)), dtype=bool),
+                     'tested': -1, 'versions': np.full(seqs.shape, -1), 'endpoints': -1}
+            self._levels[k] = level
+        seqs = level['seqs']
+
+        current = self._versions[seqs]
+        stale = (level['versions'] != current).any(axis=1)
+        if level['endpoints'] != self._endpoints:
+            stale[:] = True
+        idx = np.flatnonzero(stale)
+        if len(idx):
+            # Решения, не найденные раньше, начинаем с начального приближения
+            start = level['theta'][idx]
+            fresh = ~level['ok'][idx]
+            start[fresh] = _initial_angles(seqs[idx[fresh]], self.centers,
+                                           self.source, self.target)
+            theta, ok = solve_sequences(seqs[idx], start, self.centers, self.radii,
+                                        self.source, self.target)
+            level['theta'][idx] = theta
+            level['ok'][idx] = ok
+            level['versions'][idx] = current[idx]
+            self.solved += len(idx)
+        level['endpoints'] = self._endpoints
+        rows = np.flatnonzero(level['ok'])
+        return level, rows, seqs[rows], level['theta'][rows], stale[rows]
+
+    def _occluders(self, chain, seqs, mirrors):
+        """Какие из зеркал mirrors перекрывают хотя бы один отрезок каждого пути (n, len(mirrors))"""
+        n, k = seqs.shape
+        hits = segment_hits_circle(chain[:, :-1, None], chain[:, 1:, None],
+                                   self.centers[mirrors], self.radii[mirrors])
+        self.occlusion_tests += hits.size
+
+        # Зеркала на концах отрезка его не перекрывают
+        none = np.full((n, 1), -1)
+        ends = np.concatenate([seqs, none], axis=1)[..., None]
+        starts = np.concatenate([none, seqs], axis=1)[..., None]
+        own = (ends == mirrors) | (starts == mirrors)
+        return (hits & ~own).any(axis=1)
+
+    def _visible_paths(self, candidates):
+        """
+        Проверка перекрытий с кэшем по уровням: заново решенные пути -
+        со всеми зеркалами, остальные - только со сдвинутыми.
+        """
+        paths = []
+        for level, rows, seqs, theta, fresh in candidates:
+            moved = np.flatnonzero(self._versions > level['tested'])
+            level['tested'] = self._clock
+            if not len(seqs):
+                continue
+            n = len(seqs)
+            points = self.centers[seqs] + self.radii[seqs][..., None] * _polar(theta)
+            chain = np.concatenate([np.broadcast_to(self.source, (n, 1, 2)), points,
+                                    np.broadcast_to(self.target, (n, 1, 2))], axis=1)
+
+            occluders = level['occluders']
+            if fresh.any():
+                occluders[rows[fresh]] = self._occluders(chain[fresh], seqs[fresh],
+                                                         np.arange(len(self.radii)))
+            old = ~fresh
+            if len(moved) and old.any():
+                block = occluders[rows[old]]
+                block[:, moved] = self._occluders(chain[old], seqs[old], moved)
+                occluders[rows[old]] = block
+            clear = ~occluders[rows].any(axis=1)
+
+            for seq, pts in zip(seqs[clear], points[clear]):
+                paths.append((tuple(int(i) for i in seq),
+                               [tuple(float(v) for v in p) for p in pts]))
+        return paths
+
+
+class SchemaRenderer:
+    """Отрисовка 2D схемы на холст с кэшированием слоев"""
+
+    def __init__(self, canvas, view, prefix='schema'):
+        # view: width, height, mirrors_2d, source_2d, target_2d, reflection_depth
+        self.canvas = canvas
+        self.view = view
+        self.items = RetainedCanvas(canvas, SCHEMA_POOLS, prefix=prefix)
+        self.solver = SchemaSolver()
+        self.layers = [
+            Layer('grid', ['grid'], self.grid_key, self.draw_grid),
+            Layer('mirrors', ['mirrors'], self.mirrors_key, self.draw_mirrors),
+            Layer('markers', ['markers', 'labels'], self.markers_key, self.draw_markers),
+            Layer('paths', ['paths', 'points'], self.paths_key, self.draw_paths),
+        ]
+
+    def invalidate(self, *names):
+        """Сброс кэша указанных слоев (по умолчанию - всех)"""
+        for layer in self.layers:
+            if not names or layer.name in names:
+                layer.invalidate()
+
+    def render(self):
+        """Отрисовка схемы: перестраиваются только слои с изменившимся ключом"""
+        rebuilt = []
+        for layer in self.layers:
+            key = layer.key()
+            if key == layer.built_key:
+                continue
+            self.items.begin_frame(layer.pools)
+            with PROFILER.stage(layer.draw.__name__):
+                layer.draw()
+            layer.built_key = key
+            layer.builds += 1
+            rebuilt.append(layer)
+
+        if rebuilt:
+            self.items.end_frame([pool for layer in rebuilt for pool in layer.pools])
+        return [layer.name for layer in rebuilt]
+
+    # --- Ключи слоев ---
+
+    def grid_key(self):
+        return (self.view.width, self.view.height)
+
+    def mirrors_key(self):
+        return tuple((tuple(m['center']), m['radius'], m['color'])
+                     for m in self.view.mirrors_2d)
+
+    def markers_key(self):
+        return (tuple(self.view.source_2d), tuple(self.view.target_2d))
+
+    def paths_key(self):
+        return (tuple((tuple(m['center']), m['radius']) for m in self.view.mirrors_2d),
+                tuple(self.view.source_2d), tuple(self.view.target_2d),
+                int(self.view.reflection_depth))
+
+    # --- Слои ---
+
+    def draw_grid(self):
+        """Рисуем сетку"""
+        grid = self.items['grid']
+        for i in range(0, self.view.width, 50):
+            grid.add((i, 0, i, self.view.height), fill='#333')
+        for i in range(0, self.view.height, 50):
+            grid.add((0, i, self.view.width, i), fill='#333')
+
+    def draw_mirrors(self):
+        """Рисуем зеркала"""
+        mirrors = self.items['mirrors']
+        for mirror in self.view.mirrors_2d:
+            x, y = mirror['center']
+            r = mirror['radius']
+            color = mirror['color']
+            mirrors.add((x-r, y-r, x+r, y+r), outline=color, width=2, fill='')
+            mirrors.add((x-3, y-3, x+3, y+3), outline='black', width=1, fill=color)
+
+    def draw_markers(self):
+        """Рисуем источник и приемник"""
+        source, target = self.view.source_2d, self.view.target_2d
+        markers, labels = self.items['markers'], self.items['labels']
+        markers.add((source[0]-8, source[1]-8, source[0]+8, source[1]+8),
+                    fill='red', outline='white', width=2)
+        labels.add((source[0], source[1]-15), text="ИСТОЧНИК", fill='white')
+        markers.add((target[0]-8, target[1]-8, target[0]+8, target[1]+8),
+                    fill='yellow', outline='white', width=2)
+        labels.add((target[0], target[1]-15), text="ПРИЕМНИК", fill='white')
+
+    def draw_paths(self):
+        """Рисуем прямой и отраженные лучи"""
+        view = self.view
+        solver = self.solver
+        solver.update(view.mirrors_2d, view.source_2d, view.target_2d,
+                      int(view.reflection_depth))
+        source, target = view.source_2d, view.target_2d
+        paths, points = self.items['paths'], self.items['points']
+
+        # Прямой луч
+        if solver.direct_visible():
+            paths.add((source[0], source[1], target[0], target[1]),
+                      fill='green', width=2, dash=(5, 3))
+
+        # Отраженные лучи: ломаная источник -> точки отражения -> приемник
+        for seq, reflection_points in solver.paths:
+            bounces = len(seq)
+            color = PATH_COLORS[(bounces - 1) % len(PATH_COLORS)]
+            chain = [source] + reflection_points + [target]
+            for (x1, y1), (x2, y2) in zip(chain, chain[1:]):
+                paths.add((x1, y1, x2, y2), fill=color, width=2 if bounces == 1 else 1,
+                          dash=() if bounces == 1 else (4, 2))
+            for px, py in reflection_points:
+                points.add((px-4, py-4, px+4, py+4), fill='white', outline=color)
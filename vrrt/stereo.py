@@ -0,0 +1,85 @@
+"""
+Стереопара для VR вкладки: изображения для левого и правого глаза
+рядом (side-by-side).
+
+Каждый глаз - обычный рендерер (VRRenderer или RasterRenderer) со своим
+видом EyeView: камера сдвинута вдоль оси "вправо" на половину
+межзрачкового расстояния (view.ipd), ширина - половина холста. Поэтому
+у каждого глаза свои слои и свой кэш слоев: небо и сетка одного глаза
+не перестраиваются из-за другого.
+
+Пути лучей в мировых координатах не зависят от камеры: оба глаза
+получают один и тот же объект view.ray_segments() (трассировка один
+раз), а на кадр приходится только две проекции.
+"""
+import math
+
+# Стороны глаз: сдвиг камеры в половинах межзрачкового расстояния
+EYES = (('left', -1), ('right', 1))
+
+
+class EyeView:
+    """Вид одного глаза: остальные атрибуты берутся у общего вида"""
+
+    def __init__(self, view, side):
+        self.view = view
+        self.side = side
+
+    def __getattr__(self, name):
+        return getattr(self.view, name)
+
+    @property
+    def width(self):
+        half = self.view.width // 2
+        return half if self.side < 0 else self.view.width - half
+
+    @property
+    def camera_pos(self):
+        view = self.view
+        angle = math.radians(view.camera_angle)
+        shift = self.side * view.ipd / 2
+        x, y, z = view.camera_pos
+        # Ось "вправо" камеры - первая строка матрицы поворота Projection
+        return [x + shift * math.cos(angle), y, z - shift * math.sin(angle)]
+
+
+class StereoRenderer:
+    """
+    Стереопара из двух рендереров одного типа.
+
+    make_eye(view, prefix, origin) создает рендерер глаза, например
+    lambda view, prefix, origin: VRRenderer(canvas, view, prefix, origin).
+    """
+
+    def __init__(self, view, make_eye, prefix='vr'):
+        self.view = view
+        self.eyes = []
+        for name, side in EYES:
+            eye_view = EyeView(view, side)
+            origin = (0 if side < 0 else view.width // 2, 0)
+            self.eyes.append(make_eye(eye_view, f'{prefix}_{name}', origin))
+
+    def projection(self):
+        """Проекция левого глаза (для совместимости с VRRenderer)"""
+        return self.eyes[0].projection()
+
+    def projection_at(self, x):
+        """Проекция глаза, в половине которого лежит экранная точка x"""
+        return self.eyes[0 if x < self.view.width // 2 else 1].projection()
+
+    def invalidate(self, *names):
+        """Сброс кэша указанных слоев обоих глаз"""
+        for eye in self.eyes:
+            eye.invalidate(*names)
+
+    def clear(self):
+        """Удаление элементов обоих глаз с холста"""
+        for eye in self.eyes:
+            eye.clear()
+
+    def render(self):
+        """Отрисовка обоих глаз; возвращает перестроенные слои с именем глаза"""
+        rebuilt = []
+        for (name, _), eye in zip(EYES, self.eyes):
+            rebuilt += [f'{name}:{layer}' for layer in eye.render()]
+        return rebuilt
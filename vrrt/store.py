@@ -0,0 +1,203 @@
+"""
+Хранилище сфер в виде структуры массивов.
+
+Центры, радиусы и коэффициенты отражения лежат в непрерывных массивах
+NumPy (float64 или, для экономии памяти, float32), цвета - в отдельной
+таблице строк. Трассировщик получает массивы без копирования и без
+обхода словарей, а интерфейс и перетаскивание на 2D схеме работают
+через SphereView - легкое представление одной сферы с доступом как к
+словарю (mirror['pos'], mirror['center'] = (x, y)).
+
+Массивы растут с запасом, поэтому добавление сферы не копирует все
+данные каждый раз. Любое изменение увеличивает version.
+"""
+import numpy as np
+
+# Значения по умолчанию для сфер без цвета или коэффициента отражения
+DEFAULT_COLOR = '#4169E1'
+DEFAULT_REFLECTIVITY = 0.9
+
+
+class SphereView:
+    """Одна сфера хранилища с интерфейсом словаря"""
+
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def keys(self):
+        return (self.store.key, 'radius', 'color', 'reflectivity')
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return 4
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+    def __getitem__(self, name):
+        store, i = self.store, self.index
+        if name == store.key:
+            return tuple(store.centers[i].tolist())
+        if name == 'radius':
+            return float(store.radii[i])
+        if name == 'color':
+            return store.colors[i]
+        if name == 'reflectivity':
+            return float(store.reflectivity[i])
+        raise KeyError(name)
+
+    def __setitem__(self, name, value):
+        store, i = self.store, self.index
+        if name == store.key:
+            store.centers[i] = value
+        elif name == 'radius':
+            store.radii[i] = value
+        elif name == 'color':
+            store.colors[i] = value
+        elif name == 'reflectivity':
+            store.reflectivity[i] = value
+        else:
+            raise KeyError(name)
+        store.version += 1
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+    def __eq__(self, other):
+        try:
+            return dict(self.items()) == dict(other.items())
+        except AttributeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class SphereStore:
+    """
+    Сферы в виде структуры массивов.
+
+    key - имя поля центра для представлений ('pos' в 3D, 'center' на схеме),
+    dim - размерность центров, dtype - тип чисел (np.float64 или np.float32).
+    """
+
+    def __init__(self, dim=3, dtype=np.float64, key='pos', capacity=8):
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.key = key
+        self.size = 0
+        self.version = 0
+        self.colors = []            # таблица цветов (строки Tk)
+        self._centers = np.empty((capacity, dim), dtype=self.dtype)
+        self._radii = np.empty(capacity, dtype=self.dtype)
+        self._reflectivity = np.empty(capacity, dtype=self.dtype)
+
+    # Массивы без запаса (представления, не копии)
+
+    @property
+    def centers(self):
+        return self._centers[:self.size]
+
+    @property
+    def radii(self):
+        return self._radii[:self.size]
+
+    @property
+    def reflectivity(self):
+        return self._reflectivity[:self.size]
+
+    @classmethod
+    def from_arrays(cls, centers, radii, colors=None, reflectivity=None,
+                    dtype=np.float64, key='pos'):
+        """Хранилище из готовых массивов (без поэлементного обхода)"""
+        centers = np.asarray(centers, dtype=dtype)
+        n = len(centers)
+        store = cls(centers.shape[1], dtype, key, capacity=max(n, 1))
+        store.size = n
+        store.centers[:] = centers
+        store.radii[:] = radii
+        store.reflectivity[:] = DEFAULT_REFLECTIVITY if reflectivity is None else reflectivity
+        if colors is None or isinstance(colors, str):
+            colors = [colors or DEFAULT_COLOR] * n
+        store.colors = list(colors)
+        return store
+
+    @classmethod
+    def from_dicts(cls, spheres, dtype=np.float64, key='pos'):
+        """Хранилище из списка словарей {'pos'/'center', 'radius', 'color', 'reflectivity'}"""
+        spheres = list(spheres)
+        dim = len(spheres[0][key]) if spheres else (2 if key == 'center' else 3)
+        centers = np.array([s[key] for s in spheres], dtype=dtype).reshape(-1, dim)
+        return cls.from_arrays(
+            centers, [s['radius'] for s in spheres],
+            [s.get('color', DEFAULT_COLOR) for s in spheres],
+            [s.get('reflectivity', DEFAULT_REFLECTIVITY) for s in spheres],
+            dtype, key)
+
+    def to_dicts(self):
+        """Список словарей (для JSON)"""
+        return [{self.key: list(self.centers[i].tolist()), 'radius': float(self.radii[i]),
+                 'color': self.colors[i], 'reflectivity': float(self.reflectivity[i])}
+                for i in range(self.size)]
+
+    def copy(self, dtype=None):
+        """Независимая копия (при необходимости - с другим типом чисел)"""
+        return SphereStore.from_arrays(self.centers, self.radii, self.colors,
+                                       self.reflectivity, dtype or self.dtype, self.key)
+
+    def append(self, center, radius, color=DEFAULT_COLOR, reflectivity=DEFAULT_REFLECTIVITY):
+        """Добавление сферы; возвращает ее индекс"""
+        if self.size == len(self._radii):
+            self._grow(max(8, 2 * self.size))
+        i = self.size
+        self._centers[i] = center
+        self._radii[i] = radius
+        self._reflectivity[i] = reflectivity
+        self.colors.append(color)
+        self.size += 1
+        self.version += 1
+        return i
+
+    def remove(self, index):
+        """Удаление сферы (следующие сдвигаются на одну позицию)"""
+        index = range(self.size)[index]
+        for array in (self._centers, self._radii, self._reflectivity):
+            array[index:self.size - 1] = array[index + 1:self.size]
+        del self.colors[index]
+        self.size -= 1
+        self.version += 1
+
+    def _grow(self, capacity):
+        for name in ('_centers', '_radii', '_reflectivity'):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=self.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    @property
+    def nbytes(self):
+        """Объем числовых массивов (байт, без запаса)"""
+        return self.size * (self.dim + 2) * self.dtype.itemsize
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [SphereView(self, i) for i in range(self.size)[index]]
+        return SphereView(self, range(self.size)[index])
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield SphereView(self, i)
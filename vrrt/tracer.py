@@ -0,0 +1,300 @@
+"""
+Волновая (wavefront) трассировка лучей в 3D на NumPy.
+
+Вместо рекурсивного обхода одного луча за раз все активные лучи
+обрабатываются пакетом: на каждом отражении считаются пересечения
+N лучей x M сфер, выбирается ближайшее, вычисляется отраженный луч
+R = V - 2(V·N)N, а лучи, ушедшие в пустоту, выбрасываются из пакета.
+
+По умолчанию луч отражается, пока не уйдет в пустоту или не достигнет
+max_depth. С roulette (Roulette) луч несет энергию, которая при
+отражении умножается на reflectivity зеркала, а тусклые лучи проходят
+русскую рулетку и могут оборваться раньше. Тот же Roulette и тот же шаг
+отражения (reflect_hits) использует energy.trace_energy, поэтому при
+одинаковом seed рулетка обрывает одни и те же лучи.
+"""
+import numpy as np
+
+from .profiler import PROFILER
+from .sampling import cone_directions, random_points, sample_directions
+
+# Минимальная дистанция до пересечения (защита от самопересечения)
+HIT_EPSILON = 0.01
+
+# Ограничение на размер промежуточных массивов N x M (элементов)
+CHUNK_ELEMENTS = 1 << 20
+
+# Компактные типы номеров в RaySegments: отражения, зеркала и лучи
+DEPTH_DTYPE = np.int16
+INDEX_DTYPE = np.int32
+
+# Порог энергии луча для русской рулетки
+ROULETTE_THRESHOLD = 0.1
+
+# Константы перемешивания splitmix64 (случайные числа рулетки)
+_MIX = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xBF58476D1CE4E5B9),
+        np.uint64(0x94D049BB133111EB))
+
+
+class TraceCancelled(Exception):
+    """Трассировка прервана: результат больше не нужен"""
+
+
+class RaySegments:
+    """Отрезки лучей, полученные при трассировке (структура массивов)"""
+
+    __slots__ = ('starts', 'ends', 'normals', 'depth', 'mirror', 'ray')
+
+    def __init__(self, starts, ends, normals, depth, mirror, ray):
+        self.starts = starts      # (K, 3) начало отрезка
+        self.ends = ends          # (K, 3) точка попадания в зеркало
+        self.normals = normals    # (K, 3) единичная нормаль в точке попадания
+        self.depth = depth        # (K,) номер отражения (0 - прямой луч)
+        self.mirror = mirror      # (K,) индекс зеркала
+        self.ray = ray            # (K,) индекс исходного луча
+
+    def __len__(self):
+        return len(self.depth)
+
+    @property
+    def nbytes(self):
+        """Объем массивов отрезков (байт)"""
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    def astype(self, dtype):
+        """Отрезки с координатами типа dtype (float32 - компактный режим)"""
+        if self.starts.dtype == dtype:
+            return self
+        return RaySegments(self.starts.astype(dtype), self.ends.astype(dtype),
+                           self.normals.astype(dtype), self.depth, self.mirror, self.ray)
+
+    @classmethod
+    def empty(cls):
+        """Пустой набор отрезков"""
+        return cls(np.empty((0, 3)), np.empty((0, 3)), np.empty((0, 3)),
+                   np.empty(0, dtype=DEPTH_DTYPE), np.empty(0, dtype=INDEX_DTYPE),
+                   np.empty(0, dtype=INDEX_DTYPE))
+
+    @classmethod
+    def concatenate(cls, parts):
+        """Склейка нескольких наборов отрезков в один"""
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty()
+        return cls(*(np.concatenate([getattr(p, name) for p in parts])
+                     for name in cls.__slots__))
+
+
+def russian_roulette(energy, threshold, uniform):
+    """
+    Русская рулетка: луч с энергией ниже threshold продолжается с
+    вероятностью energy / threshold и получает энергию threshold.
+
+    uniform - равномерные числа [0, 1) по одному на луч.
+    Возвращает (energy, keep).
+    """
+    low = energy < threshold
+    survive = uniform * threshold < energy
+    return np.where(low, threshold, energy), ~low | survive
+
+
+class Roulette:
+    """
+    Параметры ослабления лучей для trace_wavefront.
+
+    Случайное число рулетки зависит только от (seed, номер луча,
+    отражение): результат не зависит от разбиения лучей на порции
+    и шарды (ParallelTracer). first_ray - номер первого луча пакета.
+    """
+
+    def __init__(self, reflectivity, threshold=ROULETTE_THRESHOLD, seed=0, first_ray=0):
+        self.reflectivity = np.asarray(reflectivity, dtype=float).reshape(-1)
+        self.threshold = threshold
+        self.seed = int(seed)
+        self.first_ray = int(first_ray)
+        self.killed = 0             # лучей, оборванных рулеткой (статистика)
+
+    def shifted(self, offset):
+        """Те же параметры для пакета, начинающегося на offset лучей дальше"""
+        return Roulette(self.reflectivity, self.threshold, self.seed, self.first_ray + offset)
+
+    def uniform(self, ray_ids, depth):
+        """Равномерные числа [0, 1) для лучей ray_ids на отражении depth (splitmix64)"""
+        z = (ray_ids.astype(np.uint64) + np.uint64(self.first_ray)) * _MIX[0]
+        z += np.uint64((self.seed * (1 << 16) + depth) & 0xFFFFFFFFFFFFFFFF)
+        z ^= z >> np.uint64(30)
+        z *= _MIX[1]
+        z ^= z >> np.uint64(27)
+        z *= _MIX[2]
+        z ^= z >> np.uint64(31)
+        return (z >> np.uint64(11)).astype(float) * 2.0 ** -53
+
+    def apply(self, energy, mirror, ray_ids, depth):
+        """Ослабление при отражении от зеркал mirror и рулетка: (energy, keep)"""
+        energy = energy * self.reflectivity[mirror]
+        energy, keep = russian_roulette(energy, self.threshold, self.uniform(ray_ids, depth))
+        self.killed += int(len(keep) - np.count_nonzero(keep))
+        return energy, keep
+
+
+def sample_cone_directions(num_rays, rng=None):
+    """Случайные направления в конусе 90 градусов (как в исходном draw_3d_rays)"""
+    if rng is None:
+        rng = np.random.default_rng()
+    return cone_directions(random_points(num_rays, rng))
+
+
+def nearest_sphere_hits(origins, directions, centers, radii, eps=HIT_EPSILON):
+    """
+    Ближайшие пересечения пакета лучей со сферами.
+
+    Возвращает (t, idx): расстояние вдоль луча и индекс сферы,
+    для промахов idx == -1, t == inf.
+    """
+    n = len(origins)
+    t_best = np.full(n, np.inf)
+    idx_best = np.full(n, -1, dtype=np.int64)
+    m = len(centers)
+    if n == 0 or m == 0:
+        return t_best, idx_best
+    PROFILER.count('intersection_tests', n * m)
+
+    step = max(1, CHUNK_ELEMENTS // m)
+    for lo in range(0, n, step):
+        hi = min(n, lo + step)
+        o = origins[lo:hi]
+        d = directions[lo:hi]
+
+        oc = o[:, None, :] - centers[None, :, :]
+        a = np.einsum('ij,ij->i', d, d)[:, None]
+        b = 2 * np.einsum('ijk,ik->ij', oc, d)
+        c = np.einsum('ijk,ijk->ij', oc, oc) - radii[None, :] ** 2
+
+        disc = b * b - 4 * a * c
+        sq = np.sqrt(np.maximum(disc, 0))
+        t1 = (-b - sq) / (2 * a)
+        t2 = (-b + sq) / (2 * a)
+
+        # Как и в скалярной версии: берем ближний корень, если он впереди,
+        # иначе дальний; слишком близкие попадания отбрасываем
+        t = np.where(t1 > 0, t1, np.where(t2 > 0, t2, np.inf))
+        t = np.where((disc >= 0) & (t > eps), t, np.inf)
+
+        idx = np.argmin(t, axis=1)
+        t_min = t[np.arange(hi - lo), idx]
+        hit = np.isfinite(t_min)
+        t_best[lo:hi] = t_min
+        idx_best[lo:hi] = np.where(hit, idx, -1)
+
+    return t_best, idx_best
+
+
+def reflect_hits(origins, dirs, t, idx, centers):
+    """
+    Шаг отражения пакета лучей, попавших в сферы idx на расстоянии t.
+
+    Возвращает (points, normals, reflected, ok): точки попадания,
+    единичные нормали, отраженные направления R = V - 2(V·N)N и маску
+    невырожденных нормалей (остальные лучи обрываются).
+    """
+    points = origins + t[:, None] * dirs
+    normals = points - centers[idx]
+    normal_len = np.linalg.norm(normals, axis=1)
+    ok = normal_len > 0
+    normals = normals / np.where(ok, normal_len, 1)[:, None]
+    dot = np.einsum('ij,ij->i', dirs, normals)
+    return points, normals, dirs - 2 * dot[:, None] * normals, ok
+
+
+def trace_wavefront(origin, directions, centers, radii, max_depth,
+                    eps=HIT_EPSILON, accel=None, cancel=None, roulette=None):
+    """
+    Итеративная трассировка пакета лучей.
+
+    origin     - точка испускания (3,) или массив начал (N, 3)
+    directions - направления лучей (N, 3)
+    centers    - центры сфер (M, 3), radii - радиусы (M,)
+    max_depth  - максимальный номер отражения (включительно)
+    accel      - ускоряющая структура с методом nearest_hit (например,
+                 SphereBVH); без нее выполняется полный перебор сфер
+    cancel     - функция без аргументов; если она вернула True, трассировка
+                 прерывается перед следующим отражением (TraceCancelled)
+    roulette   - Roulette: ослабление энергии и обрыв тусклых лучей
+                 (по умолчанию лучи не ослабевают)
+
+    Отрезки упорядочены по глубине, внутри глубины - по номеру луча.
+    """
+    directions = np.asarray(directions, dtype=float)
+    centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+    radii = np.asarray(radii, dtype=float).reshape(-1)
+    n = len(directions)
+
+    lengths = np.linalg.norm(directions, axis=1)
+    dirs = directions / np.where(lengths > 0, lengths, 1)[:, None]
+    origins = np.broadcast_to(np.asarray(origin, dtype=float), (n, 3)).copy()
+    ray_ids = np.arange(n, dtype=INDEX_DTYPE)
+    energy = np.ones(n) if roulette is not None else None
+
+    parts = []
+    for depth in range(max_depth + 1):
+        if len(ray_ids) == 0:
+            break
+        if cancel is not None and cancel():
+            raise TraceCancelled()
+
+        if accel is not None:
+            t, idx = accel.nearest_hit(origins, dirs, eps)
+        else:
+            t, idx = nearest_sphere_hits(origins, dirs, centers, radii, eps)
+        hit = idx >= 0
+        if PROFILER.enabled:
+            PROFILER.count(f'terminated_depth_{depth}', int(len(hit) - hit.sum()))
+        origins, dirs, ray_ids = origins[hit], dirs[hit], ray_ids[hit]
+        t, idx = t[hit], idx[hit]
+        if energy is not None:
+            energy = energy[hit]
+
+        points, normals, reflected, ok = reflect_hits(origins, dirs, t, idx, centers)
+        parts.append(RaySegments(origins, points, normals,
+                                 np.full(len(ray_ids), depth, dtype=DEPTH_DTYPE),
+                                 idx.astype(INDEX_DTYPE), ray_ids))
+
+        if energy is not None:
+            energy, keep = roulette.apply(energy, idx, ray_ids, depth)
+            ok &= keep
+            energy = energy[ok]
+        origins, dirs, ray_ids = points[ok], reflected[ok], ray_ids[ok]
+
+    return RaySegments.concatenate(parts)
+
+
+def scene_roulette(scene, threshold, seed=0, start=0):
+    """Roulette с reflectivity зеркал сцены (None, если threshold не задан)"""
+    if threshold is None:
+        return None
+    return Roulette(scene.mirrors.reflectivity, threshold, seed, start)
+
+
+def trace_scene(scene, num_rays=None, depth=None, rng=None, cancel=None, start=0,
+                roulette=None, seed=0):
+    """
+    Трассировка лучей источника сцены.
+
+    Возвращает RaySegments; num_rays и depth по умолчанию берутся из сцены.
+    Направления выбираются методом scene.sampler; start - номер первого
+    луча (для продолжения выборки при прогрессивном накоплении).
+    Координаты отрезков хранятся в типе чисел сцены (scene.dtype).
+    roulette - порог энергии для русской рулетки (None - без ослабления
+    лучей), seed - зерно ее случайных чисел.
+    """
+    if num_rays is None:
+        num_rays = scene.num_rays
+    if depth is None:
+        depth = scene.reflection_depth
+    directions = sample_directions(scene.sampler, num_rays, start, rng)
+    centers, radii = scene.mirror_arrays()
+    segments = trace_wavefront(scene.source, directions, centers, radii, depth,
+                               accel=scene.accelerator(), cancel=cancel,
+                               roulette=scene_roulette(scene, roulette, seed, start))
+    segments.ray += start
+    return segments.astype(scene.dtype)
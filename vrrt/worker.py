@@ -0,0 +1,150 @@
+"""
+Фоновый поток трассировки.
+
+Интерфейс (Tk) не должен блокироваться на трассировке: задания
+отправляются в рабочий поток, а готовые результаты забираются из
+очереди вызовом poll() (в Tk - по таймеру root.after). Каждое новое
+задание отменяет предыдущее: устаревшая трассировка прерывается между
+отражениями, а ее результат не попадает в очередь.
+
+call(func) выполняет func() в рабочем потоке между заданиями; такие
+вызовы не отменяются новыми заданиями (например, замена пула процессов,
+которым может пользоваться текущее задание).
+
+Исключение в задании не останавливает поток: вместо результата в
+очередь попадает JobFailed с текстом ошибки, и поток ждет следующее
+задание.
+"""
+import queue
+import threading
+import time
+import traceback
+
+from .tracer import TraceCancelled
+
+# Метка вызова call() в очереди заданий
+_CALL = object()
+
+
+class JobFailed:
+    """Результат задания, завершившегося исключением"""
+
+    def __init__(self, error):
+        self.error = error
+        self.traceback = ''.join(traceback.format_exception(type(error), error,
+                                                          error.__traceback__))
+
+    def __str__(self):
+        return f'{type(self.error).__name__}: {self.error}'
+
+
+class TraceWorker:
+    """Рабочий поток, выполняющий только самое свежее задание"""
+
+    def __init__(self, func):
+        # func(payload, cancel) -> результат; cancel() == True - задание устарело
+        self.func = func
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='trace-worker', daemon=True)
+        self._thread.start()
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.last_duration = 0.0    # длительность последнего выполненного задания (с)
+
+    def submit(self, key, payload):
+        """Новое задание; все предыдущие становятся устаревшими"""
+        with self._lock:
+            self._generation += 1
+            job_id = self._generation
+        self._jobs.put((job_id, key, payload))
+        return job_id
+
+    def call(self, func):
+        """Выполнение func() в рабочем потоке после текущего задания (не отменяется)"""
+        self._jobs.put((_CALL, None, func))
+
+    def cancel(self):
+        """Отмена текущего задания без отправки нового"""
+        with self._lock:
+            self._generation += 1
+
+    def is_stale(self, job_id):
+        """Задание устарело (после него было отправлено новое)"""
+        return job_id != self._generation
+
+    def poll(self):
+        """
+        Готовые результаты актуальных заданий: список (key, result).
+
+        Для заданий с ошибкой result - JobFailed.
+        """
+        results = []
+        while True:
+            try:
+                job_id, key, result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if not self.is_stale(job_id):
+                results.append((key, result))
+        return results
+
+    def close(self, timeout=None):
+        """Остановка потока (timeout - сколько ждать его завершения, с)"""
+        self.cancel()
+        self._jobs.put(None)
+        if timeout is not None:
+            self._thread.join(timeout)
+
+    def _next_job(self):
+        """
+        Последнее из накопившихся заданий (None - поток остановлен).
+
+        Вызовы call() по пути выполняются все и по порядку.
+        """
+        job = None
+        while True:
+            try:
+                item = self._jobs.get(block=job is None)
+            except queue.Empty:
+                return job
+            if item is None:
+                return None
+            if item[0] is _CALL:
+                try:
+                    item[2]()
+                except Exception as error:
+                    self.failed += 1
+                    self._results.put((self._generation, None, JobFailed(error)))
+            else:
+                job = item
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+
+            job_id, key, payload = job
+            if self.is_stale(job_id):
+                continue
+            started = time.perf_counter()
+            try:
+                result = self.func(payload, lambda: self.is_stale(job_id))
+            except TraceCancelled:
+                self.cancelled += 1
+                continue
+            except Exception as error:
+                # Поток продолжает работу, ошибка передается вместе с ключом задания
+                self.failed += 1
+                self._results.put((job_id, key, JobFailed(error)))
+                continue
+            if self.is_stale(job_id):
+                self.cancelled += 1
+                continue
+            self.completed += 1
+            self.last_duration = time.perf_counter() - started
+            self._results.put((job_id, key, result))